@@ -0,0 +1,98 @@
+"""
+usage:
+python benchmarks/bench_params.py --n-calls 20000
+"""
+
+import argparse
+import itertools
+import timeit
+
+from ryanair_timecapsule.api import booking, constants, fare_finder
+
+
+def model_fare_finder_params(iata: str) -> dict:
+    # How the parameters were built before templates: one whole model per call.
+    return fare_finder.Params(
+        departureAirportIataCode=iata,
+        outboundDepartureDateFrom="2024-10-08",
+        outboundDepartureDateTo="2025-10-08",
+        durationFrom=1,
+        durationTo=5,
+        market="es",
+    ).model_dump()
+
+
+def template_fare_finder_params(iata: str) -> dict:
+    return fare_finder.build_params(
+        depart_iata_code=iata,
+        depart_date_from="2024-10-08",
+        depart_date_to="2025-10-08",
+        duration_from=1,
+        duration_to=5,
+        market="es",
+    )
+
+
+def model_booking_params(destination: str) -> dict:
+    parameters = booking.Params(
+        Origin="STN", Destination=destination, DateOut="2024-10-29", DateIn="2024-10-29"
+    )
+    return {
+        k: str(v).lower() if isinstance(v, bool) else v
+        for k, v in parameters.model_dump().items()
+    }
+
+
+def template_booking_params(destination: str) -> dict:
+    return booking.get_params_template(1, 0, 0, 0, 2, 2).build(
+        Origin="STN", Destination=destination, DateOut="2024-10-29", DateIn="2024-10-29"
+    )
+
+
+# As many airports as Ryanair flies to, requested in turn like in a sweep.
+AIRPORTS = [f"{a}{b}{c}" for a in "ABCDEFG" for b in "HIJKLM" for c in "NOPQRS"]
+
+
+def bench(function, n_calls: int) -> float:
+    """Returns the best time per call in microseconds over 5 repeats."""
+    airports = itertools.cycle(AIRPORTS)
+    timer = timeit.Timer(lambda: function(next(airports)))
+    return min(timer.repeat(repeat=5, number=n_calls)) / n_calls * 1e6
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to measure the cost of building the request "
+            "parameters of the APIs."
+        )
+    )
+
+    params.add_argument(
+        "--n-calls",
+        default=20000,
+        type=int,
+        help="Number of parameters built per measure.",
+    )
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # Validate the markets offline, the benchmark measures the CPU cost only.
+    constants._loaded["markets"] = {"es"}
+    assert model_fare_finder_params("VLC") == template_fare_finder_params("VLC")
+    assert model_booking_params("VLC") == template_booking_params("VLC")
+
+    for name, model, template in [
+        ("fare_finder", model_fare_finder_params, template_fare_finder_params),
+        ("booking", model_booking_params, template_booking_params),
+    ]:
+        model_time = bench(model, args.n_calls)
+        template_time = bench(template, args.n_calls)
+        print(
+            f"{name}: model {model_time:.2f} us/call, template "
+            f"{template_time:.2f} us/call, {model_time / template_time:.1f}x faster"
+        )
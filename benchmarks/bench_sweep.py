@@ -0,0 +1,328 @@
+"""
+usage:
+python benchmarks/bench_sweep.py \
+    --latency 0.02 \
+    --throttle-rate 0.01 \
+    --max-workers 8 \
+    --json-out bench_sweep.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "scripts")
+API_URL = "https://www.ryanair.com"
+SCENARIOS = ["sweep", "fares", "booking"]
+
+
+def start_server(args) -> tuple[subprocess.Popen, str]:
+    """Starts `mock_server.py` in its own process, so that it does not compete
+    with the benchmarked code for the GIL.
+
+    Returns:
+        tuple[subprocess.Popen, str]: The server process and its URL.
+    """
+    command = [
+        sys.executable,
+        os.path.join(BENCHMARKS_DIR, "mock_server.py"),
+        "--port",
+        "0",
+        "--latency",
+        str(args.latency),
+        "--throttle-rate",
+        str(args.throttle_rate),
+        "--n-airports",
+        str(args.n_airports),
+        "--n-destinations",
+        str(args.n_destinations),
+    ]
+    if args.fare_finder_payload:
+        command += ["--fare-finder-payload", args.fare_finder_payload]
+    if args.booking_payload:
+        command += ["--booking-payload", args.booking_payload]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Serving on "):
+        process.kill()
+        raise RuntimeError("The mock server did not start.")
+    return process, line[len("Serving on ") :].strip()
+
+
+def point_to(url: str):
+    """Sends the requests of the package to the mock server instead of the API."""
+    from ryanair_timecapsule.api import booking, constants, fare_finder
+
+    for module, name in [
+        (fare_finder, "ENDPOINT"),
+        (booking, "ENDPOINT"),
+        (booking, "AUTH_ENDPOINT"),
+        (constants, "MARKETS_ENDPOINT"),
+        (constants, "ACTIVE_IATA_ENDPOINT"),
+    ]:
+        setattr(module, name, getattr(module, name).replace(API_URL, url))
+
+
+def record_latencies() -> list:
+    """Wraps `utils.call_api` and `utils.stream_api` to record the duration of each
+    call in seconds, retries included. A streamed call lasts until its body is
+    consumed."""
+    from ryanair_timecapsule.api import utils
+
+    latencies = []
+    call_api = utils.call_api
+    stream_api = utils.stream_api
+
+    def timed_call_api(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return call_api(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    @contextmanager
+    def timed_stream_api(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with stream_api(*args, **kwargs) as response:
+                yield response
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    utils.call_api = timed_call_api
+    utils.stream_api = timed_stream_api
+    return latencies
+
+
+def percentile(values: list, q: float) -> float:
+    """Returns the q-th percentile of values, by the nearest rank."""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def server_stats(url: str) -> dict:
+    return requests.get(f"{url}/__stats", timeout=10).json()
+
+
+def run_scenario(name: str, url: str, args, work_dir: str) -> dict:
+    """Runs a scenario against the mock server and measures it."""
+    # The reference data is downloaded from the mock server, not read from the
+    # user cache, so the directory is set before importing the package.
+    os.environ["RYANAIR_TIMECAPSULE_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    sys.path.insert(0, SCRIPTS_DIR)
+    from download_ryanair import download_ryanair
+
+    from ryanair_timecapsule.api import utils
+    from ryanair_timecapsule.api.booking import get_flights_booking
+    from ryanair_timecapsule.api.constants import get_iata_codes
+    from ryanair_timecapsule.api.fare_finder import get_flights_fares
+
+    point_to(url)
+    iata_codes = sorted(get_iata_codes())
+    latencies = record_latencies()
+    date_from = date.today().isoformat()
+    date_to = (date.today() + timedelta(args.days - 1)).isoformat()
+    output_path = os.path.join(work_dir, f"{name}.jsonl.gz")
+
+    before = server_stats(url)
+    start = time.perf_counter()
+    if name == "sweep":
+        download_ryanair(
+            iata_codes=set(iata_codes),
+            date_from=date_from,
+            date_to=date_to,
+            duration_from=1,
+            duration_to=5,
+            market="es",
+            output_path=output_path,
+            max_workers=args.max_workers,
+            requests_per_second=args.requests_per_second,
+            adaptive_rate_limit=args.adaptive_rate_limit,
+            stream=args.stream,
+        )
+    elif name == "fares":
+        utils.set_pool_size(args.max_workers)
+        with ThreadPoolExecutor(args.max_workers) as executor:
+            list(
+                executor.map(
+                    lambda iata: get_flights_fares(
+                        iata, date_from, date_to, 1, 5, market="es"
+                    ),
+                    iata_codes,
+                )
+            )
+    elif name == "booking":
+        utils.set_pool_size(args.max_workers)
+        routes = [
+            (origin, destination)
+            for origin in iata_codes
+            for destination in iata_codes
+            if origin < destination
+        ][: args.n_booking]
+        with ThreadPoolExecutor(args.max_workers) as executor:
+            list(
+                executor.map(
+                    lambda route: get_flights_booking(
+                        1, 0, 0, 0, *route, date_from, date_from
+                    ),
+                    routes,
+                )
+            )
+    seconds = time.perf_counter() - start
+    after = server_stats(url)
+
+    n_requests = after["requests"] - before["requests"]
+    bytes_written = 0
+    if os.path.exists(output_path):
+        bytes_written = os.path.getsize(output_path)
+    return {
+        "scenario": name,
+        "calls": len(latencies),
+        "requests": n_requests,
+        "throttled": after["throttled"] - before["throttled"],
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(n_requests / seconds, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "bytes_received": after["bytes_sent"] - before["bytes_sent"],
+        "bytes_written": bytes_written,
+        # Kilobytes on Linux.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def run_isolated(name: str, url: str, args, work_dir: str) -> dict:
+    """Runs a scenario in a fresh process, so that its peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_scenario, (name, url, args, work_dir))
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to benchmark the download and persistence "
+            "pipeline against a local stand-in of the Ryanair APIs."
+        )
+    )
+
+    params.add_argument(
+        "--scenarios",
+        default=SCENARIOS,
+        nargs="+",
+        choices=SCENARIOS,
+        help=(
+            "sweep: download_ryanair to a snapshot, fares: get_flights_fares for "
+            "every airport, booking: get_flights_booking for --n-booking routes."
+        ),
+    )
+
+    params.add_argument(
+        "--latency",
+        default=0.02,
+        type=float,
+        help="Seconds the mock server waits before answering each query.",
+    )
+
+    params.add_argument(
+        "--throttle-rate",
+        default=0.0,
+        type=float,
+        help="Fraction of the queries answered with 429 Too Many Requests.",
+    )
+
+    params.add_argument("--n-airports", default=50, type=int)
+
+    params.add_argument("--n-destinations", default=10, type=int)
+
+    params.add_argument(
+        "--days",
+        default=365,
+        type=int,
+        help="Number of days requested from each airport.",
+    )
+
+    params.add_argument(
+        "--n-booking",
+        default=200,
+        type=int,
+        help="Number of routes requested in the booking scenario.",
+    )
+
+    params.add_argument("--max-workers", default=8, type=int)
+
+    params.add_argument("--requests-per-second", default=None, type=float)
+
+    params.add_argument("--adaptive-rate-limit", action="store_true")
+
+    params.add_argument(
+        "--stream",
+        action="store_true",
+        help="If provided, the sweep scenario parses the fares as they arrive.",
+    )
+
+    params.add_argument(
+        "--fare-finder-payload",
+        default=None,
+        type=str,
+        help="JSON file with a recorded Fare-Finder response to replay.",
+    )
+
+    params.add_argument(
+        "--booking-payload",
+        default=None,
+        type=str,
+        help="JSON file with a recorded Booking response to replay.",
+    )
+
+    params.add_argument(
+        "--json-out",
+        default=None,
+        type=str,
+        help="Path where the results are saved, to compare runs.",
+    )
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    process, url = start_server(args)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for name in args.scenarios:
+                result = run_isolated(name, url, args, work_dir)
+                results.append(result)
+                print(
+                    f"{name}: {result['requests']} requests in {result['seconds']} s, "
+                    f"{result['requests_per_second']} req/s, "
+                    f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+                    f"{result['throttled']} throttled, "
+                    f"{result['bytes_written'] / 1e6:.1f} MB written, "
+                    f"peak RSS {result['peak_rss_mb']} MB"
+                )
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json_out is not None:
+        with open(args.json_out, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=4)
@@ -0,0 +1,387 @@
+"""
+usage:
+python benchmarks/mock_server.py \
+    --port 8080 \
+    --latency 0.05 \
+    --throttle-rate 0.01 \
+    --fare-finder-payload ../test/20241008T060000_STN_FROM-2024-10-08_TO-2025-10-08.json
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FARE_FINDER_PATH = "/api/farfnd/3/oneWayFares"
+BOOKING_PATH = "/api/booking/v4/en-gb/availability"
+AUTH_PATH = "/gb/en/trip/flights/select"
+MARKETS_PATH = "/content/ryanair.markets.json"
+AIRPORTS_PATH = "/api/views/locate/5/airports/en/active"
+STATS_PATH = "/__stats"
+
+
+def airport_codes(n_airports: int) -> list[str]:
+    """Returns n_airports fake IATA codes, always the same ones."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return [
+        f"{letters[i // 676 % 26]}{letters[i // 26 % 26]}{letters[i % 26]}"
+        for i in range(n_airports)
+    ]
+
+
+def make_fare(origin: str, destination: str, day: date, price: float) -> dict:
+    departure = f"{day.isoformat()}T06:35:00"
+    return {
+        "outbound": {
+            "departureAirport": {"iataCode": origin, "name": origin},
+            "arrivalAirport": {"iataCode": destination, "name": destination},
+            "departureDate": departure,
+            "arrivalDate": f"{day.isoformat()}T09:05:00",
+            "price": {"value": price, "currencyCode": "EUR", "currencySymbol": "€"},
+            "flightKey": f"FR~1234~ ~~{origin}~{departure}~{destination}~~",
+            "flightNumber": "FR1234",
+            "previousPrice": None,
+            "priceUpdated": 0,
+        },
+        "summary": {"price": {"value": price, "currencyCode": "EUR"}},
+    }
+
+
+def make_fares(
+    origin: str, date_from: str, date_to: str, n_destinations: int
+) -> list[dict]:
+    """Builds one fare per destination and day, with stable pseudo-random prices."""
+    rng = random.Random(origin)
+    destinations = airport_codes(n_destinations + 1)
+    destinations = [code for code in destinations if code != origin][:n_destinations]
+    day = date.fromisoformat(date_from)
+    last = date.fromisoformat(date_to)
+    fares = []
+    while day <= last:
+        for destination in destinations:
+            price = round(rng.uniform(9.99, 199.99), 2)
+            fares.append(make_fare(origin, destination, day, price))
+        day += timedelta(1)
+    return fares
+
+
+def make_booking(
+    origin: str, destination: str, date_out: str, flex_before: int, flex_after: int
+) -> dict:
+    """Builds a booking response with one flight per day in both directions."""
+    rng = random.Random(f"{origin}{destination}{date_out}")
+    center = date.fromisoformat(date_out)
+    days = [
+        center + timedelta(offset) for offset in range(-flex_before, flex_after + 1)
+    ]
+    return {
+        "currency": "EUR",
+        "trips": [
+            {
+                "origin": trip_origin,
+                "destination": trip_destination,
+                "dates": [
+                    {
+                        "dateOut": f"{day.isoformat()}T00:00:00.000",
+                        "flights": [
+                            {
+                                "faresLeft": rng.randint(-1, 10),
+                                "flightNumber": "FR 1234",
+                                "time": [
+                                    f"{day.isoformat()}T06:35:00.000",
+                                    f"{day.isoformat()}T09:05:00.000",
+                                ],
+                                "regularFare": {
+                                    "fares": [
+                                        {
+                                            "type": "ADT",
+                                            "amount": round(
+                                                rng.uniform(9.99, 199.99), 2
+                                            ),
+                                            "count": 1,
+                                        }
+                                    ]
+                                },
+                            }
+                        ],
+                    }
+                    for day in days
+                ],
+            }
+            for trip_origin, trip_destination in [
+                (origin, destination),
+                (destination, origin),
+            ]
+        ],
+    }
+
+
+class MockRyanairServer(ThreadingHTTPServer):
+    """Local stand-in for the Ryanair APIs used by the package.
+
+    Fare-Finder and Booking queries are answered with recorded payloads if given,
+    or with synthetic ones, after `latency` seconds. A `throttle_rate` fraction of
+    the queries is answered with `429 Too Many Requests`.
+
+    Args:
+        address (tuple): The (host, port) to listen on, port 0 picks a free one.
+        latency (float): Seconds waited before answering each query.
+        throttle_rate (float): Fraction of the queries answered with a 429.
+        retry_after (int): Value of the Retry-After header of the 429 responses.
+        n_airports (int): Number of active airports.
+        n_destinations (int): Number of destinations of each airport.
+        fare_finder_payload (dict | None): Recorded Fare-Finder response.
+        booking_payload (dict | None): Recorded Booking response.
+    """
+
+    daemon_threads = True
+    # Lets many clients connect at once, like the real API.
+    request_queue_size = 128
+    # Number of Fare-Finder bodies kept, so that repeated queries are not encoded
+    # again.
+    max_cached_bodies = 64
+
+    def __init__(
+        self,
+        address: tuple,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: int = 0,
+        n_airports: int = 50,
+        n_destinations: int = 10,
+        fare_finder_payload: dict | None = None,
+        booking_payload: dict | None = None,
+    ):
+        super().__init__(address, MockRyanairHandler)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.n_airports = n_airports
+        self.n_destinations = n_destinations
+        self.fare_finder_payload = fare_finder_payload
+        self.booking_payload = booking_payload
+        self.stats = {"requests": 0, "throttled": 0, "bytes_sent": 0}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self._fare_finder_bodies = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.stats[name] += value
+
+    def throttle(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    def fare_finder_body(
+        self, origin: str, date_from: str, date_to: str, offset: int, limit: int
+    ) -> bytes:
+        key = (origin, date_from, date_to, offset, limit)
+        with self._lock:
+            body = self._fare_finder_bodies.get(key)
+        if body is None:
+            body = self.encode_fare_finder_body(*key)
+            with self._lock:
+                if len(self._fare_finder_bodies) >= self.max_cached_bodies:
+                    # Drop the oldest body.
+                    del self._fare_finder_bodies[next(iter(self._fare_finder_bodies))]
+                self._fare_finder_bodies[key] = body
+        return body
+
+    def encode_fare_finder_body(
+        self, origin: str, date_from: str, date_to: str, offset: int, limit: int
+    ) -> bytes:
+        if self.fare_finder_payload is not None:
+            fares = self.fare_finder_payload["fares"]
+        else:
+            fares = make_fares(origin, date_from, date_to, self.n_destinations)
+        page = fares[offset : offset + limit]
+        return json.dumps(
+            {
+                "arrivalAirportCategories": None,
+                "fares": page,
+                "nextPage": None,
+                "size": len(page),
+            }
+        ).encode()
+
+    def booking_body(self, query: dict) -> bytes:
+        if self.booking_payload is not None:
+            return json.dumps(self.booking_payload).encode()
+        return json.dumps(
+            make_booking(
+                query["Origin"],
+                query["Destination"],
+                query["DateOut"],
+                int(query.get("FlexDaysBeforeOut", 2)),
+                int(query.get("FlexDaysOut", 2)),
+            )
+        ).encode()
+
+
+class MockRyanairHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send_body(self, body: bytes, status: int = 200, headers: list = ()):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count("bytes_sent", len(body))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        server = self.server
+
+        if url.path == STATS_PATH:
+            return self.send_body(json.dumps(server.stats).encode())
+        if url.path == MARKETS_PATH:
+            markets = [{"code": code} for code in ["gb", "en-gb", "es", "it", "de"]]
+            return self.send_body(json.dumps(markets).encode())
+        if url.path == AIRPORTS_PATH:
+            airports = [{"code": code} for code in airport_codes(server.n_airports)]
+            return self.send_body(json.dumps(airports).encode())
+
+        server.count("requests")
+        if server.latency:
+            time.sleep(server.latency)
+        if url.path in (FARE_FINDER_PATH, BOOKING_PATH) and server.throttle():
+            server.count("throttled")
+            return self.send_body(
+                b'{"message": "Too Many Requests"}',
+                status=429,
+                headers=[("Retry-After", str(server.retry_after))],
+            )
+
+        if url.path == FARE_FINDER_PATH:
+            body = server.fare_finder_body(
+                query["departureAirportIataCode"],
+                query["outboundDepartureDateFrom"],
+                query["outboundDepartureDateTo"],
+                int(query.get("offset", 0)),
+                int(query.get("limit", 39999)),
+            )
+            return self.send_body(body)
+        if url.path == BOOKING_PATH:
+            return self.send_body(server.booking_body(query))
+        if url.path == AUTH_PATH:
+            return self.send_body(
+                b"<html></html>",
+                headers=[
+                    ("Set-Cookie", "rid=mock-rid; Path=/"),
+                    ("Set-Cookie", "rid.sig=mock-rid-sig; Path=/"),
+                ],
+            )
+        self.send_body(b'{"message": "Not Found"}', status=404)
+
+    def log_message(self, *args):
+        pass
+
+
+def load_payload(path: str | None) -> dict | None:
+    if path is None:
+        return None
+    with open(path) as f:
+        payload = json.load(f)
+    # Accept the results of a sweep as well as raw responses.
+    return payload.get("response", payload)
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to serve a local stand-in of the Ryanair APIs "
+            "to benchmark the package."
+        )
+    )
+
+    params.add_argument("--host", default="127.0.0.1", type=str)
+
+    params.add_argument(
+        "--port", default=8080, type=int, help="Port to listen on, 0 for any."
+    )
+
+    params.add_argument(
+        "--latency",
+        default=0.0,
+        type=float,
+        help="Seconds waited before answering each query.",
+    )
+
+    params.add_argument(
+        "--throttle-rate",
+        default=0.0,
+        type=float,
+        help="Fraction of the queries answered with 429 Too Many Requests.",
+    )
+
+    params.add_argument(
+        "--retry-after",
+        default=0,
+        type=int,
+        help="Retry-After header of the 429 responses, in seconds.",
+    )
+
+    params.add_argument(
+        "--n-airports",
+        default=50,
+        type=int,
+        help="Number of active airports.",
+    )
+
+    params.add_argument(
+        "--n-destinations",
+        default=10,
+        type=int,
+        help="Number of destinations of each airport in the synthetic fares.",
+    )
+
+    params.add_argument(
+        "--fare-finder-payload",
+        default=None,
+        type=str,
+        help="JSON file with a recorded Fare-Finder response, replayed for all queries.",
+    )
+
+    params.add_argument(
+        "--booking-payload",
+        default=None,
+        type=str,
+        help="JSON file with a recorded Booking response, replayed for all queries.",
+    )
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = MockRyanairServer(
+        (args.host, args.port),
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        n_airports=args.n_airports,
+        n_destinations=args.n_destinations,
+        fare_finder_payload=load_payload(args.fare_finder_payload),
+        booking_payload=load_payload(args.booking_payload),
+    )
+    print(f"Serving on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
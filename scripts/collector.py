@@ -0,0 +1,192 @@
+"""
+usage:
+python collector.py \
+    --near-term-interval 3600 \
+    --near-term-days 14 \
+    --long-horizon-interval 86400 \
+    --long-horizon-days 365 \
+    --max-workers 8 \
+    --requests-per-second 5 \
+    --adaptive-rate-limit
+"""
+
+import argparse
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+from download_ryanair import download_markets, snapshot_paths
+
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.constants import (
+    CACHE_TTL,
+    get_iata_codes,
+    refresh_reference_data,
+)
+from ryanair_timecapsule.collector.scheduler import Scheduler, SweepLock
+from ryanair_timecapsule.storage.snapshot import JSONL_SUFFIX, TAR_SUFFIX
+
+NEAR_TERM_DIR = "near_term"
+
+
+def make_sweep(results_dir: str, n_days: int, args):
+    """Returns a sweep of the next n_days days into results_dir, with the
+    parameters of the command line.
+
+    Each run computes its own dates and snapshot paths, and reuses the pooled
+    connections and the reference data of the process.
+    """
+
+    def sweep():
+        captured_at = datetime.now()
+        market_roots, output_paths = snapshot_paths(
+            results_dir, args.markets, captured_at, args.format
+        )
+        failures = download_markets(
+            iata_codes=get_iata_codes(),
+            date_from=captured_at.date().isoformat(),
+            date_to=(captured_at + timedelta(n_days - 1)).date().isoformat(),
+            duration_from=1,
+            duration_to=5,
+            output_paths=output_paths,
+            max_workers=args.max_workers,
+            requests_per_second=args.requests_per_second,
+            adaptive_rate_limit=args.adaptive_rate_limit,
+            chunk_days=args.chunk_days,
+            delta_roots=market_roots if args.delta else None,
+            keyframe_interval=args.keyframe_interval,
+        )
+        for market, market_failures in failures.items():
+            for iata, error in market_failures.items():
+                print(f"{iata} ({market}) failed: {error}", flush=True)
+        if args.metrics_out is not None:
+            utils.metrics.save(args.metrics_out)
+
+    return sweep
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to run as a service that sweeps the fare_finder "
+            "API on fixed cadences: the near-term departures often and the whole "
+            "horizon daily, keeping its connections and reference data warm."
+        )
+    )
+
+    params.add_argument(
+        "--near-term-interval",
+        default=3600,
+        type=float,
+        help="Seconds between two sweeps of the near-term departures.",
+    )
+
+    params.add_argument(
+        "--near-term-days",
+        default=14,
+        type=int,
+        help=(
+            "Number of days swept by the near-term sweeps, written to "
+            f"ryanair_timecapsule_results/{NEAR_TERM_DIR}/. 0 disables them."
+        ),
+    )
+
+    params.add_argument(
+        "--long-horizon-interval",
+        default=24 * 60 * 60,
+        type=float,
+        help="Seconds between two sweeps of the whole horizon.",
+    )
+
+    params.add_argument(
+        "--long-horizon-days",
+        default=365,
+        type=int,
+        help="Number of days swept by the long horizon sweeps. 0 disables them.",
+    )
+
+    params.add_argument("--max-workers", default=8, type=int)
+
+    params.add_argument("--requests-per-second", default=None, type=float)
+
+    params.add_argument("--adaptive-rate-limit", action="store_true")
+
+    params.add_argument("--chunk-days", default=None, type=int)
+
+    params.add_argument(
+        "--markets",
+        default=None,
+        nargs="+",
+        help="Markets swept together, see download_ryanair.py. By default es.",
+    )
+
+    params.add_argument(
+        "--format", default=JSONL_SUFFIX, choices=[JSONL_SUFFIX, TAR_SUFFIX]
+    )
+
+    params.add_argument(
+        "--delta",
+        action="store_true",
+        help="Store only the prices that changed, see download_ryanair.py.",
+    )
+
+    params.add_argument("--keyframe-interval", default=7, type=int)
+
+    params.add_argument(
+        "--metrics-out",
+        default=None,
+        type=str,
+        help=(
+            "If provided, the metrics of the requests since the start of the "
+            "service are saved to this path after each sweep."
+        ),
+    )
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    output_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results_dir = os.path.join(output_dir, "ryanair_timecapsule_results")
+
+    if args.metrics_out is not None:
+        utils.set_metrics()
+
+    scheduler = Scheduler(
+        lock=SweepLock(os.path.join(results_dir, ".collector.lock")),
+        log=lambda message: print(
+            f"{datetime.now().isoformat()} {message}", flush=True
+        ),
+    )
+    if args.long_horizon_days > 0:
+        scheduler.add(
+            "long_horizon",
+            args.long_horizon_interval,
+            make_sweep(results_dir, args.long_horizon_days, args),
+        )
+    if args.near_term_days > 0:
+        scheduler.add(
+            "near_term",
+            args.near_term_interval,
+            make_sweep(
+                os.path.join(results_dir, NEAR_TERM_DIR), args.near_term_days, args
+            ),
+        )
+    # The reference data is loaded once by the first sweep, then refreshed daily.
+    scheduler.add(
+        "reference_data",
+        CACHE_TTL,
+        refresh_reference_data,
+        start=time.time() + CACHE_TTL,
+        exclusive=False,
+    )
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    print("Collecting...", flush=True)
+    scheduler.run_forever(stop)
@@ -0,0 +1,370 @@
+"""
+usage:
+python download_booking_routes.py \
+    --routes ../ryanair_timecapsule_results/2024/10/25 \
+    --depart-date-from 2024-10-25 \
+    --depart-date-to 2024-12-25 \
+    --output-path ../booking_results/2024-10-25.jsonl.gz \
+    --max-workers 8 \
+    --requests-per-second 5
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+import requests
+
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.booking import MAX_FLEX_DAYS, Params, get_flights_booking
+from ryanair_timecapsule.collector.journal import SweepJournal
+from ryanair_timecapsule.collector.planner import (
+    Query,
+    coverage,
+    merge_booking_responses,
+    plan_queries,
+)
+from ryanair_timecapsule.collector.routes import (
+    read_route_list,
+    route_jobs,
+    routes_from_snapshots,
+)
+from ryanair_timecapsule.storage.snapshot import (
+    JSONL_SUFFIX,
+    TAR_SUFFIX,
+    SnapshotWriter,
+    iter_snapshot,
+)
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+# The responses of the windows of the routes not stored yet, kept across resumes.
+WINDOWS_SUFFIX = ".windows.jsonl.gz"
+
+
+def job_name(origin: str, destination: str, day: str) -> str:
+    return f"{origin}-{destination}_{day}"
+
+
+def window_name(route_name: str, query: Query) -> str:
+    """Names a call of a route by the route and the first day of its window."""
+    return f"{route_name}_{query.days()[0]}"
+
+
+def download_route(
+    origin: str, destination: str, query: Query, n_adults: int = 1
+) -> dict:
+    """Calls the booking API for a return trip leaving and coming back on the day of
+    the query, which covers both directions of the route over the query days.
+
+    Returns:
+        dict: The metadata of the call and the response of the API.
+    """
+    metadata = {
+        "date": datetime.now().isoformat(),
+        "origin": origin,
+        "destination": destination,
+        "date_out": query.day,
+        "date_in": query.day,
+        "flex_days_before": query.flex_days_before,
+        "flex_days_after": query.flex_days_after,
+        "n_adults": n_adults,
+    }
+
+    response = get_flights_booking(
+        n_adults=n_adults,
+        n_teenagers=0,
+        n_children=0,
+        n_infants=0,
+        depart_iata_code=origin,
+        destination_iata_code=destination,
+        depart_date_from=query.day,
+        depart_date_to=query.day,
+        flex_days_before=query.flex_days_before,
+        flex_days_after=query.flex_days_after,
+    )
+
+    return {"metadata": metadata, "response": response}
+
+
+def merge_route(results: list, date_from: str, date_to: str) -> dict:
+    """Merges the results of the calls of a route into one result, keeping each
+    day once (see `merge_booking_responses`), from the call of the earliest window.
+
+    Returns:
+        dict: The metadata of the calls and the merged response.
+    """
+    results = sorted(results, key=lambda result: result["metadata"]["date_out"])
+    first = results[0]["metadata"]
+    metadata = {
+        "date": min(result["metadata"]["date"] for result in results),
+        "origin": first["origin"],
+        "destination": first["destination"],
+        "date_from": date_from,
+        "date_to": date_to,
+        "n_calls": len(results),
+        "n_adults": first["n_adults"],
+    }
+    response = merge_booking_responses(result["response"] for result in results)
+    return {"metadata": metadata, "response": response}
+
+
+def download_booking_routes(
+    routes: set,
+    date_from: str,
+    date_to: str,
+    output_path: str,
+    n_adults: int = 1,
+    flex_days: int = MAX_FLEX_DAYS,
+    max_workers: int = 1,
+    requests_per_second: float | None = None,
+    adaptive_rate_limit: bool = False,
+) -> dict:
+    """Calls the booking API for every route and date window, and writes the
+    result of each route to the compressed snapshot in the output path as soon as
+    all its calls succeeded.
+
+    The date range is covered with the fewest calls, see `plan_queries`, and the
+    responses of a route are merged so that a day returned by several calls is
+    stored once, see `merge_route`. A route is named after its first day, see
+    `job_name`. The sweep is recorded in a journal next to the output path and
+    resumed like the ones of `download_ryanair.py`, window by window: the
+    responses of the windows of a route not stored yet are kept in a
+    `.windows.jsonl.gz` file next to the output path, so that a resumed sweep only
+    requests the windows that failed or were never requested.
+
+    Args:
+        routes (set): The (origin, destination) IATA codes of the routes, see
+         `collector.routes.normalize_route`.
+        date_from (str): First departure date in ISO format.
+        date_to (str): Last departure date in ISO format.
+        output_path (str): Path of the snapshot, ending with `.jsonl.gz` or `.tar.gz`.
+        n_adults (int): Number of adult passengers.
+        flex_days (int): Number of flexible days on each side of the queried dates.
+        max_workers (int): Number of calls made concurrently.
+        requests_per_second (float | None): Maximum number of requests per second
+         sent to the API. If None, the requests are not rate limited.
+        adaptive_rate_limit (bool): If True, requests_per_second is the initial rate,
+         which then adapts to the throttling of the API (see `AdaptiveRateLimiter`).
+
+    Returns:
+        dict: The error of each window that failed, by window name, see
+         `window_name`.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers needs to be at least 1.")
+
+    journal_path = f"{output_path}{JOURNAL_SUFFIX}"
+    windows_path = f"{output_path}{WINDOWS_SUFFIX}"
+    resume = os.path.exists(journal_path)
+    if resume and not output_path.endswith(JSONL_SUFFIX):
+        raise ValueError(f"Only '{JSONL_SUFFIX}' sweeps can be resumed.")
+
+    utils.set_pool_size(max_workers)
+    utils.set_rate_limit(
+        requests_per_second, adaptive=adaptive_rate_limit, max_concurrency=max_workers
+    )
+
+    windows = {}
+    for origin, destination, query in route_jobs(
+        routes, plan_queries(date_from, date_to, flex_days)
+    ):
+        name = job_name(origin, destination, date_from)
+        windows.setdefault(name, []).append((origin, destination, query))
+
+    with SweepJournal(journal_path) as journal:
+        journal.start(
+            {
+                "routes": [list(route) for route in sorted(routes)],
+                "date_from": date_from,
+                "date_to": date_to,
+                "n_adults": n_adults,
+                "flex_days": flex_days,
+            }
+        )
+
+        done = set()
+        if resume and os.path.exists(output_path):
+            done = {name for name, _ in iter_snapshot(output_path)}
+        # The windows of the routes not stored yet that already succeeded.
+        results = {name: {} for name in windows if name not in done}
+        if resume and os.path.exists(windows_path):
+            for name, result in iter_snapshot(windows_path):
+                route_name = name.rsplit("_", 1)[0]
+                if route_name in results and name in journal.completed:
+                    results[route_name][name] = result
+
+        with ExitStack() as stack:
+            writer = stack.enter_context(SnapshotWriter(output_path, append=resume))
+            windows_writer = stack.enter_context(
+                SnapshotWriter(windows_path, append=resume)
+            )
+
+            def store_route(name: str):
+                # Every window of the route succeeded.
+                merged = merge_route(
+                    list(results.pop(name).values()), date_from, date_to
+                )
+                writer.write(name, merged)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+                for name in list(results):
+                    for origin, destination, query in windows[name]:
+                        if window_name(name, query) in results[name]:
+                            continue
+                        future = executor.submit(
+                            download_route,
+                            origin=origin,
+                            destination=destination,
+                            query=query,
+                            n_adults=n_adults,
+                        )
+                        futures[future] = (name, window_name(name, query))
+                    # The route was interrupted after its last window succeeded.
+                    if len(results[name]) == len(windows[name]):
+                        store_route(name)
+
+                for future in as_completed(futures):
+                    name, window = futures[future]
+                    try:
+                        result = future.result()
+                    except (requests.RequestException, ValueError) as e:
+                        journal.record_failure(window, e)
+                        continue
+                    windows_writer.write(window, result)
+                    journal.record_done(window)
+                    results[name][window] = result
+                    if len(results[name]) == len(windows[name]):
+                        store_route(name)
+
+        if not results:
+            # Every route is stored, the responses of their windows are not needed.
+            os.remove(windows_path)
+        return {
+            window: journal.failures[window]
+            for _, window in futures.values()
+            if window in journal.failures
+        }
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to download the booking API results of many "
+            "routes at once."
+        )
+    )
+
+    params.add_argument(
+        "--routes",
+        required=True,
+        type=str,
+        help=(
+            "Path to Fare-Finder snapshots (a file or a directory searched "
+            "recursively) or to a text file with one ORG-DST route per line."
+        ),
+    )
+
+    params.add_argument(
+        "--depart-date-from",
+        default=None,
+        type=str,
+        help="First departure date in ISO format. By default today.",
+    )
+
+    params.add_argument(
+        "--depart-date-to",
+        default=None,
+        type=str,
+        help="Last departure date in ISO format. By default 30 days from today.",
+    )
+
+    params.add_argument(
+        "--n-adults",
+        default=Params.model_fields["ADT"].default,
+        type=int,
+        help="Number of adult passengers, aged 16 or over at the time of travel.",
+    )
+
+    params.add_argument(
+        "--flex-days",
+        default=MAX_FLEX_DAYS,
+        type=int,
+        help=(
+            "Number of flexible days on each side of the queried dates. The wider, "
+            "the fewer calls are needed to cover the date range."
+        ),
+    )
+
+    params.add_argument(
+        "--output-path",
+        required=True,
+        type=str,
+        help=f"Path of the snapshot, ending with {JSONL_SUFFIX} or {TAR_SUFFIX}.",
+    )
+
+    params.add_argument(
+        "--max-workers",
+        default=8,
+        type=int,
+        help="Number of calls made concurrently.",
+    )
+
+    params.add_argument(
+        "--requests-per-second",
+        default=None,
+        type=float,
+        help="Maximum number of requests per second sent to the API. By default no limit.",
+    )
+
+    params.add_argument(
+        "--adaptive-rate-limit",
+        action="store_true",
+        help=(
+            "If provided, the rate starts at --requests-per-second and adapts to the "
+            "throttling of the API."
+        ),
+    )
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not os.path.exists(args.routes):
+        exception_message = f"The path '{args.routes}' is not a valid path."
+        raise FileNotFoundError(exception_message)
+
+    if os.path.isdir(args.routes) or args.routes.endswith((JSONL_SUFFIX, TAR_SUFFIX)):
+        routes = routes_from_snapshots(args.routes)
+    else:
+        routes = read_route_list(args.routes)
+
+    today = datetime.now()
+    date_from = args.depart_date_from or today.isoformat()[:10]
+    date_to = args.depart_date_to or (today + timedelta(30)).isoformat()[:10]
+
+    queries = plan_queries(date_from, date_to, args.flex_days)
+    report = coverage(queries, date_from, date_to)
+    print(
+        f"Downloading {len(routes)} routes with {report['n_calls']} calls each, "
+        f"covering {report['n_covered']} of {report['n_days']} days..."
+    )
+    failures = download_booking_routes(
+        routes=routes,
+        date_from=date_from,
+        date_to=date_to,
+        output_path=args.output_path,
+        n_adults=args.n_adults,
+        flex_days=args.flex_days,
+        max_workers=args.max_workers,
+        requests_per_second=args.requests_per_second,
+        adaptive_rate_limit=args.adaptive_rate_limit,
+    )
+    for name, error in failures.items():
+        print(f"{name} failed: {error}")
+    if failures:
+        print("Run again with the same arguments to retry the failed routes.")
@@ -18,7 +18,11 @@ import json
 import os
 from datetime import datetime
 
-from ryanair_timecapsule.api.fare_finder import Params, get_flights_fares
+from ryanair_timecapsule.api.fare_finder import (
+    Params,
+    get_flights_fares,
+    get_flights_fares_chunked,
+)
 
 
 def parse_args():
@@ -91,6 +95,16 @@ def parse_args():
         help="ISO language codes. E.g. en-gb",
     )
 
+    params.add_argument(
+        "--chunk-days",
+        default=None,
+        type=int,
+        help=(
+            "If provided, the date range is split in chunks of this many days, "
+            "requested concurrently and merged."
+        ),
+    )
+
     params.add_argument(
         "--out-dir",
         required=True,
@@ -121,7 +135,7 @@ if __name__ == "__main__":
             f"Departure IATA code: {args.depart_iata_code}\nDepart date from: {args.depart_date_from}\nDepart date to: {args.depart_date_to}\nDuration from: {args.duration_from}\nDuration to: {args.duration_to}\nDepart time from: {args.depart_time_from}\nDepart time to: {args.depart_time_to}\nNumber of passengers: {args.n_passengers}\nMarket: {args.market}\n"
         )
     else:
-        result = get_flights_fares(
+        query = dict(
             depart_iata_code=args.depart_iata_code,
             depart_date_from=args.depart_date_from,
             depart_date_to=args.depart_date_to,
@@ -132,6 +146,10 @@ if __name__ == "__main__":
             n_passengers=args.n_passengers,
             market=args.market,
         )
+        if args.chunk_days is None:
+            result = get_flights_fares(**query)
+        else:
+            result = get_flights_fares_chunked(**query, chunk_days=args.chunk_days)
 
         now = datetime.now().strftime("%Y%m%dT%H%M%S")
         file_name = f"{now}_{args.depart_iata_code}_FROM-{args.depart_date_from}_TO-{args.depart_date_to}"
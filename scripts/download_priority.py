@@ -0,0 +1,285 @@
+"""
+usage:
+python download_priority.py \
+    --history ../ryanair_timecapsule_dataset \
+    --source fare_finder \
+    --routes ../ryanair_timecapsule_results \
+    --budget 500 \
+    --output-path ../priority_results/2024-10-25.jsonl.gz \
+    --max-workers 8 \
+    --requests-per-second 5
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pyarrow.dataset as ds
+import requests
+from download_booking_routes import download_route, job_name
+from download_ryanair import download_airport
+
+from ryanair_timecapsule.analysis.history import FareHistory
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.booking import MAX_FLEX_DAYS
+from ryanair_timecapsule.api.constants import get_iata_codes
+from ryanair_timecapsule.collector.planner import plan_queries
+from ryanair_timecapsule.collector.priority import (
+    by_airport,
+    by_booking_route,
+    merge_targets,
+    plan_budget,
+    rank_targets,
+)
+from ryanair_timecapsule.collector.routes import read_route_list, routes_from_snapshots
+from ryanair_timecapsule.storage.dataset import SOURCE_BOOKING, SOURCE_FARE_FINDER
+from ryanair_timecapsule.storage.snapshot import (
+    JSONL_SUFFIX,
+    TAR_SUFFIX,
+    SnapshotWriter,
+)
+
+# The --source of the script is the source of the history it ranks.
+FARE_FINDER = SOURCE_FARE_FINDER
+BOOKING = SOURCE_BOOKING
+
+
+def load_routes(path: str) -> set[tuple[str, str]]:
+    """Reads the active routes in both directions from Fare-Finder snapshots or a
+    route list, like `download_booking_routes.py`."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"The path '{path}' is not a valid path.")
+    if os.path.isdir(path) or path.endswith((JSONL_SUFFIX, TAR_SUFFIX)):
+        routes = routes_from_snapshots(path)
+    else:
+        routes = read_route_list(path)
+    # The routes are normalized, while the history keeps each direction.
+    return routes | {(destination, origin) for origin, destination in routes}
+
+
+def target_name(target) -> str:
+    if target.destination is None:
+        return f"{target.origin}_{target.query.day}"
+    return job_name(target.origin, target.destination, target.query.day)
+
+
+def download_target(target, market: str = "es", n_adults: int = 1) -> dict:
+    """Calls the Fare-Finder API for an airport target, or the booking API for a
+    route target, over the days of its window."""
+    if target.destination is None:
+        days = target.query.days()
+        return download_airport(
+            iata=target.origin,
+            date_from=days[0],
+            date_to=days[-1],
+            duration_from=1,
+            duration_to=5,
+            market=market,
+        )
+    return download_route(
+        target.origin, target.destination, target.query, n_adults=n_adults
+    )
+
+
+def download_priority(
+    plan: list,
+    output_path: str,
+    market: str = "es",
+    n_adults: int = 1,
+    max_workers: int = 1,
+    requests_per_second: float | None = None,
+    adaptive_rate_limit: bool = False,
+) -> dict:
+    """Downloads the planned targets, the most valuable first, and writes each
+    result to the snapshot in the output path as soon as it arrives.
+
+    Args:
+        plan (list): The targets, see `collector.priority.plan_budget`.
+        output_path (str): Path of the snapshot, ending with `.jsonl.gz` or `.tar.gz`.
+        market (str): The market of the Fare-Finder calls.
+        n_adults (int): Number of adult passengers of the booking calls.
+        max_workers (int): Number of calls made concurrently.
+        requests_per_second (float | None): Maximum number of requests per second
+         sent to the API. If None, the requests are not rate limited.
+        adaptive_rate_limit (bool): If True, requests_per_second is the initial rate,
+         which then adapts to the throttling of the API (see `AdaptiveRateLimiter`).
+
+    Returns:
+        dict: The error of each target that failed, by name.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers needs to be at least 1.")
+
+    utils.set_pool_size(max_workers)
+    utils.set_rate_limit(
+        requests_per_second, adaptive=adaptive_rate_limit, max_concurrency=max_workers
+    )
+
+    failures = {}
+    with SnapshotWriter(output_path) as writer:
+        # The executor starts the calls in submission order, so the most valuable
+        # targets are captured even if the run is cut short.
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    download_target, target, market=market, n_adults=n_adults
+                ): target_name(target)
+                for target in plan
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    failures[name] = repr(e)
+                    continue
+                writer.write(name, result)
+    return failures
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to spend a fixed number of requests on the "
+            "routes and departure dates whose prices change the most, closest to "
+            "departure first."
+        )
+    )
+
+    params.add_argument(
+        "--history",
+        required=True,
+        type=str,
+        help="Path to the dataset of the past captures, see export_dataset.py.",
+    )
+
+    params.add_argument(
+        "--source",
+        default=FARE_FINDER,
+        choices=[FARE_FINDER, BOOKING],
+        help=(
+            "API called for each target. A Fare-Finder call covers all the routes of "
+            "an airport, a booking call both directions of a route."
+        ),
+    )
+
+    params.add_argument(
+        "--routes",
+        default=None,
+        type=str,
+        help=(
+            "Path to Fare-Finder snapshots (a file or a directory searched "
+            "recursively) or to a text file with one ORG-DST route per line. The "
+            "routes missing from the history are ranked as changing half of the "
+            "time. By default only the routes of the history are ranked."
+        ),
+    )
+
+    params.add_argument(
+        "--budget",
+        required=True,
+        type=int,
+        help="Number of calls made, to the most valuable targets.",
+    )
+
+    params.add_argument(
+        "--horizon-days",
+        default=365,
+        type=int,
+        help="Number of departure days ranked, from today.",
+    )
+
+    params.add_argument(
+        "--flex-days",
+        default=3,
+        type=int,
+        help=(
+            f"The departure windows span 2 * flex-days + 1 days, at most "
+            f"{MAX_FLEX_DAYS} for the booking API."
+        ),
+    )
+
+    params.add_argument(
+        "--lookback-days",
+        default=14,
+        type=float,
+        help="Only the price changes of the captures of the last days are counted.",
+    )
+
+    params.add_argument(
+        "--decay-days",
+        default=30,
+        type=float,
+        help="Days to departure at which the value of a window is halved.",
+    )
+
+    params.add_argument("--market", default="es", type=str)
+
+    params.add_argument("--n-adults", default=1, type=int)
+
+    params.add_argument(
+        "--output-path",
+        required=True,
+        type=str,
+        help=f"Path of the snapshot, ending with {JSONL_SUFFIX} or {TAR_SUFFIX}.",
+    )
+
+    params.add_argument("--max-workers", default=8, type=int)
+
+    params.add_argument("--requests-per-second", default=None, type=float)
+
+    params.add_argument("--adaptive-rate-limit", action="store_true")
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    now = datetime.now()
+    windows = plan_queries(
+        now.date().isoformat(),
+        (now + timedelta(args.horizon_days - 1)).date().isoformat(),
+        args.flex_days,
+    )
+    # The history of the other API follows other prices, e.g. per fare class.
+    history = FareHistory.from_dataset(
+        args.history, filter=ds.field("source") == args.source
+    )
+    targets = rank_targets(
+        history,
+        windows,
+        now=now,
+        routes=None if args.routes is None else sorted(load_routes(args.routes)),
+        lookback_days=args.lookback_days,
+        decay_days=args.decay_days,
+    )
+    if args.source == FARE_FINDER:
+        active = get_iata_codes()
+        targets = [
+            target
+            for target in merge_targets(targets, by_airport)
+            if target.origin in active
+        ]
+    else:
+        targets = merge_targets(targets, by_booking_route)
+
+    plan = plan_budget(targets, args.budget)
+    total = sum(target.score for target in targets)
+    print(
+        f"{len(plan)} of {len(targets)} calls, "
+        f"{sum(target.score for target in plan) / (total or 1):.0%} of the value."
+    )
+
+    failures = download_priority(
+        plan,
+        output_path=args.output_path,
+        market=args.market,
+        n_adults=args.n_adults,
+        max_workers=args.max_workers,
+        requests_per_second=args.requests_per_second,
+        adaptive_rate_limit=args.adaptive_rate_limit,
+    )
+    for name, error in failures.items():
+        print(f"{name} failed: {error}")
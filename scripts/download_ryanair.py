@@ -1,46 +1,116 @@
-import requests
-from ryanair_timecapsule.api.fare_finder import get_flights_fares
-from datetime import datetime, timedelta
-import json
-import tempfile
-import tarfile
+import argparse
 import os
-from glob import glob
-from ryanair_timecapsule.api.constants import IATA_CODES
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import datetime, timedelta
 
+import requests
 
-def make_tarfile(output_filename: str, source_dir: str):
-    """Creates a gzipped tar archive that contains a top-level folder mirroring source_dir.
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.constants import get_iata_codes, get_markets
+from ryanair_timecapsule.api.fare_finder import (
+    get_flights_fares,
+    get_flights_fares_chunked,
+    stream_flights_fares,
+)
+from ryanair_timecapsule.collector.journal import SweepJournal
+from ryanair_timecapsule.collector.markets import (
+    check_markets,
+    market_jobs,
+    market_root,
+    normalize_markets,
+)
+from ryanair_timecapsule.storage.delta import DeltaWriter
+from ryanair_timecapsule.storage.snapshot import (
+    JSONL_SUFFIX,
+    TAR_SUFFIX,
+    SnapshotWriter,
+    iter_snapshot,
+)
 
-    Args:
-        output_filename (str): The path and name of the output file.
-        If path is not given, the file will be saved in the current working directory.
-        Eg:
-        - /home/user/Desktop/compressed_file.tar.gz -> will be located in /home/user/Desktop/ with the name compressed_file.tar.gz
-        - backup.tar.gz -> will be located in the same working directory as the one from were the script has been run, under the name backup.tar.gz
-        source_dir (str): The path to the source directory.
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+
+def airport_metadata(
+    date_from: str, date_to: str, duration_from: int, duration_to: int, market: str
+) -> dict:
+    return {
+        "date": datetime.now().isoformat(),
+        "depart_date_from": date_from,
+        "depart_date_to": date_to,
+        "duration_from": duration_from,
+        "duration_to": duration_to,
+        "market": market,
+    }
+
+
+def download_airport(
+    iata: str,
+    date_from: str,
+    date_to: str,
+    duration_from: int,
+    duration_to: int,
+    market: str,
+    chunk_days: int | None = None,
+) -> dict:
+    """Calls the ryanair farefinders api for a single IATA code.
+
+    If chunk_days is given, the date range is requested in chunks of chunk_days
+    days, one after another (see `get_flights_fares_chunked`). The airports of a
+    sweep already run concurrently, so this bounds the size of each response.
+
+    Returns:
+        dict: The metadata of the call and the response of the API.
     """
+    metadata = airport_metadata(date_from, date_to, duration_from, duration_to, market)
 
-    # Handle missing source directory
-    if not os.path.exists(path=source_dir):
-        exception_message = (
-            f"{source_dir} does not exist. Please provide a valid source directory."
+    if chunk_days is None:
+        response = get_flights_fares(
+            depart_iata_code=iata,
+            depart_date_from=date_from,
+            depart_date_to=date_to,
+            duration_from=duration_from,
+            duration_to=duration_to,
+            market=market,
+        )
+    else:
+        response = get_flights_fares_chunked(
+            depart_iata_code=iata,
+            depart_date_from=date_from,
+            depart_date_to=date_to,
+            duration_from=duration_from,
+            duration_to=duration_to,
+            market=market,
+            chunk_days=chunk_days,
+            max_workers=1,
         )
-        raise FileNotFoundError(exception_message)
 
-    # Handle missing output directory
-    out_dir, out_filename = os.path.split(output_filename)
-    if out_dir:
-        if not os.path.exists(out_dir):
-            os.makedirs(out_dir)
+    return {"metadata": metadata, "response": response}
 
-    with tarfile.open(output_filename, "w:gz") as tar:
-        # Get all the json files from inside the directory:
-        data_paths = glob(os.path.join(source_dir, "*.json"))
 
-        # Write each path separately in the tar file.
-        for path in data_paths:
-            tar.add(path, arcname=os.path.split(path)[-1])
+def stream_airport(
+    writer: SnapshotWriter,
+    name: str,
+    iata: str,
+    date_from: str,
+    date_to: str,
+    duration_from: int,
+    duration_to: int,
+    market: str,
+):
+    """Like `download_airport`, but the fares are parsed as they arrive and
+    written straight to the snapshot (see `SnapshotWriter.write_stream`), so the
+    memory used does not grow with the number of fares of the airport."""
+    metadata = airport_metadata(date_from, date_to, duration_from, duration_to, market)
+    with stream_flights_fares(
+        depart_iata_code=iata,
+        depart_date_from=date_from,
+        depart_date_to=date_to,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        market=market,
+    ) as fares:
+        writer.write_stream(name, metadata, fares)
 
 
 def download_ryanair(
@@ -51,10 +121,22 @@ def download_ryanair(
     duration_to: int,
     market: str,
     output_path: str,
-):
-    """Calls the ryanair farefinders api for each IATA code in iata_codes,
-        saves the result of each call in a temporary directory. Once the loop finishes
-        the data is compressed and saved in the output path.
+    max_workers: int = 1,
+    requests_per_second: float | None = None,
+    adaptive_rate_limit: bool = False,
+    chunk_days: int | None = None,
+    delta_root: str | None = None,
+    keyframe_interval: int = 7,
+    stream: bool = False,
+) -> dict:
+    """Calls the ryanair farefinders api for each IATA code in iata_codes and
+        writes the result of each call to the compressed snapshot in the output
+        path as soon as it arrives.
+
+        The sweep is recorded in a journal next to the output path. If the journal
+        already exists, the sweep is resumed: the airports found in the snapshot
+        are skipped and only the missing or failed ones are requested again.
+        An airport that fails is recorded in the journal instead of aborting the sweep.
 
     Args:
         iata_codes (set): A set of unique airports IATA codes to be used to call the API.
@@ -63,68 +145,374 @@ def download_ryanair(
         duration_from (int): The minimum time of the flight.
         duration_to (int): The maximum time of the flight.
         market (str): what market to query.
-        output_path (str): Path where the compressed file will be saved.
+        output_path (str): Path where the compressed file will be saved, ending with
+         `.jsonl.gz` or `.tar.gz` (see `SnapshotWriter`).
          If just a filename is given the result will be created in the directory
          where the script has been runed from.
+        max_workers (int): Number of airports requested concurrently. By default
+         the airports are requested one after another.
+        requests_per_second (float | None): Maximum number of requests per second
+         sent to the API. If None, the requests are not rate limited.
+        adaptive_rate_limit (bool): If True, requests_per_second is the initial rate,
+         which then adapts to the throttling of the API (see `AdaptiveRateLimiter`).
+        chunk_days (int | None): If given, each airport is requested in chunks of
+         chunk_days days instead of a single request for the whole date range.
+        delta_root (str | None): If given, the sweep is a capture of the delta store
+         at this root (see `DeltaWriter`): a full snapshot every keyframe_interval
+         captures, and only the prices that changed since the previous capture
+         otherwise. Delta sweeps can not be resumed.
+        keyframe_interval (int): Number of captures from a keyframe to the next.
+        stream (bool): If True, the fares of each airport are parsed and written as
+         they arrive (see `stream_airport`), instead of holding whole responses
+         in memory. Not available with chunk_days or delta_root.
+
+    Returns:
+        dict: The error of each airport that failed, by IATA code.
+    """
+    failures = download_markets(
+        iata_codes=iata_codes,
+        date_from=date_from,
+        date_to=date_to,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        output_paths={market: output_path},
+        max_workers=max_workers,
+        requests_per_second=requests_per_second,
+        adaptive_rate_limit=adaptive_rate_limit,
+        chunk_days=chunk_days,
+        delta_roots=None if delta_root is None else {market: delta_root},
+        keyframe_interval=keyframe_interval,
+        stream=stream,
+    )
+    return failures[market]
+
+
+def download_markets(
+    iata_codes: set,
+    date_from: str,
+    date_to: str,
+    duration_from: int,
+    duration_to: int,
+    output_paths: dict,
+    max_workers: int = 1,
+    requests_per_second: float | None = None,
+    adaptive_rate_limit: bool = False,
+    chunk_days: int | None = None,
+    delta_roots: dict | None = None,
+    keyframe_interval: int = 7,
+    stream: bool = False,
+) -> dict:
+    """Sweeps several markets at once, like `download_ryanair` sweeps one.
+
+    Every (airport, market) job runs in the same pool of workers, sharing the
+    pooled connections, the rate limit and the reference data, so N markets take
+    N times the requests but not N sweeps one after another. Each market is
+    written to its own snapshot with its own journal, and resumed on its own.
+
+    Args:
+        output_paths (dict): The snapshot of each market, by market code.
+        delta_roots (dict | None): The delta store of each market, by market code,
+         if the sweep is a delta capture (see `download_ryanair`).
+
+    Returns:
+        dict: The errors of the airports that failed, by market and IATA code.
     """
+    if max_workers < 1:
+        raise ValueError("max_workers needs to be at least 1.")
+    if stream and (chunk_days is not None or delta_roots is not None):
+        raise ValueError("Streamed sweeps can not be chunked or delta captures.")
+    markets = list(output_paths)
+    if normalize_markets(markets) != markets:
+        raise ValueError(f"The markets {markets} need to be unique and lower case.")
+
+    resumed = set()
+    for market, output_path in output_paths.items():
+        if os.path.exists(f"{output_path}{JOURNAL_SUFFIX}"):
+            if not output_path.endswith(JSONL_SUFFIX):
+                raise ValueError(f"Only '{JSONL_SUFFIX}' sweeps can be resumed.")
+            if delta_roots is not None:
+                raise ValueError("Delta sweeps can not be resumed.")
+            resumed.add(market)
 
-    with tempfile.TemporaryDirectory() as temp_dir_name:
-        for iata in iata_codes:
-            metadata = {
-                "date": datetime.now().isoformat(),
-                "depart_date_from": date_from,
-                "depart_date_to": date_to,
-                "duration_from": duration_from,
-                "duration_to": duration_to,
-                "market": market,
-            }
-
-            response = get_flights_fares(
-                depart_iata_code=iata,
-                depart_date_from=date_from,
-                depart_date_to=date_to,
-                duration_from=duration_from,
-                duration_to=duration_to,
-                market=market,
+    # All the workers share the pooled session, so keep one connection per worker.
+    utils.set_pool_size(max_workers)
+    utils.set_rate_limit(
+        requests_per_second, adaptive=adaptive_rate_limit, max_concurrency=max_workers
+    )
+
+    with ExitStack() as stack:
+        journals = {}
+        writers = {}
+        done = set()
+        for market, output_path in output_paths.items():
+            journal = SweepJournal(f"{output_path}{JOURNAL_SUFFIX}")
+            journals[market] = stack.enter_context(journal)
+            journal.start(
+                {
+                    "iata_codes": sorted(iata_codes),
+                    "date_from": date_from,
+                    "date_to": date_to,
+                    "duration_from": duration_from,
+                    "duration_to": duration_to,
+                    "market": market,
+                }
             )
+            if market in resumed and os.path.exists(output_path):
+                done |= {(name, market) for name, _ in iter_snapshot(output_path)}
+
+            if delta_roots is not None:
+                writer = DeltaWriter(
+                    delta_roots[market],
+                    output_path,
+                    keyframe_interval=keyframe_interval,
+                )
+            else:
+                writer = SnapshotWriter(output_path, append=market in resumed)
+            writers[market] = stack.enter_context(writer)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for iata, market in market_jobs(iata_codes, markets):
+                name = f"{iata}_{date_from}_{date_to}"
+                if (name, market) in done:
+                    continue
+                job = {
+                    "iata": iata,
+                    "date_from": date_from,
+                    "date_to": date_to,
+                    "duration_from": duration_from,
+                    "duration_to": duration_to,
+                    "market": market,
+                }
+                if stream:
+                    future = executor.submit(
+                        stream_airport, writers[market], name, **job
+                    )
+                else:
+                    future = executor.submit(
+                        download_airport, chunk_days=chunk_days, **job
+                    )
+                futures[future] = (iata, market)
+
+            for future in as_completed(futures):
+                iata, market = futures[future]
+                try:
+                    result = future.result()
+                except (
+                    requests.RequestException,
+                    ValueError,
+                    KeyError,
+                    TypeError,
+                ) as e:
+                    journals[market].record_failure(iata, e)
+                    continue
+                # Streamed results are already written by their worker.
+                if result is not None:
+                    writers[market].write(f"{iata}_{date_from}_{date_to}", result)
+                journals[market].record_done(iata)
+
+        failures = {market: {} for market in markets}
+        for iata, market in futures.values():
+            if iata in journals[market].failures:
+                failures[market][iata] = journals[market].failures[iata]
+        return failures
+
+
+def snapshot_paths(
+    results_dir: str, markets: list | None, captured_at: datetime, suffix: str
+) -> tuple[dict, dict]:
+    """Returns the results root and the snapshot path of each market of a sweep.
+
+    Without markets, the es market is written to the results tree itself, e.g.
+    `<results_dir>/2024/10/08/06:00:00.jsonl.gz`. Otherwise each market gets its
+    own partition, e.g. `<results_dir>/market=it/2024/10/08/06:00:00.jsonl.gz`.
+
+    Returns:
+        tuple[dict, dict]: The root and the snapshot path, by market code.
+    """
+    if markets is None:
+        market_roots = {"es": results_dir}
+    else:
+        markets = normalize_markets(markets)
+        check_markets(markets, get_markets())
+        market_roots = {market: market_root(results_dir, market) for market in markets}
+    date_now, time_now = captured_at.isoformat().split("T")
+    year, month, day = date_now.split("-")
+    output_paths = {
+        market: os.path.join(root, year, month, day, f"{time_now}{suffix}")
+        for market, root in market_roots.items()
+    }
+    return market_roots, output_paths
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to download the fare_finder API results of all "
+            "the active Ryanair airports."
+        )
+    )
+
+    params.add_argument(
+        "--max-workers",
+        default=8,
+        type=int,
+        help="Number of airports requested concurrently.",
+    )
+
+    params.add_argument(
+        "--requests-per-second",
+        default=None,
+        type=float,
+        help="Maximum number of requests per second sent to the API. By default no limit.",
+    )
 
-            result = {"metadata": metadata, "response": response}
+    params.add_argument(
+        "--adaptive-rate-limit",
+        action="store_true",
+        help=(
+            "If provided, the rate starts at --requests-per-second and adapts to the "
+            "throttling of the API."
+        ),
+    )
+
+    params.add_argument(
+        "--chunk-days",
+        default=None,
+        type=int,
+        help=(
+            "If provided, each airport is requested in chunks of this many days, "
+            "which keeps the responses of busy airports small."
+        ),
+    )
+
+    params.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "If provided, the fares are written as they are parsed instead of "
+            "holding the whole response of each airport in memory."
+        ),
+    )
+
+    params.add_argument(
+        "--metrics-out",
+        default=None,
+        type=str,
+        help=(
+            "If provided, the metrics of the requests are saved to this path at the "
+            "end of the sweep, in the Prometheus text format if it ends with .prom "
+            "or as a JSON summary otherwise."
+        ),
+    )
+
+    params.add_argument(
+        "--format",
+        default=JSONL_SUFFIX,
+        choices=[JSONL_SUFFIX, TAR_SUFFIX],
+        help=(
+            "Format of the snapshot. JSON Lines keep every downloaded airport if the "
+            "script is interrupted."
+        ),
+    )
+
+    params.add_argument(
+        "--delta",
+        action="store_true",
+        help=(
+            "If provided, only the prices that changed since the previous sweep are "
+            "stored, with a full snapshot every --keyframe-interval sweeps."
+        ),
+    )
+
+    params.add_argument(
+        "--keyframe-interval",
+        default=7,
+        type=int,
+        help="Number of sweeps from a full snapshot to the next, with --delta.",
+    )
+
+    params.add_argument(
+        "--markets",
+        default=None,
+        nargs="+",
+        help=(
+            "Markets swept together, e.g. es it de. Each market is written to "
+            "ryanair_timecapsule_results/market=<market>/. By default only the es "
+            "market is swept, into ryanair_timecapsule_results/."
+        ),
+    )
 
-            filename = f"{iata}_{date_from}_{date_to}"
-            json_file_path = os.path.join(temp_dir_name, f"{filename}.json")
-            with open(json_file_path, "w") as f:
-                data = json.dumps(result, indent=4)
-                f.write(data)
+    params.add_argument(
+        "--resume",
+        default=None,
+        nargs="+",
+        help=(
+            "Path to the snapshot of an interrupted sweep, one per market. The sweep "
+            "is resumed with its original parameters, only requesting the missing "
+            "airports."
+        ),
+    )
 
-        make_tarfile(output_filename=output_path, source_dir=temp_dir_name)
+    return params.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+
     duration_in_days = 365
     date_time_now = datetime.now()
-    date_time_now_str = date_time_now.isoformat()
-    date_now = date_time_now_str[:10]
-    time_now = date_time_now_str[11:]
-    year, month, day = date_now.split("-")
+    date_now = date_time_now.isoformat()[:10]
     date_end = (date_time_now + timedelta(duration_in_days)).isoformat()[:10]
 
     output_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results_dir = os.path.join(output_dir, "ryanair_timecapsule_results")
 
-    output_path = os.path.join(
-        output_dir,
-        "ryanair_timecapsule_results",
-        year,
-        month,
-        day,
-        f"{time_now}.tar.gz",
+    market_roots, output_paths = snapshot_paths(
+        results_dir, args.markets, date_time_now, args.format
     )
+    sweep_params = {
+        "iata_codes": get_iata_codes(),
+        "date_from": date_now,
+        "date_to": date_end,
+        "duration_from": 1,
+        "duration_to": 5,
+    }
+    if args.resume is not None:
+        output_paths = {}
+        for output_path in args.resume:
+            journal_path = f"{output_path}{JOURNAL_SUFFIX}"
+            # Opening a journal creates it, so check first.
+            if not os.path.exists(journal_path):
+                exception_message = f"No journal found for '{output_path}'."
+                raise FileNotFoundError(exception_message)
+            with SweepJournal(journal_path) as journal:
+                if journal.params is None:
+                    exception_message = f"No journal found for '{output_path}'."
+                    raise FileNotFoundError(exception_message)
+                sweep_params = dict(journal.params)
+            output_paths[sweep_params.pop("market")] = output_path
+
+    if args.metrics_out is not None:
+        utils.set_metrics()
+
     print("Downloading...")
-    download_ryanair(
-        iata_codes=IATA_CODES,
-        date_from=date_now,
-        date_to=date_end,
-        duration_from=1,
-        duration_to=5,
-        market="es",
-        output_path=output_path,
+    failures = download_markets(
+        **sweep_params,
+        output_paths=output_paths,
+        max_workers=args.max_workers,
+        requests_per_second=args.requests_per_second,
+        adaptive_rate_limit=args.adaptive_rate_limit,
+        chunk_days=args.chunk_days,
+        delta_roots=market_roots if args.delta else None,
+        keyframe_interval=args.keyframe_interval,
+        stream=args.stream,
     )
+    for market, market_failures in failures.items():
+        for iata, error in market_failures.items():
+            print(f"{iata} ({market}) failed: {error}")
+    if any(failures.values()):
+        resume_paths = " ".join(output_paths.values())
+        print(f"Run again with --resume {resume_paths} to retry the failed airports.")
+    if args.metrics_out is not None:
+        utils.metrics.save(args.metrics_out)
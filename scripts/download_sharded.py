@@ -0,0 +1,309 @@
+"""
+usage:
+python download_sharded.py \
+    --queue ../ryanair_timecapsule_results/queue.sqlite \
+    --enqueue \
+    --workers 4 \
+    --max-workers 8 \
+    --requests-per-second 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+import requests
+from download_ryanair import download_airport, snapshot_paths
+
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.constants import get_iata_codes
+from ryanair_timecapsule.collector.queue import WorkQueue, sweep_jobs
+from ryanair_timecapsule.storage.snapshot import (
+    JSONL_SUFFIX,
+    TAR_SUFFIX,
+    SnapshotWriter,
+)
+
+
+def shard_path(output_path: str, worker: str) -> str:
+    """Returns the snapshot written by a worker next to the snapshot of the sweep,
+    e.g. `06:00:00.<worker>.jsonl.gz` for `06:00:00.jsonl.gz`."""
+    for suffix in [JSONL_SUFFIX, TAR_SUFFIX]:
+        if output_path.endswith(suffix):
+            return f"{output_path[: -len(suffix)]}.{worker}{suffix}"
+    raise ValueError(
+        f"'{output_path}' needs to end with '{JSONL_SUFFIX}' or '{TAR_SUFFIX}'."
+    )
+
+
+def enqueue_sweep(
+    queue: WorkQueue,
+    results_dir: str,
+    markets: list | None,
+    n_days: int = 365,
+    window_days: int = 31,
+    suffix: str = JSONL_SUFFIX,
+) -> int:
+    """Queues the jobs of a sweep of the next n_days days, one per airport, market
+    and window of window_days days.
+
+    Returns:
+        int: The number of jobs added.
+    """
+    captured_at = datetime.now()
+    _, output_paths = snapshot_paths(results_dir, markets, captured_at, suffix)
+    params = {
+        "date_from": captured_at.date().isoformat(),
+        "date_to": (captured_at + timedelta(n_days - 1)).date().isoformat(),
+        "duration_from": 1,
+        "duration_to": 5,
+        "window_days": window_days,
+        "output_paths": output_paths,
+    }
+    jobs = sweep_jobs(
+        get_iata_codes(),
+        list(output_paths),
+        params["date_from"],
+        params["date_to"],
+        window_days,
+    )
+    return queue.start(params, jobs)
+
+
+def run_worker(
+    queue_path: str,
+    max_workers: int = 1,
+    requests_per_second: float | None = None,
+    adaptive_rate_limit: bool = False,
+    lease_seconds: float = 300,
+    max_attempts: int = 3,
+    poll_seconds: float = 1.0,
+) -> int:
+    """Downloads the jobs of a queue until the sweep is finished.
+
+    Each market is written to a snapshot of this worker, see `shard_path`. When no
+    job can be leased but other workers still hold some, the worker waits, so that
+    the jobs of a worker that died are taken over once their lease expires. The
+    leases of the jobs in progress are renewed every third of lease_seconds, so
+    that a slow job is not handed to another worker.
+
+    Args:
+        queue_path (str): Path of the queue, see `WorkQueue`.
+        max_workers (int): Number of jobs downloaded concurrently by this worker.
+        requests_per_second (float | None): Maximum number of requests per second
+         sent to the API by this worker. If None, the requests are not rate limited.
+        adaptive_rate_limit (bool): If True, requests_per_second is the initial rate,
+         which then adapts to the throttling of the API (see `AdaptiveRateLimiter`).
+        lease_seconds (float): How long a job is held before it is leased again.
+        max_attempts (int): Number of attempts before a job is left failed.
+        poll_seconds (float): Wait before asking again for a job.
+
+    Returns:
+        int: The number of jobs done by this worker.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers needs to be at least 1.")
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+
+    utils.set_pool_size(max_workers)
+    utils.set_rate_limit(
+        requests_per_second, adaptive=adaptive_rate_limit, max_concurrency=max_workers
+    )
+
+    n_done = 0
+    n_done_lock = threading.Lock()
+    with ExitStack() as stack:
+        queue = stack.enter_context(
+            WorkQueue(
+                queue_path, lease_seconds=lease_seconds, max_attempts=max_attempts
+            )
+        )
+        params = queue.params
+        if params is None:
+            raise ValueError(f"No sweep was queued in '{queue_path}'.")
+        writers = {}
+        writers_lock = threading.Lock()
+
+        def get_writer(market: str) -> SnapshotWriter:
+            # The snapshots are only created for the markets this worker gets.
+            with writers_lock:
+                if market not in writers:
+                    path = shard_path(params["output_paths"][market], worker)
+                    writers[market] = stack.enter_context(SnapshotWriter(path))
+                return writers[market]
+
+        def work():
+            nonlocal n_done
+            while True:
+                lease = queue.lease(worker)
+                if lease is None:
+                    if queue.is_finished():
+                        return
+                    time.sleep(poll_seconds)
+                    continue
+                try:
+                    result = download_airport(
+                        iata=lease.payload["iata"],
+                        date_from=lease.payload["date_from"],
+                        date_to=lease.payload["date_to"],
+                        duration_from=params["duration_from"],
+                        duration_to=params["duration_to"],
+                        market=lease.payload["market"],
+                    )
+                except (requests.RequestException, ValueError) as e:
+                    queue.fail(worker, lease.name, e)
+                    continue
+                get_writer(lease.payload["market"]).write(
+                    lease.name.split("/")[-1], result
+                )
+                queue.complete(worker, lease.name)
+                with n_done_lock:
+                    n_done += 1
+
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.wait(lease_seconds / 3):
+                queue.renew(worker)
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for future in [executor.submit(work) for _ in range(max_workers)]:
+                    future.result()
+        finally:
+            stopped.set()
+            heartbeat_thread.join()
+    return n_done
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to spread the daily sweep of the fare_finder "
+            "API over several processes and hosts sharing a work queue."
+        )
+    )
+
+    params.add_argument(
+        "--queue",
+        required=True,
+        type=str,
+        help=(
+            "Path of the SQLite work queue of the sweep, on a file system shared by "
+            "all the hosts."
+        ),
+    )
+
+    params.add_argument(
+        "--enqueue",
+        action="store_true",
+        help=(
+            "If provided, the jobs of a sweep of today are queued first. Run it once, "
+            "the other hosts only start workers. The queue of a finished sweep, e.g. "
+            "of the previous day, is replaced."
+        ),
+    )
+
+    params.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of worker processes started on this host. 0 only queues.",
+    )
+
+    params.add_argument(
+        "--max-workers",
+        default=8,
+        type=int,
+        help="Number of jobs downloaded concurrently by each worker process.",
+    )
+
+    params.add_argument(
+        "--requests-per-second",
+        default=None,
+        type=float,
+        help="Maximum number of requests per second sent by each worker process.",
+    )
+
+    params.add_argument("--adaptive-rate-limit", action="store_true")
+
+    params.add_argument(
+        "--window-days",
+        default=31,
+        type=int,
+        help="Number of departure days of each job, with --enqueue.",
+    )
+
+    params.add_argument(
+        "--markets",
+        default=None,
+        nargs="+",
+        help="Markets swept, with --enqueue, see download_ryanair.py. By default es.",
+    )
+
+    params.add_argument(
+        "--format", default=JSONL_SUFFIX, choices=[JSONL_SUFFIX, TAR_SUFFIX]
+    )
+
+    params.add_argument(
+        "--lease-seconds",
+        default=300,
+        type=float,
+        help="Seconds after which the job of a silent worker is given to another.",
+    )
+
+    params.add_argument("--max-attempts", default=3, type=int)
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    output_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results_dir = os.path.join(output_dir, "ryanair_timecapsule_results")
+
+    if args.enqueue:
+        with WorkQueue(args.queue) as queue:
+            n_jobs = enqueue_sweep(
+                queue,
+                results_dir,
+                args.markets,
+                window_days=args.window_days,
+                suffix=args.format,
+            )
+        print(f"{n_jobs} jobs queued.")
+
+    # Spawned, so that the workers do not share the connections of this process.
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_worker,
+            kwargs={
+                "queue_path": args.queue,
+                "max_workers": args.max_workers,
+                "requests_per_second": args.requests_per_second,
+                "adaptive_rate_limit": args.adaptive_rate_limit,
+                "lease_seconds": args.lease_seconds,
+                "max_attempts": args.max_attempts,
+            },
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    with WorkQueue(args.queue) as queue:
+        print(queue.counts())
+        for name, error in queue.failures().items():
+            print(f"{name} failed: {error}")
@@ -0,0 +1,112 @@
+"""
+usage:
+python export_dataset.py \
+    --snapshots ../ryanair_timecapsule_results \
+    --out-dir ../ryanair_timecapsule_dataset \
+    --index ../ryanair_timecapsule_results/index.sqlite
+"""
+
+import argparse
+import functools
+import os
+
+from ryanair_timecapsule.storage.dataset import flatten_result, write_dataset
+from ryanair_timecapsule.storage.delta import read_snapshot
+from ryanair_timecapsule.storage.index import SnapshotIndex
+from ryanair_timecapsule.storage.reader import map_snapshots
+from ryanair_timecapsule.storage.snapshot import find_snapshots
+
+
+def export_snapshot(snapshot_path: str, out_dir: str, root: str) -> int:
+    """Flattens every result of a snapshot and writes them to the dataset.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rows = []
+    for _, result in read_snapshot(snapshot_path):
+        rows.extend(flatten_result(result))
+
+    # Name the files after the snapshot so that exporting it again replaces them.
+    basename = os.path.relpath(snapshot_path, root).replace(os.sep, "_")
+    write_dataset(rows, out_dir, basename=basename)
+    return len(rows)
+
+
+def parse_args():
+    params = argparse.ArgumentParser(
+        usage=(
+            "This script is intended to convert the downloaded snapshots into a "
+            "columnar Parquet dataset."
+        )
+    )
+
+    params.add_argument(
+        "--snapshots",
+        required=True,
+        type=str,
+        help="Path to a snapshot or to a directory that is searched recursively.",
+    )
+
+    params.add_argument(
+        "--out-dir",
+        required=True,
+        type=str,
+        help="Path to the root directory of the Parquet dataset.",
+    )
+
+    params.add_argument(
+        "--index",
+        default=None,
+        type=str,
+        help=(
+            "Path to the SQLite snapshot index. If provided, only the snapshots that "
+            "were not exported yet are processed."
+        ),
+    )
+
+    params.add_argument(
+        "--workers",
+        default=None,
+        type=int,
+        help=(
+            "Number of snapshots converted in parallel processes. By default the "
+            "number of cores."
+        ),
+    )
+
+    return params.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not os.path.exists(args.snapshots):
+        exception_message = f"The path '{args.snapshots}' is not a valid path."
+        raise FileNotFoundError(exception_message)
+
+    root = args.snapshots
+    if not os.path.isdir(root):
+        root = os.path.dirname(root)
+    if args.index is None:
+        export = functools.partial(export_snapshot, out_dir=args.out_dir, root=root)
+        snapshot_paths = find_snapshots(args.snapshots)
+        for snapshot_path, n_rows in map_snapshots(
+            export, snapshot_paths, max_workers=args.workers
+        ):
+            print(f"{snapshot_path}: {n_rows} fares")
+    else:
+        root = os.path.abspath(root)
+        export = functools.partial(export_snapshot, out_dir=args.out_dir, root=root)
+        with SnapshotIndex(args.index) as index:
+            index.update(args.snapshots)
+            snapshot_paths = [
+                snapshot_path
+                for snapshot_path in index.pending(consumer="export_dataset")
+                if os.path.commonpath([snapshot_path, root]) == root
+            ]
+            for snapshot_path, n_rows in map_snapshots(
+                export, snapshot_paths, max_workers=args.workers
+            ):
+                index.mark_processed(consumer="export_dataset", path=snapshot_path)
+                print(f"{snapshot_path}: {n_rows} fares")
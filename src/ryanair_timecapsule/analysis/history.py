@@ -0,0 +1,244 @@
+from collections.abc import Iterable
+
+import numpy as np
+
+from ..storage.dataset import read_dataset
+
+
+class FareHistory:
+    """Captured fares as NumPy arrays sorted by (route, departure, feed, capture
+    time).
+
+    Every flight, i.e. a route and a departure time, seen through a feed, i.e. a
+    source, market and currency, forms a group of consecutive observations. So the
+    price evolution of a flight across captures is a slice, prices of different
+    feeds are never compared, and all the computations are vectorized over the
+    whole history.
+
+    Args:
+        origin (Iterable[str]): IATA code of the departure airport of each fare.
+        destination (Iterable[str]): IATA code of the arrival airport of each fare.
+        departure (Iterable): Departure time of each fare.
+        captured_at (Iterable): When each fare was captured.
+        price (Iterable[float]): The price of each fare.
+        source (Iterable[str] | None): The source of each fare, see
+         `storage.dataset`. By default all the fares have the same one.
+        market (Iterable[str] | None): The market of each fare.
+        currency (Iterable[str] | None): The currency of each fare.
+    """
+
+    def __init__(
+        self,
+        origin: Iterable,
+        destination: Iterable,
+        departure: Iterable,
+        captured_at: Iterable,
+        price: Iterable,
+        source: Iterable | None = None,
+        market: Iterable | None = None,
+        currency: Iterable | None = None,
+    ):
+        # Encode the airports as integers, strings are only built for unique routes.
+        origins, origin_id = np.unique(
+            np.asarray(origin, dtype=str), return_inverse=True
+        )
+        destinations, destination_id = np.unique(
+            np.asarray(destination, dtype=str), return_inverse=True
+        )
+        pairs, route_id = np.unique(
+            origin_id * len(destinations) + destination_id, return_inverse=True
+        )
+        # Sorted like the pairs, as all the IATA codes have 3 letters.
+        self.routes = np.array(
+            [
+                f"{origins[origin_index]}-{destinations[destination_index]}"
+                for origin_index, destination_index in zip(
+                    *divmod(pairs, len(destinations))
+                )
+            ]
+        )
+        departure = np.asarray(departure, dtype="datetime64[m]")
+        captured_at = np.asarray(captured_at, dtype="datetime64[s]")
+        price = np.asarray(price, dtype=np.float64)
+
+        # Encode the feeds as integers, e.g. `fare_finder/es/EUR`.
+        feed_code = np.zeros(len(price), dtype=np.int64)
+        feed_values = []
+        for values in [source, market, currency]:
+            if values is None:
+                values = np.full(len(price), "")
+            uniques, ids = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+            feed_code = feed_code * len(uniques) + ids
+            feed_values.append((uniques, ids))
+        _, first, feed_id = np.unique(feed_code, return_index=True, return_inverse=True)
+        self.feeds = np.array(
+            [
+                "/".join(uniques[ids[row]] for uniques, ids in feed_values)
+                for row in first
+            ],
+            dtype=str,
+        )
+
+        # A flight is identified by its route and departure minute. Sorting by
+        # capture time and then, stably, by feed and by flight is faster than a
+        # lexsort.
+        flight_key = (route_id.astype(np.int64) << 32) | departure.astype(np.int64)
+        order = np.argsort(captured_at, kind="stable")
+        order = order[np.argsort(feed_id[order], kind="stable")]
+        order = order[np.argsort(flight_key[order], kind="stable")]
+        self.route_id = route_id[order]
+        self.departure = departure[order]
+        self.captured_at = captured_at[order]
+        self.price = price[order]
+        self.flight_key = flight_key[order]
+        self.feed_id = feed_id[order]
+        self.group_start = np.ones(len(self.price), dtype=bool)
+        self.group_start[1:] = (self.flight_key[1:] != self.flight_key[:-1]) | (
+            self.feed_id[1:] != self.feed_id[:-1]
+        )
+        self.group_id = np.cumsum(self.group_start) - 1
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @classmethod
+    def from_records(cls, rows: Iterable[dict]) -> "FareHistory":
+        """Builds the history from flattened rows, see `storage.dataset`."""
+        rows = list(rows)
+        return cls(
+            origin=[row["origin"] for row in rows],
+            destination=[row["destination"] for row in rows],
+            departure=[row["departure"] for row in rows],
+            captured_at=[row["captured_at"] for row in rows],
+            price=[row["price"] for row in rows],
+            source=[row.get("source") for row in rows],
+            market=[row.get("market") for row in rows],
+            currency=[row.get("currency") for row in rows],
+        )
+
+    @classmethod
+    def from_dataset(cls, root: str, filter=None) -> "FareHistory":
+        """Builds the history from a Parquet dataset written by `write_dataset`,
+        reading only the needed columns.
+
+        Args:
+            root (str): The root directory of the dataset.
+            filter (pyarrow.compute.Expression): Optional filter, e.g. on `origin`.
+        """
+        columns = [
+            "origin",
+            "destination",
+            "departure",
+            "captured_at",
+            "price",
+            "source",
+            "market",
+            "currency",
+        ]
+        table = read_dataset(root).to_table(columns=columns, filter=filter)
+        return cls(**{column: table.column(column).to_numpy() for column in columns})
+
+    def route_key(self, origin: str, destination: str, departure) -> int:
+        """Returns the flight key of a route and departure time, or -1 if unknown."""
+        route = f"{origin}-{destination}"
+        position = np.searchsorted(self.routes, route)
+        if position == len(self.routes) or self.routes[position] != route:
+            return -1
+        minutes = np.datetime64(departure, "m").astype(np.int64)
+        return (int(position) << 32) | int(minutes)
+
+    def series(
+        self, origin: str, destination: str, departure, feed: str | None = None
+    ) -> tuple:
+        """Returns how the price of a flight evolved across captures.
+
+        Args:
+            origin (str): IATA code of the departure airport.
+            destination (str): IATA code of the arrival airport.
+            departure (datetime | str): The departure time of the flight.
+            feed (str | None): The feed of the prices, one of `feeds`, e.g.
+             `fare_finder/es/EUR`. Needed if the flight has prices of several feeds.
+
+        Returns:
+            tuple: The capture times and the prices, sorted by capture time.
+        """
+        key = self.route_key(origin, destination, departure)
+        start = np.searchsorted(self.flight_key, key, side="left")
+        end = np.searchsorted(self.flight_key, key, side="right")
+        # The feeds of a flight are sorted.
+        feed_ids = self.feed_id[start:end]
+        if feed is not None:
+            matches = np.nonzero(self.feeds == feed)[0]
+            feed_id = matches[0] if len(matches) else -1
+            start, end = start + np.searchsorted(feed_ids, [feed_id, feed_id + 1])
+        elif len(feed_ids) and feed_ids[0] != feed_ids[-1]:
+            raise ValueError(
+                f"The flight has prices of several feeds, pick one of "
+                f"{sorted(set(self.feeds[feed_ids]))}."
+            )
+        return self.captured_at[start:end], self.price[start:end]
+
+    def price_deltas(self) -> np.ndarray:
+        """Returns the price change of each observation since the previous capture
+        of the same flight, NaN for the first capture."""
+        deltas = np.empty(len(self.price))
+        deltas[1:] = self.price[1:] - self.price[:-1]
+        deltas[self.group_start] = np.nan
+        return deltas
+
+    def days_to_departure(self) -> np.ndarray:
+        """Returns the number of days between each capture and the departure."""
+        delta = self.departure.astype("datetime64[s]") - self.captured_at
+        return delta / np.timedelta64(1, "D")
+
+    def departure_curve(self, max_days: int = 365) -> tuple:
+        """Returns the mean price by whole days to departure, over all flights.
+
+        Args:
+            max_days (int): Observations captured earlier than this are ignored.
+
+        Returns:
+            tuple: The days to departure and the mean price, for the days with
+             observations.
+        """
+        days = np.floor(self.days_to_departure()).astype(np.int64)
+        valid = (days >= 0) & (days <= max_days)
+        counts = np.bincount(days[valid], minlength=max_days + 1)
+        totals = np.bincount(
+            days[valid], weights=self.price[valid], minlength=max_days + 1
+        )
+        observed = np.nonzero(counts)[0]
+        return observed, totals[observed] / counts[observed]
+
+    def rolling_min(self, window: int) -> np.ndarray:
+        """Returns the minimum price of the last `window` captures of each flight,
+        the current one included."""
+        if window < 1:
+            raise ValueError("window needs to be at least 1.")
+        minimum = self.price.copy()
+        for lag in range(1, min(window, len(self.price))):
+            same_flight = self.group_id[lag:] == self.group_id[:-lag]
+            np.minimum(
+                minimum[lag:],
+                np.where(same_flight, self.price[:-lag], np.inf),
+                out=minimum[lag:],
+            )
+        return minimum
+
+    def drops(self, threshold: float = 0.0, relative: bool = False) -> np.ndarray:
+        """Returns a mask of the observations whose price dropped since the previous
+        capture of the same flight.
+
+        Args:
+            threshold (float): Minimum drop, in currency units or as a fraction of
+             the previous price if relative is True.
+            relative (bool): If True, the threshold is a fraction of the price.
+        """
+        deltas = self.price_deltas()
+        if relative:
+            previous = np.empty(len(self.price))
+            previous[1:] = self.price[:-1]
+            previous[0] = np.nan
+            deltas = deltas / previous
+        with np.errstate(invalid="ignore"):
+            return deltas < -threshold
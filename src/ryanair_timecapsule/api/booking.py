@@ -1,12 +1,24 @@
+import asyncio
+import functools
+import threading
+import time
 from datetime import date
 
+import requests
 from pydantic import BaseModel, Field, field_validator
 
 from . import utils
-from .constants import MARKETS
+from .models import BookingResponse, parse_booking
+from .params import ParamsTemplate
 
 ENDPOINT = "https://www.ryanair.com/api/booking/v4/en-gb/availability"
 AUTH_ENDPOINT = "https://www.ryanair.com/gb/en/trip/flights/select?"
+# Used when the session cookies do not carry an expiry date.
+SESSION_TTL = 15 * 60
+# Statuses of an availability request made with expired or revoked cookies.
+REJECTED_STATUS_CODES = {401, 403, 409}
+# Widest flexible range accepted around DateOut and DateIn, on each side.
+MAX_FLEX_DAYS = 6
 
 
 class Params(BaseModel, extra="forbid"):
@@ -22,10 +34,10 @@ class Params(BaseModel, extra="forbid"):
     RoundTrip: bool = Field(default=True)
     promoCode: str = Field(default="")
     IncludeConnectingFlights: bool = Field(default=False)
-    FlexDaysBeforeOut: int = Field(default=2)
-    FlexDaysOut: int = Field(default=2)
-    FlexDaysBeforeIn: int = Field(default=2)
-    FlexDaysIn: int = Field(default=2)
+    FlexDaysBeforeOut: int = Field(default=2, ge=0, le=MAX_FLEX_DAYS)
+    FlexDaysOut: int = Field(default=2, ge=0, le=MAX_FLEX_DAYS)
+    FlexDaysBeforeIn: int = Field(default=2, ge=0, le=MAX_FLEX_DAYS)
+    FlexDaysIn: int = Field(default=2, ge=0, le=MAX_FLEX_DAYS)
     IncludePrimeFares: bool = Field(default=False)
 
     @field_validator("DateOut", "DateIn")
@@ -37,8 +49,38 @@ class Params(BaseModel, extra="forbid"):
         return value
 
 
-# Request the data from booking
-def get_flights_booking(
+def format_value(value):
+    """The API expects lowercase booleans."""
+    return str(value).lower() if isinstance(value, bool) else value
+
+
+@functools.lru_cache(maxsize=64)
+def get_params_template(
+    n_adults: int,
+    n_teenagers: int,
+    n_children: int,
+    n_infants: int,
+    flex_days_before: int,
+    flex_days_after: int,
+) -> ParamsTemplate:
+    """Returns the template of the parameters shared by the queries of a sweep,
+    validated on the first call only."""
+    return ParamsTemplate(
+        Params,
+        format_value=format_value,
+        ADT=n_adults,
+        TEEN=n_teenagers,
+        CHD=n_children,
+        INF=n_infants,
+        ToUs="AGREED",
+        FlexDaysBeforeOut=flex_days_before,
+        FlexDaysOut=flex_days_after,
+        FlexDaysBeforeIn=flex_days_before,
+        FlexDaysIn=flex_days_after,
+    )
+
+
+def build_request(
     n_adults: int,
     n_teenagers: int,
     n_children: int,
@@ -47,18 +89,34 @@ def get_flights_booking(
     destination_iata_code: str,
     depart_date_from: str,
     depart_date_to: str,
-) -> dict:
+    flex_days_before: int = 2,
+    flex_days_after: int = 2,
+) -> tuple[dict, dict, dict]:
+    """Validates the arguments and builds the requests of the booking API.
 
-    parameters = Params(
-        ADT=n_adults,
-        TEEN=n_teenagers,
-        CHD=n_children,
-        INF=n_infants,
+    The flexible days apply to both the outbound and the inbound dates, e.g. with
+    2 days before and after, flights 2 days around each date are returned.
+
+    The passengers and flexible days are validated once per combination (see
+    `get_params_template`), only the route and the dates are validated per call.
+
+    Returns:
+        tuple[dict, dict, dict]: The availability query parameters, the headers
+         and the query parameters of the authentication request.
+    """
+    template = get_params_template(
+        n_adults=n_adults,
+        n_teenagers=n_teenagers,
+        n_children=n_children,
+        n_infants=n_infants,
+        flex_days_before=flex_days_before,
+        flex_days_after=flex_days_after,
+    )
+    api_params = template.build(
         Origin=depart_iata_code,
         Destination=destination_iata_code,
         DateOut=depart_date_from,
         DateIn=depart_date_to,
-        ToUs="AGREED",
     )
 
     headers = {
@@ -83,19 +141,210 @@ def get_flights_booking(
         "discount": 0,
         "promoCode": "",
     }
+    return api_params, headers, auth_params
 
-    auth_response = utils.call_api(
-        url=AUTH_ENDPOINT, params=auth_params, return_json=False, headers=headers
-    )
-    rid = auth_response.cookies.get("rid")
-    rid_sig = auth_response.cookies.get("rid.sig")
+
+def check_auth_cookies(cookies):
+    """Ensures the authentication response set the session cookies."""
+    rid = cookies.get("rid")
+    rid_sig = cookies.get("rid.sig")
     if not rid or not rid_sig:
         raise ValueError("'rid' and 'rid.sig' not found among cookies.")
 
-    api_params = {
-        k: str(v).lower() if isinstance(v, bool) else v
-        for k, v in parameters.model_dump().items()
-    }
-    return utils.call_api(
-        url=ENDPOINT, params=api_params, return_json=True, headers=headers
+
+def get_cookie_expiry(cookies) -> float | None:
+    """Returns the expiry timestamp of the 'rid' cookie, if it has one."""
+    for cookie in getattr(cookies, "jar", cookies):
+        if cookie.name == "rid" and cookie.expires:
+            return float(cookie.expires)
+    return None
+
+
+def is_rejected(error: Exception) -> bool:
+    """Whether an HTTP error means that the session cookies were rejected."""
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code in REJECTED_STATUS_CODES
+
+
+class AuthSession:
+    """Tracks the validity of the booking session cookies.
+
+    The cookies set by the authentication endpoint are kept by the HTTP sessions
+    of `utils`, so they only need to be requested again once they expire or the
+    availability endpoint rejects them. Concurrent callers share a single
+    authentication request. The synchronous session and the asynchronous client
+    keep separate cookies, so each one has its own `AuthSession`.
+
+    Args:
+        ttl (float): Lifetime in seconds of cookies without an expiry date.
+        margin (float): Cookies are renewed this many seconds before they expire.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, margin: float = 30.0):
+        self.ttl = ttl
+        self.margin = margin
+        self.expires_at = 0.0
+        self.n_authentications = 0
+        self._lock = threading.Lock()
+        self._async_lock = None
+        self._async_loop = None
+        self._async_client = None
+
+    def is_valid(self) -> bool:
+        return time.time() < self.expires_at - self.margin
+
+    def invalidate(self):
+        self.expires_at = 0.0
+
+    def _update(self, auth_response):
+        check_auth_cookies(auth_response.cookies)
+        expiry = get_cookie_expiry(auth_response.cookies)
+        self.expires_at = min(time.time() + self.ttl, expiry or float("inf"))
+        self.n_authentications += 1
+
+    def authenticate(self, headers: dict, auth_params: dict):
+        """Requests new cookies unless the current ones are still valid."""
+        with self._lock:
+            if self.is_valid():
+                return
+            auth_response = utils.call_api(
+                url=AUTH_ENDPOINT,
+                params=auth_params,
+                return_json=False,
+                headers=headers,
+            )
+            self._update(auth_response)
+
+    async def authenticate_async(self, headers: dict, auth_params: dict):
+        """Asynchronous version of `authenticate`."""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_lock = asyncio.Lock()
+            self._async_loop = loop
+        async with self._async_lock:
+            # A new client, e.g. after `utils.close_async_session`, has no cookies.
+            if self.is_valid() and utils.async_session is self._async_client:
+                return
+            auth_response = await utils.async_call_api(
+                url=AUTH_ENDPOINT,
+                params=auth_params,
+                return_json=False,
+                headers=headers,
+            )
+            self._update(auth_response)
+            self._async_client = utils.async_session
+
+
+auth_session = AuthSession()
+async_auth_session = AuthSession()
+
+
+def get_availability(
+    api_params: dict, headers: dict, typed: bool = False
+) -> dict | BookingResponse:
+    """Calls the availability endpoint, parsing the raw response if typed."""
+    if not typed:
+        return utils.call_api(
+            url=ENDPOINT, params=api_params, return_json=True, headers=headers
+        )
+    response = utils.call_api(
+        url=ENDPOINT, params=api_params, return_json=False, headers=headers
+    )
+    return parse_booking(response.content)
+
+
+async def async_get_availability(
+    api_params: dict, headers: dict, typed: bool = False
+) -> dict | BookingResponse:
+    """Asynchronous version of `get_availability`."""
+    if not typed:
+        return await utils.async_call_api(
+            url=ENDPOINT, params=api_params, return_json=True, headers=headers
+        )
+    response = await utils.async_call_api(
+        url=ENDPOINT, params=api_params, return_json=False, headers=headers
     )
+    return parse_booking(response.content)
+
+
+# Request the data from booking
+def get_flights_booking(
+    n_adults: int,
+    n_teenagers: int,
+    n_children: int,
+    n_infants: int,
+    depart_iata_code: str,
+    destination_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    flex_days_before: int = 2,
+    flex_days_after: int = 2,
+    typed: bool = False,
+) -> dict | BookingResponse:
+    """Requests the flights of a route around the outbound and inbound dates.
+
+    Args:
+        typed (bool): If True, the raw response is parsed into a `BookingResponse`
+         (see `models`) instead of a dict.
+    """
+    api_params, headers, auth_params = build_request(
+        n_adults=n_adults,
+        n_teenagers=n_teenagers,
+        n_children=n_children,
+        n_infants=n_infants,
+        depart_iata_code=depart_iata_code,
+        destination_iata_code=destination_iata_code,
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        flex_days_before=flex_days_before,
+        flex_days_after=flex_days_after,
+    )
+
+    auth_session.authenticate(headers, auth_params)
+    try:
+        return get_availability(api_params, headers, typed)
+    except requests.HTTPError as error:
+        if not is_rejected(error):
+            raise
+    # The cookies expired early, authenticate again and retry once.
+    auth_session.invalidate()
+    auth_session.authenticate(headers, auth_params)
+    return get_availability(api_params, headers, typed)
+
+
+async def async_get_flights_booking(
+    n_adults: int,
+    n_teenagers: int,
+    n_children: int,
+    n_infants: int,
+    depart_iata_code: str,
+    destination_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    flex_days_before: int = 2,
+    flex_days_after: int = 2,
+    typed: bool = False,
+) -> dict | BookingResponse:
+    """Asynchronous version of `get_flights_booking`."""
+    api_params, headers, auth_params = build_request(
+        n_adults=n_adults,
+        n_teenagers=n_teenagers,
+        n_children=n_children,
+        n_infants=n_infants,
+        depart_iata_code=depart_iata_code,
+        destination_iata_code=destination_iata_code,
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        flex_days_before=flex_days_before,
+        flex_days_after=flex_days_after,
+    )
+
+    await async_auth_session.authenticate_async(headers, auth_params)
+    try:
+        return await async_get_availability(api_params, headers, typed)
+    except utils.AsyncHTTPStatusError as error:
+        if not is_rejected(error):
+            raise
+    async_auth_session.invalidate()
+    await async_auth_session.authenticate_async(headers, auth_params)
+    return await async_get_availability(api_params, headers, typed)
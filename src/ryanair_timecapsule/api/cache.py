@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(url: str, params: dict = None) -> str:
+    """Returns the key of a request, the same whatever the order of the params."""
+    normalized = json.dumps(
+        [url, {k: str(v) for k, v in (params or {}).items()}], sort_keys=True
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Cache of the JSON responses of `call_api`, in memory and optionally on disk.
+
+    A response younger than `ttl` seconds is returned without any request. Once
+    stale, it is revalidated with `If-None-Match`/`If-Modified-Since` when the API
+    sent an `ETag` or `Last-Modified` header, so an unchanged response costs a
+    `304 Not Modified` instead of the whole body. Stale entries are dropped after
+    `max_stale` seconds, or straight away if they can not be revalidated.
+
+    Args:
+        ttl (float): Number of seconds a response is used without revalidation.
+        max_entries (int): Number of responses kept in memory, the least recently
+         used ones are evicted first.
+        cache_dir (str | None): Directory of the on-disk tier, shared between
+         processes and runs. If None, responses are only kept in memory.
+        max_stale (float): Number of seconds a stale response is kept for
+         revalidation.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        max_entries: int = 256,
+        cache_dir: str | None = None,
+        max_stale: float = 24 * 60 * 60,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir and os.path.expanduser(cache_dir)
+        self.max_stale = max_stale
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _get(self, key: str) -> dict | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        if self.cache_dir is None or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Removed by another process or corrupted, request it again.
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _put(self, key: str, entry: dict):
+        self._remember(key, entry)
+        if self.cache_dir is not None:
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+
+    def _delete(self, key: str):
+        self._memory.pop(key, None)
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Whether a cached response can be used without revalidation."""
+        return time.time() - entry["stored_at"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """Returns the headers that revalidate a cached response."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def lookup(self, url: str, params: dict = None) -> dict | None:
+        """Looks a request up.
+
+        Returns:
+            dict | None: The cached entry, with the response in `body`, if it is
+             fresh or can be revalidated (see `is_fresh`), None otherwise.
+        """
+        key = cache_key(url, params)
+        with self._lock:
+            entry = self._get(key)
+            if entry is not None and self.is_fresh(entry):
+                self.hits += 1
+                return entry
+            if entry is not None:
+                age = time.time() - entry["stored_at"]
+                if self.conditional_headers(entry) and age < self.ttl + self.max_stale:
+                    return entry
+                self._delete(key)
+            self.misses += 1
+            return None
+
+    def store(self, url: str, params: dict, body, headers) -> object:
+        """Caches the body of a response with its validators and returns it."""
+        entry = {
+            "url": url,
+            "params": params,
+            "stored_at": time.time(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "body": body,
+        }
+        with self._lock:
+            self._put(cache_key(url, params), entry)
+        return body
+
+    def revalidated(self, url: str, params: dict, entry: dict) -> object:
+        """Marks a cached entry as fresh again after a `304 Not Modified`, and
+        returns its body."""
+        with self._lock:
+            self.revalidations += 1
+            self._put(cache_key(url, params), {**entry, "stored_at": time.time()})
+        return entry["body"]
+
+    def clear(self):
+        """Removes every cached response, from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir is not None:
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(self.cache_dir, name))
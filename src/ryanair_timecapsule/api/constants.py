@@ -1,28 +1,156 @@
+import json
+import os
+import threading
+import time
+import warnings
+
 import requests
 
 MARKETS_ENDPOINT = "https://www.ryanair.com/content/ryanair.markets.json"
 ACTIVE_IATA_ENDPOINT = "https://www.ryanair.com/api/views/locate/5/airports/en/active"
 
+# The reference data is downloaded on first access and kept on disk for CACHE_TTL
+# seconds, so importing the package does not need the network.
+CACHE_DIR = os.environ.get(
+    "RYANAIR_TIMECAPSULE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "ryanair_timecapsule"),
+)
+CACHE_TTL = 24 * 60 * 60
+# Seconds to wait for the reference data, so that a stalled download does not
+# hang the start of a sweep.
+REQUEST_TIMEOUT = 30
+
+_lock = threading.Lock()
+_loaded = {}
+
+
 def download_active_market() -> set:
     """Makes a request to a specific URL and returns the active Ryanair market codes
 
     Returns:
         set: The active Ryanair markets.
     """
-    response = requests.get(MARKETS_ENDPOINT).json()
+    response = requests.get(MARKETS_ENDPOINT, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    response = response.json()
     market_codes = {country["code"] for country in response}
     return market_codes
 
+
 def download_active_iata_codes() -> set:
     """Makes a request to a specific URL and returns the active Ryanair IATA codes
 
     Returns:
         set: The active Ryanair IATA codes.
     """
-    response = requests.get(ACTIVE_IATA_ENDPOINT).json()
+    response = requests.get(ACTIVE_IATA_ENDPOINT, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    response = response.json()
     iata_codes = set([country["code"] for country in response])
     return iata_codes
 
 
-MARKETS = download_active_market()
-IATA_CODES = download_active_iata_codes()
\ No newline at end of file
+def load_reference_data(name: str, ttl: float = None, refresh: bool = False) -> set:
+    """Returns the reference set `name` ("markets" or "iata_codes").
+
+    The set is looked up in memory, then in the on-disk cache if it is younger
+    than `ttl` seconds, and downloaded otherwise. If the download fails, e.g. with
+    an HTTP error, a response that is not JSON or JSON of another shape, a stale
+    on-disk copy is used when available. A cache that cannot be read or written
+    is ignored.
+
+    Args:
+        name (str): The reference set to load, "markets" or "iata_codes".
+        ttl (float): Maximum age in seconds of the on-disk cache. By default CACHE_TTL.
+        refresh (bool): If True, the set is downloaded again whatever its age.
+
+    Returns:
+        set: The reference set.
+    """
+    downloaders = {
+        "markets": download_active_market,
+        "iata_codes": download_active_iata_codes,
+    }
+    if name not in downloaders:
+        raise ValueError(f"'{name}' is not one of {sorted(downloaders)}.")
+    ttl = CACHE_TTL if ttl is None else ttl
+
+    with _lock:
+        if not refresh and name in _loaded:
+            return _loaded[name]
+
+        path = os.path.join(CACHE_DIR, f"{name}.json")
+        cached = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                # A corrupted cache is simply downloaded again.
+                cached = None
+            if not (
+                isinstance(cached, dict)
+                and isinstance(cached.get("downloaded_at"), (int, float))
+                and isinstance(cached.get("codes"), list)
+            ):
+                cached = None
+        if cached is not None and not refresh:
+            if time.time() - cached["downloaded_at"] < ttl:
+                _loaded[name] = set(cached["codes"])
+                return _loaded[name]
+
+        try:
+            codes = downloaders[name]()
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            if cached is None:
+                raise
+            warnings.warn(f"Could not refresh '{name}', using the cached copy: {e}")
+            codes = set(cached["codes"])
+        else:
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                with open(temp_path, "w") as f:
+                    json.dump({"downloaded_at": time.time(), "codes": sorted(codes)}, f)
+                os.replace(temp_path, path)
+            except OSError as e:
+                # A read-only or full disk only costs a download next time.
+                warnings.warn(f"Could not cache '{name}' in {CACHE_DIR}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        _loaded[name] = codes
+        return codes
+
+
+def get_markets() -> set:
+    """Returns the active Ryanair market codes, see `load_reference_data`."""
+    return load_reference_data("markets")
+
+
+def get_iata_codes() -> set:
+    """Returns the active Ryanair IATA codes, see `load_reference_data`."""
+    return load_reference_data("iata_codes")
+
+
+def refresh_reference_data():
+    """Downloads the markets and IATA codes again and updates the cache.
+
+    The query templates of `fare_finder`, whose market was validated against the
+    previous set, are validated again on their next use.
+    """
+    # Imported here, as fare_finder imports this module.
+    from .fare_finder import get_params_template
+
+    load_reference_data("markets", refresh=True)
+    load_reference_data("iata_codes", refresh=True)
+    get_params_template.cache_clear()
+
+
+def __getattr__(name: str):
+    # Keep `constants.MARKETS` and `constants.IATA_CODES` working, loaded on access.
+    if name == "MARKETS":
+        return get_markets()
+    if name == "IATA_CODES":
+        return get_iata_codes()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
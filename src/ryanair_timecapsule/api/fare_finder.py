@@ -1,7 +1,16 @@
-from datetime import date, time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+import requests
 from pydantic import BaseModel, Field, field_validator
-from . import utils
-from .constants import MARKETS
+
+from . import constants, utils
+from .models import FareFinderResponse, parse_fare_finder
+from .params import ParamsTemplate
+from .stream import CHUNK_SIZE, ArrayStream
 
 ENDPOINT = "https://www.ryanair.com/api/farfnd/3/oneWayFares"
 
@@ -38,13 +47,40 @@ class Params(BaseModel, extra="forbid"):
 
     @field_validator("market")
     def check_market(cls, value):
-        assert value in MARKETS, (
-            f"'{value}' not recognized as a valid market: {MARKETS}."
+        markets = constants.get_markets()
+        assert value in markets, (
+            f"'{value}' not recognized as a valid market: {markets}."
         )
         return value
 
 
-def get_flights_fares(
+@functools.lru_cache(maxsize=64)
+def get_params_template(
+    depart_time_from: str,
+    depart_time_to: str,
+    duration_from: float | int,
+    duration_to: float | int,
+    n_passengers: int,
+    market: str,
+    offset: int,
+    limit: int,
+) -> ParamsTemplate:
+    """Returns the template of the parameters shared by the queries of a sweep,
+    validated on the first call only."""
+    return ParamsTemplate(
+        Params,
+        outboundDepartureTimeFrom=depart_time_from,
+        outboundDepartureTimeTo=depart_time_to,
+        durationFrom=duration_from,
+        durationTo=duration_to,
+        adultPaxCount=n_passengers,
+        market=market,
+        offset=offset,
+        limit=limit,
+    )
+
+
+def build_params(
     depart_iata_code: str,
     depart_date_from: str,
     depart_date_to: str,
@@ -54,18 +90,332 @@ def get_flights_fares(
     depart_time_to: str = Params.model_fields["outboundDepartureTimeTo"].default,
     n_passengers: int = Params.model_fields["adultPaxCount"].default,
     market: str = Params.model_fields["market"].default,
+    offset: int = Params.model_fields["offset"].default,
+    limit: int = Params.model_fields["limit"].default,
 ) -> dict:
+    """Validates the arguments and returns the query parameters of the API.
 
-    parameters = Params(
+    The arguments shared between queries are validated once (see
+    `get_params_template`), only the airport and the dates are validated per call.
+    """
+    template = get_params_template(
+        depart_time_from=depart_time_from,
+        depart_time_to=depart_time_to,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        n_passengers=n_passengers,
+        market=market,
+        offset=offset,
+        limit=limit,
+    )
+    return template.build(
         departureAirportIataCode=depart_iata_code,
         outboundDepartureDateFrom=depart_date_from,
         outboundDepartureDateTo=depart_date_to,
-        outboundDepartureTimeFrom=depart_time_from,
-        outboundDepartureTimeTo=depart_time_to,
-        durationFrom=duration_from,
-        durationTo=duration_to,
-        adultPaxCount=n_passengers,
+    )
+
+
+def get_flights_fares(
+    depart_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    duration_from: float | int,
+    duration_to: float | int,
+    depart_time_from: str = Params.model_fields["outboundDepartureTimeFrom"].default,
+    depart_time_to: str = Params.model_fields["outboundDepartureTimeTo"].default,
+    n_passengers: int = Params.model_fields["adultPaxCount"].default,
+    market: str = Params.model_fields["market"].default,
+    typed: bool = False,
+) -> dict | FareFinderResponse:
+    """Requests the fares departing from an airport in a date range.
+
+    Args:
+        typed (bool): If True, the raw response is parsed into a
+         `FareFinderResponse` (see `models`) instead of a dict.
+    """
+    api_params = build_params(
+        depart_iata_code=depart_iata_code,
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        depart_time_from=depart_time_from,
+        depart_time_to=depart_time_to,
+        n_passengers=n_passengers,
         market=market,
     )
-    api_params = parameters.model_dump()
+    if typed:
+        response = utils.call_api(url=ENDPOINT, params=api_params, return_json=False)
+        return parse_fare_finder(response.content)
     return utils.call_api(url=ENDPOINT, params=api_params, return_json=True)
+
+
+@contextmanager
+def stream_flights_fares(
+    depart_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    duration_from: float | int,
+    duration_to: float | int,
+    depart_time_from: str = Params.model_fields["outboundDepartureTimeFrom"].default,
+    depart_time_to: str = Params.model_fields["outboundDepartureTimeTo"].default,
+    n_passengers: int = Params.model_fields["adultPaxCount"].default,
+    market: str = Params.model_fields["market"].default,
+):
+    """Requests the fares departing from an airport like `get_flights_fares`, but
+    parses them as they arrive, so that the memory used does not depend on the
+    number of fares:
+
+        with stream_flights_fares("STN", "2024-10-08", "2024-11-15", 1, 4) as fares:
+            for fare in fares:
+                ...
+        size = fares.rest["size"]
+
+    Yields:
+        ArrayStream: The fares, with the other members of the response in `rest`
+         once they are consumed.
+    """
+    api_params = build_params(
+        depart_iata_code=depart_iata_code,
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        depart_time_from=depart_time_from,
+        depart_time_to=depart_time_to,
+        n_passengers=n_passengers,
+        market=market,
+    )
+    with utils.stream_api(url=ENDPOINT, params=api_params) as response:
+        yield ArrayStream(response.iter_content(CHUNK_SIZE), "fares")
+
+
+async def async_get_flights_fares(
+    depart_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    duration_from: float | int,
+    duration_to: float | int,
+    depart_time_from: str = Params.model_fields["outboundDepartureTimeFrom"].default,
+    depart_time_to: str = Params.model_fields["outboundDepartureTimeTo"].default,
+    n_passengers: int = Params.model_fields["adultPaxCount"].default,
+    market: str = Params.model_fields["market"].default,
+    typed: bool = False,
+) -> dict | FareFinderResponse:
+    """Asynchronous version of `get_flights_fares`."""
+    api_params = build_params(
+        depart_iata_code=depart_iata_code,
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        depart_time_from=depart_time_from,
+        depart_time_to=depart_time_to,
+        n_passengers=n_passengers,
+        market=market,
+    )
+    if typed:
+        response = await utils.async_call_api(
+            url=ENDPOINT, params=api_params, return_json=False
+        )
+        return parse_fare_finder(response.content)
+    return await utils.async_call_api(url=ENDPOINT, params=api_params, return_json=True)
+
+
+def split_date_range(date_from: str, date_to: str, chunk_days: int) -> list[tuple]:
+    """Splits a date range into consecutive chunks of at most chunk_days days.
+
+    Returns:
+        list[tuple]: The first and last date of each chunk in ISO format, in order.
+    """
+    if chunk_days < 1:
+        raise ValueError("chunk_days needs to be at least 1.")
+    start = date.fromisoformat(date_from)
+    end = date.fromisoformat(date_to)
+    chunks = []
+    while start <= end:
+        last = min(start + timedelta(chunk_days - 1), end)
+        chunks.append((start.isoformat(), last.isoformat()))
+        start = last + timedelta(1)
+    return chunks
+
+
+def fare_key(fare: dict) -> tuple:
+    """Identifies the flight of a fare, to drop the fares returned twice."""
+    flight = fare["outbound"]
+    return (
+        flight["departureAirport"]["iataCode"],
+        flight["arrivalAirport"]["iataCode"],
+        flight["departureDate"],
+        flight.get("flightNumber"),
+    )
+
+
+def merge_fares(responses: list) -> dict:
+    """Merges the responses of the chunks of a query into a single response.
+
+    The fares keep the order of the responses, each flight once, so the result
+    does not depend on the order in which the chunks completed.
+
+    Args:
+        responses (list): The responses of the chunks and their pages, in order.
+
+    Returns:
+        dict: The first response with the merged `fares` and their `size`.
+    """
+    fares = []
+    seen = set()
+    for response in responses:
+        for fare in response.get("fares", []):
+            key = fare_key(fare)
+            if key not in seen:
+                seen.add(key)
+                fares.append(fare)
+    merged = dict(responses[0]) if responses else {}
+    merged.update({"fares": fares, "size": len(fares), "nextPage": None})
+    return merged
+
+
+def is_last_page(response: dict, limit: int) -> bool:
+    return len(response.get("fares", [])) < limit
+
+
+def get_chunk_fares(api_params: dict, retries: int = 2) -> list:
+    """Requests every page of a chunk, retrying the chunk if it fails.
+
+    Returns:
+        list: The response of each page, in order.
+    """
+    for attempt in range(retries + 1):
+        pages = []
+        params = dict(api_params)
+        try:
+            while True:
+                response = utils.call_api(url=ENDPOINT, params=params, return_json=True)
+                pages.append(response)
+                if is_last_page(response, params["limit"]):
+                    return pages
+                params["offset"] += params["limit"]
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+
+
+def build_chunk_params(
+    depart_date_from: str, depart_date_to: str, chunk_days: int, **kwargs
+) -> list[dict]:
+    """Returns the query parameters of the first page of each chunk of a date range.
+
+    Args:
+        kwargs: The other arguments of `build_params`.
+    """
+    return [
+        build_params(depart_date_from=chunk_from, depart_date_to=chunk_to, **kwargs)
+        for chunk_from, chunk_to in split_date_range(
+            depart_date_from, depart_date_to, chunk_days
+        )
+    ]
+
+
+def get_flights_fares_chunked(
+    depart_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    duration_from: float | int,
+    duration_to: float | int,
+    depart_time_from: str = Params.model_fields["outboundDepartureTimeFrom"].default,
+    depart_time_to: str = Params.model_fields["outboundDepartureTimeTo"].default,
+    n_passengers: int = Params.model_fields["adultPaxCount"].default,
+    market: str = Params.model_fields["market"].default,
+    chunk_days: int = 31,
+    page_size: int = Params.model_fields["limit"].default,
+    max_workers: int = 4,
+    retries: int = 2,
+) -> dict:
+    """Same as `get_flights_fares`, but the date range is split into chunks that
+    are requested concurrently and paged with offset/limit, so each response stays
+    small. A failing chunk is retried on its own.
+
+    Args:
+        chunk_days (int): Number of days of each chunk.
+        page_size (int): Number of fares of each page.
+        max_workers (int): Number of chunks requested concurrently.
+        retries (int): Number of times a failing chunk is requested again.
+
+    Returns:
+        dict: The response with the fares of all the chunks, see `merge_fares`.
+    """
+    chunks = build_chunk_params(
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        chunk_days=chunk_days,
+        depart_iata_code=depart_iata_code,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        depart_time_from=depart_time_from,
+        depart_time_to=depart_time_to,
+        n_passengers=n_passengers,
+        market=market,
+        limit=page_size,
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = executor.map(lambda chunk: get_chunk_fares(chunk, retries), chunks)
+        return merge_fares([page for chunk_pages in pages for page in chunk_pages])
+
+
+async def async_get_chunk_fares(api_params: dict, retries: int = 2) -> list:
+    """Asynchronous version of `get_chunk_fares`."""
+    for attempt in range(retries + 1):
+        pages = []
+        params = dict(api_params)
+        try:
+            while True:
+                response = await utils.async_call_api(
+                    url=ENDPOINT, params=params, return_json=True
+                )
+                pages.append(response)
+                if is_last_page(response, params["limit"]):
+                    return pages
+                params["offset"] += params["limit"]
+        except utils.AsyncHTTPError:
+            if attempt == retries:
+                raise
+
+
+async def async_get_flights_fares_chunked(
+    depart_iata_code: str,
+    depart_date_from: str,
+    depart_date_to: str,
+    duration_from: float | int,
+    duration_to: float | int,
+    depart_time_from: str = Params.model_fields["outboundDepartureTimeFrom"].default,
+    depart_time_to: str = Params.model_fields["outboundDepartureTimeTo"].default,
+    n_passengers: int = Params.model_fields["adultPaxCount"].default,
+    market: str = Params.model_fields["market"].default,
+    chunk_days: int = 31,
+    page_size: int = Params.model_fields["limit"].default,
+    max_workers: int = 4,
+    retries: int = 2,
+) -> dict:
+    """Asynchronous version of `get_flights_fares_chunked`."""
+    chunks = build_chunk_params(
+        depart_date_from=depart_date_from,
+        depart_date_to=depart_date_to,
+        chunk_days=chunk_days,
+        depart_iata_code=depart_iata_code,
+        duration_from=duration_from,
+        duration_to=duration_to,
+        depart_time_from=depart_time_from,
+        depart_time_to=depart_time_to,
+        n_passengers=n_passengers,
+        market=market,
+        limit=page_size,
+    )
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def get_chunk(chunk):
+        async with semaphore:
+            return await async_get_chunk_fares(chunk, retries)
+
+    pages = await asyncio.gather(*(get_chunk(chunk) for chunk in chunks))
+    return merge_fares([page for chunk_pages in pages for page in chunk_pages])
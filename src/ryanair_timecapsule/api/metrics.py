@@ -0,0 +1,260 @@
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+# Upper bounds, in seconds, of the buckets of the request duration histograms.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Query parameters whose value labels a request, e.g. to find the slow airports.
+LABEL_PARAMS = ("departureAirportIataCode", "Origin")
+PROMETHEUS_PREFIX = "ryanair_timecapsule"
+
+
+def endpoint_name(url: str) -> str:
+    """Returns the host and path of a URL, without its query."""
+    parts = urlsplit(url)
+    return f"{parts.hostname}{parts.path}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class HttpxTrace:
+    """`trace` extension of an httpx request, times the opening of its connections
+    and its time to first byte, like the connections of the requests session."""
+
+    def __init__(self):
+        self.connect_seconds = 0.0
+        self.connections = 0
+        self.ttfb = None
+        self._connect_mark = None
+        self._sent_at = None
+
+    async def __call__(self, event_name: str, info: dict):
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self.connections += 1
+            self._connect_mark = now
+        elif event_name in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self.connect_seconds += now - self._connect_mark
+            self._connect_mark = now
+        elif event_name.endswith(".send_request_headers.started"):
+            self._sent_at = now
+        elif event_name.endswith(".receive_response_headers.complete"):
+            self.ttfb = now - self._sent_at
+
+
+class MetricsRecorder:
+    """Metrics of the requests sent by `call_api` and `async_call_api`, by endpoint.
+
+    Each request records its total duration (retries included), its time to
+    first byte, the time spent opening new connections (DNS lookup, TCP and TLS
+    handshakes), its retries, its status code, the size of its body and the class
+    of its error, if any. The durations are also totalled by the airport of the
+    request (see `LABEL_PARAMS`), to find the slow ones.
+
+    Args:
+        buckets (tuple): Upper bounds, in seconds, of the duration histograms.
+        label_params (tuple): Query parameters whose value labels a request.
+    """
+
+    def __init__(
+        self, buckets: tuple = LATENCY_BUCKETS, label_params: tuple = LABEL_PARAMS
+    ):
+        self.buckets = tuple(buckets)
+        self.label_params = label_params
+        self._endpoints = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint: str) -> dict:
+        # Called with the lock held.
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = {
+                "requests": 0,
+                "cache_hits": 0,
+                "retries": 0,
+                "bytes": 0,
+                "connections": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "ttfb_seconds": 0.0,
+                "connect_seconds": 0.0,
+                "status_codes": Counter(),
+                "errors": Counter(),
+                "histogram": [0] * len(self.buckets),
+            }
+        return self._endpoints[endpoint]
+
+    def label(self, params: dict | None) -> str | None:
+        """Returns the label of a request, the value of its first label param."""
+        for name in self.label_params:
+            if params and name in params:
+                return str(params[name])
+        return None
+
+    def record(
+        self,
+        url: str,
+        params: dict | None = None,
+        seconds: float = 0.0,
+        ttfb: float | None = None,
+        connect_seconds: float = 0.0,
+        connections: int = 0,
+        status: int | None = None,
+        retries: int = 0,
+        n_bytes: int = 0,
+        error: str | None = None,
+    ):
+        """Records a request sent to the API.
+
+        Args:
+            url (str): The URL of the request, its endpoint is its host and path.
+            params (dict | None): The query parameters of the request.
+            seconds (float): Total duration of the request, retries included.
+            ttfb (float | None): Time to first byte of the last attempt.
+            connect_seconds (float): Time spent opening new connections.
+            connections (int): Number of new connections opened.
+            status (int | None): Status code of the response, None if none arrived.
+            retries (int): Number of attempts retried.
+            n_bytes (int): Size of the body of the response.
+            error (str | None): Class of the error of the request, if any.
+        """
+        endpoint = endpoint_name(url)
+        label = self.label(params)
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["bytes"] += n_bytes
+            stats["connections"] += connections
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["ttfb_seconds"] += ttfb or 0.0
+            stats["connect_seconds"] += connect_seconds
+            if status is not None:
+                stats["status_codes"][status] += 1
+            if error is not None:
+                stats["errors"][error] += 1
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats["histogram"][i] += 1
+                    break
+            if label is not None:
+                label_stats = self._labels.setdefault(
+                    (endpoint, label), {"requests": 0, "seconds": 0.0}
+                )
+                label_stats["requests"] += 1
+                label_stats["seconds"] += seconds
+
+    def record_cache_hit(self, url: str):
+        """Records a request answered by the response cache, without the API."""
+        with self._lock:
+            self._endpoint(endpoint_name(url))["cache_hits"] += 1
+
+    def summary(self, n_slowest: int = 10) -> dict:
+        """Returns the metrics by endpoint and the labels with the slowest requests.
+
+        Args:
+            n_slowest (int): Number of labels returned, slowest on average first.
+
+        Returns:
+            dict: The `endpoints` and the `slowest` labels.
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in self._endpoints.items():
+                n_requests = max(stats["requests"], 1)
+                endpoints[endpoint] = {
+                    "requests": stats["requests"],
+                    "cache_hits": stats["cache_hits"],
+                    "retries": stats["retries"],
+                    "bytes": stats["bytes"],
+                    "connections": stats["connections"],
+                    "total_seconds": round(stats["seconds"], 6),
+                    "mean_seconds": round(stats["seconds"] / n_requests, 6),
+                    "max_seconds": round(stats["max_seconds"], 6),
+                    "mean_ttfb_seconds": round(stats["ttfb_seconds"] / n_requests, 6),
+                    "connect_seconds": round(stats["connect_seconds"], 6),
+                    "status_codes": {
+                        str(status): count
+                        for status, count in sorted(stats["status_codes"].items())
+                    },
+                    "errors": dict(stats["errors"]),
+                }
+            slowest = sorted(
+                (
+                    {
+                        "endpoint": endpoint,
+                        "label": label,
+                        "requests": stats["requests"],
+                        "mean_seconds": round(stats["seconds"] / stats["requests"], 6),
+                    }
+                    for (endpoint, label), stats in self._labels.items()
+                ),
+                key=lambda item: item["mean_seconds"],
+                reverse=True,
+            )
+        return {"endpoints": endpoints, "slowest": slowest[:n_slowest]}
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        p = PROMETHEUS_PREFIX
+        counters = [
+            ("cache_hits_total", "cache_hits"),
+            ("retries_total", "retries"),
+            ("response_bytes_total", "bytes"),
+            ("connections_total", "connections"),
+            ("connect_seconds_total", "connect_seconds"),
+            ("ttfb_seconds_total", "ttfb_seconds"),
+        ]
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [f"# TYPE {p}_requests_total counter"]
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats["status_codes"].items()):
+                    labels = _labels(endpoint=endpoint, status=status)
+                    lines.append(f"{p}_requests_total{{{labels}}} {count}")
+            lines.append(f"# TYPE {p}_errors_total counter")
+            for endpoint, stats in endpoints:
+                for error, count in sorted(stats["errors"].items()):
+                    labels = _labels(endpoint=endpoint, error=error)
+                    lines.append(f"{p}_errors_total{{{labels}}} {count}")
+            for name, key in counters:
+                lines.append(f"# TYPE {p}_{name} counter")
+                for endpoint, stats in endpoints:
+                    labels = _labels(endpoint=endpoint)
+                    lines.append(f"{p}_{name}{{{labels}}} {stats[key]}")
+
+            name = f"{p}_request_duration_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for endpoint, stats in endpoints:
+                cumulative = 0
+                for bound, count in zip(self.buckets, stats["histogram"]):
+                    cumulative += count
+                    labels = _labels(endpoint=endpoint, le=bound)
+                    lines.append(f"{name}_bucket{{{labels}}} {cumulative}")
+                labels = _labels(endpoint=endpoint, le="+Inf")
+                lines.append(f"{name}_bucket{{{labels}}} {stats['requests']}")
+                labels = _labels(endpoint=endpoint)
+                lines.append(f"{name}_sum{{{labels}}} {stats['seconds']}")
+                lines.append(f"{name}_count{{{labels}}} {stats['requests']}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str):
+        """Saves the metrics, in the Prometheus text format if the path ends with
+        `.prom`, or as the JSON `summary` otherwise."""
+        with open(path, "w") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.summary(), f, indent=4)
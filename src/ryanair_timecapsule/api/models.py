@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import Field, TypeAdapter
+
+# Typed Fare-Finder and Booking responses. The models are slotted dataclasses,
+# validated straight from the raw JSON bytes by a Pydantic `TypeAdapter` without
+# the intermediate dicts of `response.json()`. Unknown fields are ignored.
+
+
+@dataclass(slots=True, frozen=True)
+class Airport:
+    iata_code: Annotated[str, Field(alias="iataCode")]
+    name: str = ""
+
+
+@dataclass(slots=True, frozen=True)
+class Price:
+    value: float
+    currency_code: Annotated[str, Field(alias="currencyCode")]
+
+
+@dataclass(slots=True, frozen=True)
+class Flight:
+    departure_airport: Annotated[Airport, Field(alias="departureAirport")]
+    arrival_airport: Annotated[Airport, Field(alias="arrivalAirport")]
+    departure_date: Annotated[datetime, Field(alias="departureDate")]
+    arrival_date: Annotated[datetime, Field(alias="arrivalDate")]
+    price: Price
+    flight_number: Annotated[str | None, Field(alias="flightNumber")] = None
+
+
+@dataclass(slots=True, frozen=True)
+class Fare:
+    outbound: Flight
+
+
+@dataclass(slots=True, frozen=True)
+class FareFinderResponse:
+    fares: list[Fare] = field(default_factory=list)
+    size: int = 0
+
+
+@dataclass(slots=True, frozen=True)
+class BookingFare:
+    type: str
+    amount: float
+    count: int = 1
+
+
+@dataclass(slots=True, frozen=True)
+class RegularFare:
+    fares: list[BookingFare] = field(default_factory=list)
+
+
+@dataclass(slots=True, frozen=True)
+class BookingFlight:
+    time: list[datetime]
+    flight_number: Annotated[str | None, Field(alias="flightNumber")] = None
+    regular_fare: Annotated[RegularFare | None, Field(alias="regularFare")] = None
+    fares_left: Annotated[int | None, Field(alias="faresLeft")] = None
+
+    def price(self, passenger_type: str = "ADT") -> float | None:
+        """Returns the regular fare of a passenger type, None if sold out."""
+        if self.regular_fare is None:
+            return None
+        for fare in self.regular_fare.fares:
+            if fare.type == passenger_type:
+                return fare.amount
+        return None
+
+
+@dataclass(slots=True, frozen=True)
+class BookingDate:
+    date_out: Annotated[datetime, Field(alias="dateOut")]
+    flights: list[BookingFlight] = field(default_factory=list)
+
+
+@dataclass(slots=True, frozen=True)
+class Trip:
+    origin: str
+    destination: str
+    dates: list[BookingDate] = field(default_factory=list)
+
+
+@dataclass(slots=True, frozen=True)
+class BookingResponse:
+    currency: str | None = None
+    trips: list[Trip] = field(default_factory=list)
+
+
+FARE_FINDER_ADAPTER = TypeAdapter(FareFinderResponse)
+BOOKING_ADAPTER = TypeAdapter(BookingResponse)
+
+
+def parse_fare_finder(content: bytes | str | dict) -> FareFinderResponse:
+    """Validates a Fare-Finder response, from its raw JSON content or a dict."""
+    if isinstance(content, dict):
+        return FARE_FINDER_ADAPTER.validate_python(content)
+    return FARE_FINDER_ADAPTER.validate_json(content)
+
+
+def parse_booking(content: bytes | str | dict) -> BookingResponse:
+    """Validates a Booking response, from its raw JSON content or a dict."""
+    if isinstance(content, dict):
+        return BOOKING_ADAPTER.validate_python(content)
+    return BOOKING_ADAPTER.validate_json(content)
@@ -0,0 +1,96 @@
+from collections.abc import Callable
+from typing import Annotated
+
+from pydantic import AfterValidator, BaseModel, TypeAdapter
+
+# Number of validated values remembered by a template, e.g. airports and dates.
+MAX_VALIDATED = 4096
+_MISSING = object()
+
+
+def field_adapter(model: type[BaseModel], name: str) -> TypeAdapter:
+    """Returns an adapter validating a single field of a model, with the same
+    constraints and field validators as the model."""
+    if name not in model.model_fields:
+        raise ValueError(f"'{name}' is not a parameter of {model.__name__}.")
+    field = model.model_fields[name]
+    validators = [
+        AfterValidator(decorator.func.__get__(model))
+        for decorator in model.__pydantic_decorators__.field_validators.values()
+        if name in decorator.info.fields
+    ]
+    return TypeAdapter(Annotated[(field.annotation, field, *validators)])
+
+
+class ParamsTemplate:
+    """Query parameters validated once and reused by many requests.
+
+    The fields shared by the requests (e.g. the market or the passengers) are
+    validated when the template is created. Each request then only validates the
+    fields that change (e.g. the airport and the dates), and each of their values
+    only once, as a sweep requests the same airports and dates many times. This
+    is several times cheaper than validating and dumping a `Params` model per
+    request.
+
+    Args:
+        model (type[BaseModel]): The `Params` model of the API.
+        format_value (Callable | None): Converts each validated value into its
+         query parameter, e.g. lowercase booleans.
+        fields: The shared fields, named as in the model.
+    """
+
+    def __init__(
+        self,
+        model: type[BaseModel],
+        format_value: Callable | None = None,
+        **fields,
+    ):
+        self.model = model
+        self.format_value = format_value
+        self._adapters = {}
+        self._validated = {}
+        self.params = {
+            name: self._format(field.default)
+            for name, field in model.model_fields.items()
+            if not field.is_required()
+        }
+        self._validate(fields, self.params)
+        self.required = {
+            name for name, field in model.model_fields.items() if field.is_required()
+        }
+
+    def _format(self, value):
+        if self.format_value is None:
+            return value
+        return self.format_value(value)
+
+    def _validate(self, fields: dict, params: dict = None) -> dict:
+        params = {} if params is None else params
+        for name, value in fields.items():
+            key = (name, value)
+            validated = self._validated.get(key, _MISSING)
+            if validated is _MISSING:
+                adapter = self._adapters.get(name)
+                if adapter is None:
+                    adapter = self._adapters[name] = field_adapter(self.model, name)
+                validated = self._format(adapter.validate_python(value))
+                if len(self._validated) >= MAX_VALIDATED:
+                    self._validated.clear()
+                self._validated[key] = validated
+            params[name] = validated
+        return params
+
+    def build(self, **fields) -> dict:
+        """Returns the query parameters of a request.
+
+        Args:
+            fields: The fields that differ from the template, named as in the model.
+
+        Returns:
+            dict: The query parameters, as a new dict.
+        """
+        params = self._validate(fields, self.params.copy())
+        if not self.required.issubset(params):
+            missing = sorted(self.required - params.keys())
+            raise ValueError(f"Missing parameters: {missing}.")
+        return params
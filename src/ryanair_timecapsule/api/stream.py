@@ -0,0 +1,124 @@
+import codecs
+import json
+import re
+from collections.abc import Iterable, Iterator
+
+# Size of the chunks read from the socket.
+CHUNK_SIZE = 1 << 16
+WHITESPACE = " \t\n\r"
+# The characters of a JSON number, which has no end delimiter.
+NUMBER = re.compile(r"[-+.0-9eE]*")
+
+
+class ArrayStream:
+    """Parses a JSON object from chunks of bytes, yielding the items of one of its
+    arrays as they arrive instead of building the whole object.
+
+    Only the text of the item being parsed and of the current chunk is held in
+    memory, so the memory used does not depend on the length of the array. The
+    other members of the object are kept in `rest` once the stream is consumed.
+
+    Args:
+        chunks (Iterable[bytes]): The UTF-8 encoded JSON object, e.g. from
+         `Response.iter_content`.
+        key (str): The key of the array whose items are yielded, e.g. `fares`.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], key: str):
+        self.key = key
+        self.rest = {}
+        self.n_bytes = 0
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._text = ""
+        self._position = 0
+        self._eof = False
+        self._consumed = False
+
+    def _read(self) -> bool:
+        """Appends the next chunk to the text. Returns False at the end."""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            self._text += self._decoder.decode(b"", final=True)
+            return False
+        self.n_bytes += len(chunk)
+        # Drop the text already parsed, so that it does not grow with the array.
+        self._text = self._text[self._position :] + self._decoder.decode(chunk)
+        self._position = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skips the whitespace and returns the next character."""
+        while True:
+            while (
+                self._position < len(self._text)
+                and self._text[self._position] in WHITESPACE
+            ):
+                self._position += 1
+            if self._position < len(self._text):
+                return self._text[self._position]
+            if not self._read():
+                raise json.JSONDecodeError(
+                    "Unexpected end of the stream", self._text, self._position
+                )
+
+    def _expect(self, characters: str) -> str:
+        character = self._peek()
+        if character not in characters:
+            raise json.JSONDecodeError(
+                f"Expecting one of {characters!r}", self._text, self._position
+            )
+        self._position += 1
+        return character
+
+    def _value(self):
+        """Decodes the next JSON value, reading chunks until it is complete."""
+        character = self._peek()
+        while True:
+            # A number that reaches the end of the text, e.g. `29.` or `12`, may go
+            # on in the next chunk.
+            if character == "-" or character.isdigit():
+                end = NUMBER.match(self._text, self._position).end()
+                if end == len(self._text) and self._read():
+                    continue
+            try:
+                value, end = self._json.raw_decode(self._text, self._position)
+            except json.JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+            self._position = end
+            return value
+
+    def __iter__(self) -> Iterator:
+        if self._consumed:
+            raise RuntimeError("The stream was already consumed.")
+        self._consumed = True
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+        while True:
+            name = self._value()
+            if not isinstance(name, str):
+                raise json.JSONDecodeError(
+                    "Expecting a property name", self._text, self._position
+                )
+            self._expect(":")
+            if name == self.key and self._peek() == "[":
+                self._position += 1
+                if self._peek() == "]":
+                    self._position += 1
+                else:
+                    while True:
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.rest[name] = self._value()
+            if self._expect(",}") == "}":
+                return
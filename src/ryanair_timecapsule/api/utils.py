@@ -1,19 +1,679 @@
+import asyncio
+import importlib.util
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
 import requests
-from requests.models import Response
-from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
+from requests.models import Response
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import RequestHistory, Retry
+
+from .cache import ResponseCache
+from .metrics import HttpxTrace, MetricsRecorder
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+if httpx is not None:
+    AsyncHTTPError = httpx.HTTPError
+    AsyncHTTPStatusError = httpx.HTTPStatusError
+else:
+    # Never raised, so that the callers of `async_call_api` can catch them without
+    # httpx installed.
+    class AsyncHTTPError(Exception):
+        pass
+
+    class AsyncHTTPStatusError(AsyncHTTPError):
+        pass
+
+
+class ThrottledRetry(Retry):
+    """`Retry` that reports every retried response to the shared `rate_limiter`
+    and waits for it before each new attempt, so that the throttling responses
+    hidden by urllib3 still slow the sweep down."""
+
+    def increment(self, method=None, url=None, response=None, error=None, **kw):
+        host = None
+        if kw.get("_pool") is not None:
+            host = kw["_pool"].host
+        if rate_limiter is not None and host is not None and response is not None:
+            rate_limiter.record(
+                host, response.status, response.headers.get("Retry-After")
+            )
+        new_retry = super().increment(method, url, response, error, **kw)
+        new_retry.host = host
+        # The retries happen in the thread of the request, see `call_api`.
+        _request_stats.retries = getattr(_request_stats, "retries", 0) + 1
+        return new_retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        host = getattr(self, "host", None)
+        if rate_limiter is not None and host is not None:
+            time.sleep(rate_limiter.reserve(host))
+
+
+class TimedConnectionMixin:
+    """Times the opening of a connection (DNS lookup, TCP and TLS handshakes)
+    for the request of the current thread, see `call_api`."""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _request_stats.connect_seconds = (
+            getattr(_request_stats, "connect_seconds", 0.0)
+            + time.perf_counter()
+            - start
+        )
+        _request_stats.connections = getattr(_request_stats, "connections", 0) + 1
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """`HTTPAdapter` whose connections are timed for the `metrics`."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
 
 
-retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503])
+# Retries and new connections of the request sent by the current thread.
+_request_stats = threading.local()
+
+retry = ThrottledRetry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503])
 session = requests.Session()
-session.mount("https://", HTTPAdapter(max_retries=retry))
+session.mount("https://", TimedHTTPAdapter(max_retries=retry))
+# Plain HTTP is only used by local stand-ins of the API, e.g. in the benchmarks.
+session.mount("http://", session.get_adapter("https://"))
+
+# Created on first use by `get_async_session`, requires the `async` extra.
+async_session = None
+
+# Optional per-host rate limiter shared by `call_api` and `async_call_api`.
+rate_limiter = None
+
+# Optional cache of the JSON responses, see `set_response_cache`.
+response_cache = None
+
+# Optional recorder of the metrics of each request, see `set_metrics`.
+metrics = None
+
+
+class RateLimiter:
+    """Token bucket that limits the number of requests sent to each host.
+
+    Args:
+        requests_per_second (float): Sustained number of requests allowed per host.
+        burst (int): Number of requests that can be sent back to back before
+         the limit kicks in.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int = 1):
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second needs to be greater than 0.")
+        if burst < 1:
+            raise ValueError("burst needs to be at least 1.")
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def rate(self, host: str) -> float:
+        """Returns the current requests per second allowed for the host."""
+        return self.requests_per_second
+
+    def reserve(self, host: str) -> float:
+        """Reserves a request slot for the host.
+
+        Args:
+            host (str): The host the request is sent to.
+
+        Returns:
+            float: Seconds to wait before sending the request.
+        """
+        with self._lock:
+            rate = self.rate(host)
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * rate)
+            tokens -= 1
+            self._buckets[host] = (tokens, now)
+            if tokens >= 0:
+                return 0.0
+            return -tokens / rate
+
+    def acquire(self, host: str):
+        """Blocks until a request can be sent to the host."""
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, host: str):
+        """Waits, without blocking the event loop, until a request can be sent."""
+        await asyncio.sleep(self.reserve(host))
+
+    def release(self, host: str):
+        """Signals that a request acquired with `acquire` finished."""
+
+    def record(self, host: str, status: int, retry_after: str | None = None):
+        """Reports the status of a response received from the host."""
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Rate limiter that adapts to the throttling of each host (AIMD).
+
+    Every throttling response (429 or 503) multiplies the rate and the number of
+    concurrent requests by `decrease`, and pauses the host for the time asked in
+    its `Retry-After` header. Every other response increases the rate by
+    `increase / rate` and the concurrency by `1 / concurrency`, i.e. by about
+    `increase` requests per second each second and by one request each round of
+    healthy responses, up to their maximums.
+
+    Args:
+        requests_per_second (float): Initial requests per second per host.
+        max_requests_per_second (float): Maximum requests per second per host.
+         By default 10 times the initial rate.
+        min_requests_per_second (float): Minimum requests per second per host.
+        max_concurrency (int): Maximum concurrent requests per host.
+        increase (float): Additive increase of the rate.
+        decrease (float): Multiplicative decrease of the rate and concurrency.
+        burst (int): Number of requests that can be sent back to back.
+    """
+
+    THROTTLE_STATUS_CODES = frozenset([429, 503])
+
+    def __init__(
+        self,
+        requests_per_second: float,
+        max_requests_per_second: float = None,
+        min_requests_per_second: float = 0.1,
+        max_concurrency: int = 16,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        burst: int = 1,
+    ):
+        super().__init__(requests_per_second, burst=burst)
+        if not 0 < decrease < 1:
+            raise ValueError("decrease needs to be between 0 and 1.")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency needs to be at least 1.")
+        self.max_requests_per_second = (
+            max_requests_per_second or 10 * requests_per_second
+        )
+        self.min_requests_per_second = min_requests_per_second
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self._hosts = {}
+        self._slots = threading.Condition(self._lock)
+
+    def _host(self, host: str) -> dict:
+        # Called with the lock held.
+        if host not in self._hosts:
+            self._hosts[host] = {
+                "rate": self.requests_per_second,
+                "concurrency": float(self.max_concurrency),
+                "in_flight": 0,
+            }
+        return self._hosts[host]
+
+    def rate(self, host: str) -> float:
+        state = self._hosts.get(host)
+        return self.requests_per_second if state is None else state["rate"]
+
+    def concurrency(self, host: str) -> int:
+        """Returns the current number of concurrent requests allowed for the host."""
+        with self._lock:
+            return int(self._host(host)["concurrency"])
+
+    def stats(self) -> dict:
+        """Returns the current rate, concurrency and requests in flight by host."""
+        with self._lock:
+            return {
+                host: {
+                    "rate": state["rate"],
+                    "concurrency": int(state["concurrency"]),
+                    "in_flight": state["in_flight"],
+                }
+                for host, state in self._hosts.items()
+            }
+
+    def _try_enter(self, host: str) -> bool:
+        # Called with the lock held.
+        state = self._host(host)
+        if state["in_flight"] >= int(state["concurrency"]):
+            return False
+        state["in_flight"] += 1
+        return True
+
+    def acquire(self, host: str):
+        with self._slots:
+            self._slots.wait_for(lambda: self._try_enter(host))
+        super().acquire(host)
+
+    async def acquire_async(self, host: str):
+        while True:
+            with self._lock:
+                if self._try_enter(host):
+                    break
+            await asyncio.sleep(1 / self.rate(host))
+        await super().acquire_async(host)
+
+    def release(self, host: str):
+        with self._slots:
+            self._host(host)["in_flight"] -= 1
+            self._slots.notify_all()
+
+    def record(self, host: str, status: int, retry_after: str | None = None):
+        with self._slots:
+            state = self._host(host)
+            if status in self.THROTTLE_STATUS_CODES:
+                state["rate"] = max(
+                    self.min_requests_per_second, state["rate"] * self.decrease
+                )
+                state["concurrency"] = max(1.0, state["concurrency"] * self.decrease)
+                if retry_after is not None:
+                    # Empty the bucket until the end of the pause, so the requests
+                    # resume spaced out instead of all at once.
+                    resume_at = time.monotonic() + retry.parse_retry_after(retry_after)
+                    tokens, updated = self._buckets.get(host, (0.0, resume_at))
+                    self._buckets[host] = (min(tokens, 0.0), max(updated, resume_at))
+            else:
+                state["rate"] = min(
+                    self.max_requests_per_second,
+                    state["rate"] + self.increase / state["rate"],
+                )
+                state["concurrency"] = min(
+                    float(self.max_concurrency),
+                    state["concurrency"] + 1 / state["concurrency"],
+                )
+                self._slots.notify_all()
+
+
+def set_rate_limit(
+    requests_per_second: float | None,
+    burst: int = 1,
+    adaptive: bool = False,
+    max_concurrency: int = 16,
+):
+    """Limits the requests per second sent to each host by `call_api`.
+
+    Args:
+        requests_per_second (float | None): Maximum requests per second per host,
+         or the initial one if adaptive. If None, the limit is removed.
+        burst (int): Number of requests that can be sent back to back.
+        adaptive (bool): If True, an `AdaptiveRateLimiter` adjusts the rate and the
+         concurrency to the throttling of the API.
+        max_concurrency (int): Maximum concurrent requests per host, if adaptive.
+    """
+    global rate_limiter
+    if requests_per_second is None:
+        rate_limiter = None
+    elif adaptive:
+        rate_limiter = AdaptiveRateLimiter(
+            requests_per_second, max_concurrency=max_concurrency, burst=burst
+        )
+    else:
+        rate_limiter = RateLimiter(requests_per_second, burst=burst)
+
+
+def set_pool_size(pool_maxsize: int):
+    """Resizes the connection pool of the shared session, so that concurrent
+    calls can reuse their connections instead of opening new ones.
+
+    The current pools, and their connections, are kept if their size does not
+    change, e.g. between the sweeps of a resident collector.
+
+    Args:
+        pool_maxsize (int): Maximum number of connections kept alive per host.
+    """
+    adapter = session.get_adapter("https://")
+    if getattr(adapter, "_pool_maxsize", None) == pool_maxsize:
+        return
+    adapter = TimedHTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def set_response_cache(
+    ttl: float | None,
+    cache_dir: str | None = None,
+    max_entries: int = 256,
+):
+    """Caches the JSON responses of `call_api` and `async_call_api`, keyed on the
+    URL and the query parameters (see `ResponseCache`).
+
+    Args:
+        ttl (float | None): Number of seconds a response is reused without asking
+         the API. If None, the cache is disabled.
+        cache_dir (str | None): Directory of the on-disk tier. If None, responses
+         are only kept in memory.
+        max_entries (int): Number of responses kept in memory.
+    """
+    global response_cache
+    if ttl is None:
+        response_cache = None
+    else:
+        response_cache = ResponseCache(
+            ttl=ttl, max_entries=max_entries, cache_dir=cache_dir
+        )
+
+
+def set_metrics(enabled: bool = True) -> MetricsRecorder | None:
+    """Records the metrics of the requests of `call_api` and `async_call_api`
+    (see `MetricsRecorder`), e.g. to export them at the end of a sweep.
+
+    Args:
+        enabled (bool): If False, the metrics are no longer recorded.
+
+    Returns:
+        MetricsRecorder | None: The new recorder, also available as `metrics`.
+    """
+    global metrics
+    metrics = MetricsRecorder() if enabled else None
+    return metrics
+
+
+def record_metrics(
+    url: str,
+    params: dict,
+    start: float,
+    response=None,
+    error: Exception | None = None,
+    ttfb: float | None = None,
+    retries: int | None = None,
+    connect_seconds: float | None = None,
+    connections: int | None = None,
+    n_bytes: int | None = None,
+):
+    """Records a request of `call_api` or `async_call_api` in the `metrics`, with
+    the retries and connections of the current thread if not given."""
+    if retries is None:
+        retries = _request_stats.retries
+    if connect_seconds is None:
+        connect_seconds = _request_stats.connect_seconds
+    if connections is None:
+        connections = _request_stats.connections
+    error_class = None
+    if error is not None:
+        error_class = type(error).__name__
+    elif response.status_code >= 400:
+        error_class = "HTTPError"
+    if n_bytes is None:
+        n_bytes = 0 if response is None else len(response.content)
+    metrics.record(
+        url,
+        params,
+        seconds=time.perf_counter() - start,
+        ttfb=ttfb,
+        connect_seconds=connect_seconds,
+        connections=connections,
+        status=None if response is None else response.status_code,
+        retries=retries,
+        n_bytes=n_bytes,
+        error=error_class,
+    )
 
 
 def call_api(
     url: str, params: dict = None, return_json: bool = True, headers: dict = None
 ) -> dict | Response:
-    response = session.get(url=url, params=params, headers=headers, timeout=30)
+    cached = None
+    if return_json and response_cache is not None:
+        cached = response_cache.lookup(url, params)
+        if cached is not None and response_cache.is_fresh(cached):
+            if metrics is not None:
+                metrics.record_cache_hit(url)
+            return cached["body"]
+        if cached is not None:
+            headers = {**(headers or {}), **response_cache.conditional_headers(cached)}
+
+    host = urlsplit(url).hostname
+    if rate_limiter is not None:
+        rate_limiter.acquire(host)
+    _request_stats.retries = 0
+    _request_stats.connect_seconds = 0.0
+    _request_stats.connections = 0
+    start = time.perf_counter()
+    try:
+        response = session.get(url=url, params=params, headers=headers, timeout=30)
+    except requests.RequestException as error:
+        if metrics is not None:
+            record_metrics(url, params, start, error=error)
+        raise
+    finally:
+        if rate_limiter is not None:
+            rate_limiter.release(host)
+    if metrics is not None:
+        record_metrics(
+            url, params, start, response, ttfb=response.elapsed.total_seconds()
+        )
+    if rate_limiter is not None:
+        rate_limiter.record(
+            host, response.status_code, response.headers.get("Retry-After")
+        )
+    if cached is not None and response.status_code == 304:
+        return response_cache.revalidated(url, params, cached)
+    response.raise_for_status()
+    if return_json and response_cache is not None:
+        return response_cache.store(url, params, response.json(), response.headers)
+    if return_json:
+        return response.json()
+    return response
+
+
+@contextmanager
+def stream_api(url: str, params: dict = None, headers: dict = None):
+    """Sends a request like `call_api`, but without reading the body, so that it
+    can be parsed as it arrives, e.g. with `stream.ArrayStream`.
+
+    The response cache is not used. The connection, and with the adaptive rate
+    limit the concurrency slot, is held until the context exits.
+
+    Yields:
+        Response: The response, whose status was checked, e.g. to iterate over
+         `iter_content`.
+    """
+    host = urlsplit(url).hostname
+    if rate_limiter is not None:
+        rate_limiter.acquire(host)
+    _request_stats.retries = 0
+    _request_stats.connect_seconds = 0.0
+    _request_stats.connections = 0
+    start = time.perf_counter()
+    response = None
+    n_bytes = 0
+    try:
+        response = session.get(
+            url=url, params=params, headers=headers, timeout=30, stream=True
+        )
+        if rate_limiter is not None:
+            rate_limiter.record(
+                host, response.status_code, response.headers.get("Retry-After")
+            )
+        response.raise_for_status()
+        yield response
+        n_bytes = response.raw.tell()
+    except requests.RequestException as error:
+        if metrics is not None:
+            record_metrics(url, params, start, response, error=error, n_bytes=0)
+        raise
+    else:
+        if metrics is not None:
+            record_metrics(
+                url,
+                params,
+                start,
+                response,
+                ttfb=response.elapsed.total_seconds(),
+                n_bytes=n_bytes,
+            )
+    finally:
+        if response is not None:
+            response.close()
+        if rate_limiter is not None:
+            rate_limiter.release(host)
+
+
+def get_async_session():
+    """Returns the shared asynchronous client, creating it on first use.
+
+    The client keeps connections alive between calls and negotiates HTTP/2 when
+    the `h2` package is installed and the server supports it.
+
+    Returns:
+        httpx.AsyncClient: The shared asynchronous client.
+    """
+    global async_session
+    if async_session is None:
+        if httpx is None:
+            raise ImportError(
+                "The async client requires httpx, install it with: "
+                "pip install 'ryanair_timecapsule[async]'"
+            )
+        async_session = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=30,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+        )
+    return async_session
+
+
+async def close_async_session():
+    """Closes the shared asynchronous client and its pooled connections."""
+    global async_session
+    if async_session is not None:
+        await async_session.aclose()
+        async_session = None
+
+
+def get_retry_delay(history: tuple, retry_after: str | None = None) -> float:
+    """Computes how long to wait before retrying, following the `retry` policy.
+
+    Args:
+        history (tuple): The `RequestHistory` of the failed attempts so far.
+        retry_after (str | None): The value of the `Retry-After` header, if any.
+
+    Returns:
+        float: Seconds to wait before the next attempt.
+    """
+    if retry_after is not None and retry.respect_retry_after_header:
+        return retry.parse_retry_after(retry_after)
+    return retry.new(history=history).get_backoff_time()
+
+
+async def async_call_api(
+    url: str, params: dict = None, return_json: bool = True, headers: dict = None
+):
+    """Asynchronous version of `call_api`.
+
+    Failed requests are retried with the same policy as the synchronous session
+    (see `retry`). Cancelling the calling task aborts the request straight away.
+
+    Returns:
+        dict | httpx.Response: The JSON content or the response itself.
+    """
+    cached = None
+    if return_json and response_cache is not None:
+        cached = response_cache.lookup(url, params)
+        if cached is not None and response_cache.is_fresh(cached):
+            if metrics is not None:
+                metrics.record_cache_hit(url)
+            return cached["body"]
+        if cached is not None:
+            headers = {**(headers or {}), **response_cache.conditional_headers(cached)}
+
+    client = get_async_session()
+    host = urlsplit(url).hostname
+    history = ()
+    trace = HttpxTrace()
+    if rate_limiter is not None:
+        await rate_limiter.acquire_async(host)
+    start = time.perf_counter()
+    try:
+        while True:
+            try:
+                response = await client.get(
+                    url=url,
+                    params=params,
+                    headers=headers,
+                    extensions={"trace": trace},
+                )
+            except httpx.TransportError as error:
+                if len(history) >= retry.total:
+                    if metrics is not None:
+                        record_metrics(
+                            url,
+                            params,
+                            start,
+                            error=error,
+                            retries=len(history),
+                            connect_seconds=trace.connect_seconds,
+                            connections=trace.connections,
+                        )
+                    raise
+                history += (RequestHistory("GET", url, error, None, None),)
+                await asyncio.sleep(get_retry_delay(history))
+            else:
+                retry_after = None
+                if response.status_code in retry.RETRY_AFTER_STATUS_CODES:
+                    retry_after = response.headers.get("Retry-After")
+                if rate_limiter is not None:
+                    rate_limiter.record(host, response.status_code, retry_after)
+                if response.status_code not in retry.status_forcelist:
+                    break
+                if len(history) >= retry.total:
+                    break
+                history += (
+                    RequestHistory("GET", url, None, response.status_code, None),
+                )
+                await asyncio.sleep(get_retry_delay(history, retry_after))
+            if rate_limiter is not None:
+                await asyncio.sleep(rate_limiter.reserve(host))
+    finally:
+        if rate_limiter is not None:
+            rate_limiter.release(host)
+
+    if metrics is not None:
+        record_metrics(
+            url,
+            params,
+            start,
+            response,
+            ttfb=trace.ttfb,
+            retries=len(history),
+            connect_seconds=trace.connect_seconds,
+            connections=trace.connections,
+        )
+    if cached is not None and response.status_code == 304:
+        return response_cache.revalidated(url, params, cached)
     response.raise_for_status()
+    if return_json and response_cache is not None:
+        return response_cache.store(url, params, response.json(), response.headers)
     if return_json:
         return response.json()
     return response
@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class SweepJournal:
+    """Persistent, append-only log of a sweep, stored as JSON Lines.
+
+    The first entry holds the parameters of the sweep, followed by one entry each
+    time a job (e.g. an airport) succeeds or fails. Every entry is synced to disk,
+    so a sweep that crashes can be resumed with the same parameters.
+
+    Args:
+        path (str): The path of the journal, loaded if it already exists.
+         Missing directories are created.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.params = None
+        self.completed = set()
+        self.failures = {}
+        self._lock = threading.Lock()
+
+        length = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    # The last line may be cut short by a crash, even if it is
+                    # valid JSON, e.g. `{"a": 1}` of `{"a": 1, "b": 2}`.
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(entry)
+                    length += len(line)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a")
+        self._file.truncate(length)
+
+    def _apply(self, entry: dict):
+        if entry["event"] == "start":
+            self.params = entry["params"]
+        elif entry["event"] == "done":
+            self.completed.add(entry["job"])
+            self.failures.pop(entry["job"], None)
+        elif entry["event"] == "failed":
+            self.failures[entry["job"]] = entry["error"]
+
+    def _append(self, entry: dict):
+        entry["time"] = datetime.now().isoformat()
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(entry)
+
+    def start(self, params: dict):
+        """Records the parameters of a new sweep, or checks that a resumed sweep
+        uses the same ones.
+
+        Args:
+            params (dict): JSON serializable parameters of the sweep.
+        """
+        if self.params is None:
+            self._append({"event": "start", "params": params})
+        elif self.params != params:
+            raise ValueError(
+                f"The journal '{self.path}' belongs to a sweep with different "
+                f"parameters: {self.params}."
+            )
+
+    def record_done(self, job: str):
+        self._append({"event": "done", "job": job})
+
+    def record_failure(self, job: str, error: Exception):
+        self._append({"event": "failed", "job": job, "error": repr(error)})
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
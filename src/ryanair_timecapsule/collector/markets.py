@@ -0,0 +1,45 @@
+import os
+from collections.abc import Iterable
+
+# Directory of the results of a market, in the hive style of `storage.dataset`.
+MARKET_PARTITION = "market={market}"
+
+
+def normalize_markets(markets: Iterable[str]) -> list[str]:
+    """Returns the market codes in lower case, without duplicates, in their order,
+    so that no query is sent twice for the same market."""
+    normalized = []
+    for market in markets:
+        market = market.strip().lower()
+        if market not in normalized:
+            normalized.append(market)
+    return normalized
+
+
+def check_markets(markets: Iterable[str], active_markets: set):
+    """Raises a ValueError listing the markets that are not active, before any
+    query is sent."""
+    unknown = sorted(set(markets) - set(active_markets))
+    if unknown:
+        raise ValueError(
+            f"{unknown} not recognized as valid markets: {sorted(active_markets)}."
+        )
+
+
+def market_jobs(iata_codes: Iterable[str], markets: list[str]) -> list[tuple]:
+    """Returns one (iata, market) job per airport and market, each one once.
+
+    The markets of an airport are consecutive, so every market of the sweep makes
+    progress at the same pace.
+    """
+    return [
+        (iata, market)
+        for iata in sorted(set(iata_codes))
+        for market in normalize_markets(markets)
+    ]
+
+
+def market_root(root: str, market: str) -> str:
+    """Returns the directory of the results of a market under a results tree, e.g.
+    `<root>/market=es`."""
+    return os.path.join(root, MARKET_PARTITION.format(market=market))
@@ -0,0 +1,116 @@
+from collections.abc import Iterable
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from ..api.booking import MAX_FLEX_DAYS
+
+
+class Query(NamedTuple):
+    """A booking availability call covering the days from `day - flex_days_before`
+    to `day + flex_days_after`."""
+
+    day: str
+    flex_days_before: int
+    flex_days_after: int
+
+    def days(self) -> list[str]:
+        """Returns the covered days in ISO format."""
+        center = date.fromisoformat(self.day)
+        return [
+            (center + timedelta(offset)).isoformat()
+            for offset in range(-self.flex_days_before, self.flex_days_after + 1)
+        ]
+
+
+def plan_queries(
+    date_from: str, date_to: str, flex_days: int = MAX_FLEX_DAYS
+) -> list[Query]:
+    """Plans the fewest booking calls covering every day of a date range once.
+
+    Each call covers 2 * flex_days + 1 days. The last call is trimmed to the end of
+    the range, so that no day outside of it is requested.
+
+    Args:
+        date_from (str): First date of the range in ISO format.
+        date_to (str): Last date of the range in ISO format, included.
+        flex_days (int): Number of flexible days on each side of a queried date, at
+         most MAX_FLEX_DAYS.
+
+    Returns:
+        list[Query]: The calls, in date order.
+    """
+    if not 0 <= flex_days <= MAX_FLEX_DAYS:
+        raise ValueError(f"flex_days needs to be between 0 and {MAX_FLEX_DAYS}.")
+    start = date.fromisoformat(date_from)
+    end = date.fromisoformat(date_to)
+    if end < start:
+        raise ValueError(f"The date {date_to} needs to be after {date_from}.")
+
+    queries = []
+    first = start
+    while first <= end:
+        center = min(first + timedelta(flex_days), end)
+        last = min(center + timedelta(flex_days), end)
+        queries.append(
+            Query(center.isoformat(), (center - first).days, (last - center).days)
+        )
+        first = last + timedelta(1)
+    return queries
+
+
+def coverage(queries: Iterable[Query], date_from: str, date_to: str) -> dict:
+    """Reports how a set of calls covers a date range.
+
+    Returns:
+        dict: The number of days of the range (`n_days`), of calls (`n_calls`), of
+         days covered (`n_covered`) and requested more than once (`n_overlapping`),
+         and the days left uncovered (`missing`).
+    """
+    start = date.fromisoformat(date_from)
+    n_days = (date.fromisoformat(date_to) - start).days + 1
+    in_range = {(start + timedelta(offset)).isoformat() for offset in range(n_days)}
+
+    counts = {}
+    n_calls = 0
+    for query in queries:
+        n_calls += 1
+        for day in query.days():
+            counts[day] = counts.get(day, 0) + 1
+    return {
+        "n_days": n_days,
+        "n_calls": n_calls,
+        "n_covered": len(in_range & counts.keys()),
+        "n_overlapping": sum(1 for count in counts.values() if count > 1),
+        "missing": sorted(in_range - counts.keys()),
+    }
+
+
+def merge_booking_responses(responses: Iterable[dict]) -> dict:
+    """Merges the responses of the calls of a route into a single response.
+
+    A day returned by several calls is kept once, from the first response that has
+    it, and the days of each trip are sorted.
+
+    Args:
+        responses (Iterable[dict]): Responses of `get_flights_booking`.
+
+    Returns:
+        dict: A response with the `currency` and `trips` of the booking API.
+    """
+    merged = {"currency": None, "trips": []}
+    trips = {}
+    for response in responses:
+        merged["currency"] = merged["currency"] or response.get("currency")
+        for trip in response.get("trips", []):
+            key = (trip["origin"], trip["destination"])
+            if key not in trips:
+                trips[key] = ({**trip, "dates": []}, set())
+                merged["trips"].append(trips[key][0])
+            merged_trip, seen = trips[key]
+            for day in trip["dates"]:
+                if day["dateOut"][:10] not in seen:
+                    seen.add(day["dateOut"][:10])
+                    merged_trip["dates"].append(day)
+    for trip in merged["trips"]:
+        trip["dates"].sort(key=lambda day: day["dateOut"])
+    return merged
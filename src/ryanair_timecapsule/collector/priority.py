@@ -0,0 +1,168 @@
+from collections.abc import Callable, Iterable
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+
+from ..analysis.history import FareHistory
+from .planner import Query
+from .routes import normalize_route
+
+
+class Target(NamedTuple):
+    """A route, or an airport if destination is None, and the departure days of a
+    query, with its expected value."""
+
+    origin: str
+    destination: str | None
+    query: Query
+    score: float
+
+
+def window_bounds(windows: list[Query], today: date) -> np.ndarray:
+    """Returns the first departure day of each window, in days from today."""
+    return np.array(
+        [(date.fromisoformat(window.days()[0]) - today).days for window in windows]
+    )
+
+
+def change_counts(
+    history: FareHistory, windows: list[Query], now: datetime, lookback_days: float
+) -> tuple:
+    """Counts, by route and window, the consecutive captures of the same flight in
+    the last lookback_days days and how many of them changed the price.
+
+    The flights are assigned to the windows by their departure day, so the counts
+    tell how volatile the prices of a window have recently been.
+
+    Returns:
+        tuple: The number of capture pairs and of price changes, each an array of
+         shape (number of routes of the history, number of windows).
+    """
+    n_windows = len(windows)
+    today = now.date()
+    starts = window_bounds(windows, today)
+    end = (date.fromisoformat(windows[-1].days()[-1]) - today).days
+
+    deltas = history.price_deltas()
+    since = np.datetime64(now - timedelta(lookback_days), "s")
+    day = (
+        history.departure.astype("datetime64[D]") - np.datetime64(today, "D")
+    ).astype(np.int64)
+    window_id = np.searchsorted(starts, day, side="right") - 1
+    valid = (
+        ~np.isnan(deltas)
+        & (history.captured_at >= since)
+        & (window_id >= 0)
+        & (day <= end)
+    )
+
+    cell = history.route_id[valid] * n_windows + window_id[valid]
+    size = len(history.routes) * n_windows
+    pairs = np.bincount(cell, minlength=size)
+    changes = np.bincount(cell, weights=deltas[valid] != 0, minlength=size)
+    shape = (len(history.routes), n_windows)
+    return pairs.reshape(shape), changes.reshape(shape)
+
+
+def rank_targets(
+    history: FareHistory,
+    windows: list[Query],
+    now: datetime = None,
+    routes: Iterable[tuple[str, str]] = None,
+    lookback_days: float = 14,
+    decay_days: float = 30,
+    prior: float = 1.0,
+) -> list[Target]:
+    """Ranks the (route, window) targets by the value of capturing them again.
+
+    The score of a target is the expected frequency of price changes, times a
+    weight favouring the departures close to now:
+
+        (changes + prior / 2) / (pairs + prior) / (1 + days / decay_days)
+
+    where changes and pairs are counted by `change_counts` and days is the number
+    of days until the first departure of the window. A target without history has
+    a change frequency of 1/2, so new routes are captured before the ones known to
+    be stable.
+
+    Args:
+        history (FareHistory): The past captures.
+        windows (list[Query]): The departure windows, see `planner.plan_queries`.
+        now (datetime): The capture time, by default now.
+        routes (Iterable[tuple[str, str]]): The (origin, destination) routes to
+         rank, by default the routes of the history.
+        lookback_days (float): Only the captures of the last lookback_days days
+         are counted.
+        decay_days (float): Days to departure halving the weight of a window.
+        prior (float): Weight of the prior change frequency of 1/2, in capture
+         pairs.
+
+    Returns:
+        list[Target]: The targets, the most valuable first.
+    """
+    if not windows:
+        return []
+    if prior <= 0:
+        raise ValueError("prior needs to be greater than 0.")
+    now = now or datetime.now()
+    pairs, changes = change_counts(history, windows, now, lookback_days)
+    frequency = (changes + prior / 2) / (pairs + prior)
+    days = np.maximum(window_bounds(windows, now.date()), 0)
+    weight = 1 / (1 + days / decay_days)
+    scores = frequency * weight
+    unknown = 0.5 * weight
+
+    route_index = {route: index for index, route in enumerate(history.routes)}
+    if routes is None:
+        routes = [tuple(route.split("-")) for route in history.routes]
+
+    targets = []
+    for origin, destination in routes:
+        index = route_index.get(f"{origin}-{destination}")
+        route_scores = unknown if index is None else scores[index]
+        targets.extend(
+            Target(origin, destination, window, float(score))
+            for window, score in zip(windows, route_scores)
+        )
+    targets.sort(key=lambda target: -target.score)
+    return targets
+
+
+def merge_targets(targets: Iterable[Target], key: Callable) -> list[Target]:
+    """Sums the scores of the targets answered by the same call.
+
+    Args:
+        targets (Iterable[Target]): The targets, see `rank_targets`.
+        key (Callable): Returns the (origin, destination) of the call answering a
+         target, e.g. `by_airport` or `by_booking_route`.
+
+    Returns:
+        list[Target]: One target per call, the most valuable first.
+    """
+    merged = {}
+    for target in targets:
+        origin, destination = key(target)
+        call = (origin, destination, target.query)
+        merged[call] = merged.get(call, 0.0) + target.score
+    return sorted(
+        (Target(*call, score) for call, score in merged.items()),
+        key=lambda target: -target.score,
+    )
+
+
+def by_airport(target: Target) -> tuple:
+    """A Fare-Finder call answers all the routes departing from an airport."""
+    return target.origin, None
+
+
+def by_booking_route(target: Target) -> tuple:
+    """A return booking call answers both directions of a route."""
+    return normalize_route(target.origin, target.destination)
+
+
+def plan_budget(targets: list[Target], budget: int) -> list[Target]:
+    """Returns the `budget` most valuable targets of a ranking, one call each."""
+    if budget < 0:
+        raise ValueError("budget needs to be at least 0.")
+    return targets[:budget]
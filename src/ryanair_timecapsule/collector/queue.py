@@ -0,0 +1,321 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+from ..api.fare_finder import split_date_range
+from .markets import market_jobs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweep (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, lease_expires);
+"""
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class Lease(NamedTuple):
+    """A job handed to a worker until `expires`."""
+
+    name: str
+    payload: dict
+    attempts: int
+    expires: float
+
+
+def sweep_jobs(
+    iata_codes: Iterable[str],
+    markets: list,
+    date_from: str,
+    date_to: str,
+    window_days: int,
+) -> list[tuple[str, dict]]:
+    """Splits a sweep into one job per airport, market and date window.
+
+    Returns:
+        list[tuple[str, dict]]: The name of each job, e.g.
+         `es/STN_2024-10-08_2024-11-07`, and its parameters.
+    """
+    windows = split_date_range(date_from, date_to, window_days)
+    return [
+        (
+            f"{market}/{iata}_{window_from}_{window_to}",
+            {
+                "iata": iata,
+                "market": market,
+                "date_from": window_from,
+                "date_to": window_to,
+            },
+        )
+        for iata, market in market_jobs(iata_codes, markets)
+        for window_from, window_to in windows
+    ]
+
+
+class WorkQueue:
+    """Work queue of a sweep shared by several worker processes, stored in SQLite.
+
+    A worker leases a job for `lease_seconds`, renews its leases while it works on
+    them (see `renew`), then marks the job done or failed. The job of a worker that
+    dies is leased again once its lease expires, and a failed job is retried until
+    it has been attempted `max_attempts` times. Leases are taken in a write
+    transaction, so no job is handed to two live workers.
+
+    The database can be shared by the workers of several hosts through a network
+    file system that supports file locks. It uses a rollback journal rather than
+    WAL, which needs memory shared by the processes of a single host.
+
+    Args:
+        db_path (str): Path of the SQLite database, created if missing.
+        lease_seconds (float): How long a worker holds a job before it can be
+         leased to another worker.
+        max_attempts (int): Number of attempts before a job is left failed.
+        clock (Callable): Returns the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float = 300,
+        max_attempts: int = 3,
+        clock: Callable = time.time,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts needs to be at least 1.")
+        out_dir = os.path.dirname(db_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Transactions are explicit, and other processes are waited for.
+        self.connection = sqlite3.connect(
+            db_path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode = DELETE")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _transaction(self, statements: Callable):
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements()
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+            return result
+
+    @property
+    def params(self) -> dict | None:
+        """The parameters of the sweep, or None if it has not started."""
+        with self._lock:
+            row = self.connection.execute("SELECT params FROM sweep").fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def start(self, params: dict, jobs: Iterable[tuple[str, dict]]) -> int:
+        """Records the parameters of a new sweep and queues its jobs, or checks that
+        a sweep queued again uses the same parameters.
+
+        A finished sweep (see `is_finished`) is replaced by a sweep with other
+        parameters, e.g. the sweep of the next day, so the queue can be reused.
+
+        Args:
+            params (dict): JSON serializable parameters of the sweep.
+            jobs (Iterable[tuple[str, dict]]): The name and JSON serializable
+             payload of each job, see `sweep_jobs`. Jobs already queued are kept.
+
+        Raises:
+            ValueError: If the queue holds an unfinished sweep with other
+             parameters.
+
+        Returns:
+            int: The number of jobs added.
+        """
+
+        def statements():
+            row = self.connection.execute("SELECT params FROM sweep").fetchone()
+            if row is not None and json.loads(row[0]) != params:
+                (n_unfinished,) = self.connection.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)",
+                    (PENDING, LEASED),
+                ).fetchone()
+                if n_unfinished:
+                    raise ValueError(
+                        f"The queue belongs to an unfinished sweep with different "
+                        f"parameters: {row[0]}."
+                    )
+                self.connection.execute("DELETE FROM sweep")
+                self.connection.execute("DELETE FROM jobs")
+                row = None
+            if row is None:
+                self.connection.execute(
+                    "INSERT INTO sweep VALUES (0, ?)", (json.dumps(params),)
+                )
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO jobs (name, payload) VALUES (?, ?)",
+                ((name, json.dumps(payload)) for name, payload in jobs),
+            )
+            return self.connection.total_changes - before
+
+        return self._transaction(statements)
+
+    def lease(self, worker: str) -> Lease | None:
+        """Leases the oldest pending job, or a job whose lease expired.
+
+        A job whose lease expired after max_attempts attempts, e.g. because its
+        workers keep crashing, is left failed instead.
+
+        Args:
+            worker (str): The name of the worker, e.g. `<host>-<pid>`.
+
+        Returns:
+            Lease | None: The job, or None if no job can be leased right now.
+        """
+
+        def statements():
+            now = self.clock()
+            self.connection.execute(
+                """
+                UPDATE jobs SET status = ?, lease_expires = NULL,
+                error = 'lease expired'
+                WHERE status = ? AND lease_expires <= ? AND attempts >= ?
+                """,
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            row = self.connection.execute(
+                """
+                SELECT position, name, payload, attempts FROM jobs
+                WHERE status = ? OR (status = ? AND lease_expires <= ?)
+                ORDER BY position LIMIT 1
+                """,
+                (PENDING, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            position, name, payload, attempts = row
+            expires = now + self.lease_seconds
+            self.connection.execute(
+                """
+                UPDATE jobs SET status = ?, worker = ?, lease_expires = ?,
+                attempts = attempts + 1 WHERE position = ?
+                """,
+                (LEASED, worker, expires, position),
+            )
+            return Lease(name, json.loads(payload), attempts + 1, expires)
+
+        return self._transaction(statements)
+
+    def _update(self, sql: str, params: tuple) -> bool:
+        with self._lock:
+            cursor = self.connection.execute(sql, params)
+        return cursor.rowcount > 0
+
+    def renew(self, worker: str) -> int:
+        """Extends the leases of the jobs a worker holds by `lease_seconds`, so
+        that they are not leased to another worker while it is still working on
+        them. A lease that already expired and was taken by another worker is not
+        renewed.
+
+        Returns:
+            int: The number of leases renewed.
+        """
+        with self._lock:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE worker = ? AND status = ?",
+                (self.clock() + self.lease_seconds, worker, LEASED),
+            )
+        return cursor.rowcount
+
+    def complete(self, worker: str, name: str) -> bool:
+        """Marks a job as done.
+
+        Returns:
+            bool: False if the job was already done, e.g. by another worker after
+             the lease of this one expired.
+        """
+        return self._update(
+            "UPDATE jobs SET status = ?, worker = ?, error = NULL "
+            "WHERE name = ? AND status != ?",
+            (DONE, worker, name, DONE),
+        )
+
+    def fail(self, worker: str, name: str, error: Exception) -> bool:
+        """Records that a job failed. It is queued again until it has been attempted
+        max_attempts times.
+
+        Only the worker holding the lease of the job can fail it, so a worker whose
+        lease expired does not take the job back from the worker it was handed to.
+
+        Returns:
+            bool: True if the job will be retried, False if it is left failed or the
+             worker does not hold its lease.
+        """
+        updated = self._update(
+            """
+            UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END,
+            lease_expires = NULL, error = ?
+            WHERE name = ? AND worker = ? AND status = ?
+            """,
+            (self.max_attempts, PENDING, FAILED, repr(error), name, worker, LEASED),
+        )
+        return updated and self.status(name) == PENDING
+
+    def status(self, name: str) -> str | None:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT status FROM jobs WHERE name = ?", (name,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def counts(self) -> dict:
+        """Returns the number of jobs by status."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def failures(self) -> dict:
+        """Returns the last error of each job left failed, by name."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT name, error FROM jobs WHERE status = ? ORDER BY position",
+                (FAILED,),
+            ).fetchall()
+        return dict(rows)
+
+    def is_finished(self) -> bool:
+        """Returns True once every job is done or failed for good."""
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
@@ -0,0 +1,65 @@
+from collections.abc import Iterable
+
+from ..storage.delta import read_snapshot
+from ..storage.snapshot import find_snapshots
+
+
+def normalize_route(origin: str, destination: str) -> tuple[str, str]:
+    """Returns the route in alphabetical order, as a return booking query covers
+    both directions."""
+    return (origin, destination) if origin <= destination else (destination, origin)
+
+
+def routes_from_snapshots(path: str) -> set[tuple[str, str]]:
+    """Collects the routes flown in the Fare-Finder results of snapshots.
+
+    Args:
+        path (str): A snapshot or a directory searched recursively.
+
+    Returns:
+        set[tuple[str, str]]: The (origin, destination) of each route, normalized
+         with `normalize_route`.
+    """
+    routes = set()
+    for snapshot_path in find_snapshots(path):
+        for _, result in read_snapshot(snapshot_path):
+            response = result.get("response", result)
+            for fare in response.get("fares", []):
+                flight = fare["outbound"]
+                routes.add(
+                    normalize_route(
+                        flight["departureAirport"]["iataCode"],
+                        flight["arrivalAirport"]["iataCode"],
+                    )
+                )
+    return routes
+
+
+def read_route_list(path: str) -> set[tuple[str, str]]:
+    """Reads a route list with one `ORG-DST` (or `ORG,DST`) route per line.
+
+    Empty lines and lines starting with `#` are ignored.
+
+    Returns:
+        set[tuple[str, str]]: The (origin, destination) of each route, normalized
+         with `normalize_route`.
+    """
+    routes = set()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            origin, destination = line.replace(",", "-").split("-")
+            routes.add(normalize_route(origin.strip(), destination.strip()))
+    return routes
+
+
+def route_jobs(routes: Iterable[tuple[str, str]], queries: list) -> list[tuple]:
+    """Returns one (origin, destination, query) job per route and query, sorted by
+    route. The queries are planned by `collector.planner.plan_queries`."""
+    return [
+        (origin, destination, query)
+        for origin, destination in sorted(routes)
+        for query in queries
+    ]
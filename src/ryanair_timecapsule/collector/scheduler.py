@@ -0,0 +1,181 @@
+import fcntl
+import math
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+class SweepLock:
+    """Exclusive lock on a file, so that the sweeps of several collectors sharing a
+    results tree never overlap. The lock is released if the process dies.
+
+    Args:
+        path (str): The lock file, created if missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Takes the lock without waiting.
+
+        Returns:
+            bool: False if another process holds the lock.
+        """
+        out_dir = os.path.dirname(self.path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.close()
+            self._file = None
+            return False
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def next_slot(previous: float, interval: float, now: float) -> float:
+    """Returns the first run time after now on the cadence of previous, so that a
+    run that overruns its interval skips the missed slots instead of queuing them."""
+    return previous + interval * (math.floor((now - previous) / interval) + 1)
+
+
+@dataclass
+class Job:
+    """A task run every `interval` seconds by a `Scheduler`, with its statistics."""
+
+    name: str
+    interval: float
+    run: Callable
+    next_run: float
+    exclusive: bool = True
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    last_duration: float | None = None
+    last_error: str | None = None
+
+
+class Scheduler:
+    """Runs jobs on fixed cadences in a resident process, e.g. the sweeps of the
+    near-term departures every hour and of the whole year every day.
+
+    The jobs run one after another in the calling thread, so two sweeps never
+    overlap and share the warm connections and reference data of the process. A
+    run that takes longer than its interval skips the missed runs. Exclusive jobs
+    also take the `lock`, and are skipped while another process holds it.
+
+    Args:
+        lock (SweepLock | None): Lock shared with the other collectors.
+        log (Callable | None): Called with a message about each run, e.g. print.
+        clock (Callable): Returns the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        lock: SweepLock | None = None,
+        log: Callable | None = None,
+        clock: Callable = time.time,
+    ):
+        self.lock = lock
+        self.log = log
+        self.clock = clock
+        self.jobs = []
+
+    def _log(self, message: str):
+        if self.log is not None:
+            self.log(message)
+
+    def add(
+        self,
+        name: str,
+        interval: float,
+        run: Callable,
+        start: float | None = None,
+        exclusive: bool = True,
+    ) -> Job:
+        """Schedules a job.
+
+        Args:
+            name (str): The name of the job, used in the log.
+            interval (float): Seconds between two runs.
+            run (Callable): Called without arguments at each run.
+            start (float | None): Time of the first run, by default now.
+            exclusive (bool): If True, the run holds the lock.
+
+        Returns:
+            Job: The scheduled job.
+        """
+        if interval <= 0:
+            raise ValueError("interval needs to be greater than 0.")
+        job = Job(
+            name=name,
+            interval=interval,
+            run=run,
+            next_run=self.clock() if start is None else start,
+            exclusive=exclusive,
+        )
+        self.jobs.append(job)
+        return job
+
+    def _run(self, job: Job):
+        if job.exclusive and self.lock is not None and not self.lock.acquire():
+            job.skipped += 1
+            self._log(f"{job.name} skipped, another sweep holds the lock.")
+        else:
+            start = self.clock()
+            try:
+                job.run()
+                job.runs += 1
+            except Exception as e:
+                job.failures += 1
+                job.last_error = repr(e)
+                self._log(f"{job.name} failed: {e!r}")
+            finally:
+                if job.exclusive and self.lock is not None:
+                    self.lock.release()
+            job.last_duration = self.clock() - start
+            self._log(f"{job.name} ran in {job.last_duration:.1f} s.")
+
+        now = self.clock()
+        next_run = next_slot(job.next_run, job.interval, now)
+        missed = round((next_run - job.next_run) / job.interval) - 1
+        if missed > 0:
+            job.skipped += missed
+            self._log(f"{job.name} skipped {missed} runs that were due during it.")
+        job.next_run = next_run
+
+    def run_pending(self) -> list:
+        """Runs the jobs that are due, the most overdue first.
+
+        Returns:
+            list: The names of the jobs that were due.
+        """
+        now = self.clock()
+        due = sorted(
+            (job for job in self.jobs if job.next_run <= now),
+            key=lambda job: job.next_run,
+        )
+        for job in due:
+            self._run(job)
+        return [job.name for job in due]
+
+    def run_forever(self, stop: threading.Event):
+        """Runs the jobs as they become due, until stop is set."""
+        while not stop.is_set():
+            self.run_pending()
+            if self.jobs:
+                delay = min(job.next_run for job in self.jobs) - self.clock()
+            else:
+                delay = 1.0
+            stop.wait(max(0.0, delay))
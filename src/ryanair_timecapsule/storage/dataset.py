@@ -0,0 +1,209 @@
+import uuid
+from collections.abc import Iterable
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+SOURCE_FARE_FINDER = "fare_finder"
+SOURCE_BOOKING = "booking"
+
+# Columns of a flattened fare, see `get_schema` for their types.
+COLUMNS = [
+    "origin",
+    "destination",
+    "departure",
+    "flight_number",
+    "price",
+    "currency",
+    "captured_at",
+    "source",
+    "market",
+]
+PARTITIONING = ["source", "market", "capture_date"]
+
+
+def flatten_fare_finder(
+    response: dict, captured_at: datetime, market: str | None = None
+) -> list[dict]:
+    """Flattens the `fares` of a Fare-Finder response into one row per flight.
+
+    Args:
+        response (dict): The response of `get_flights_fares`.
+        captured_at (datetime): When the response was downloaded.
+        market (str | None): The market queried, if known.
+
+    Returns:
+        list[dict]: The rows, with the keys in COLUMNS.
+    """
+    rows = []
+    for fare in response.get("fares", []):
+        flight = fare["outbound"]
+        rows.append(
+            {
+                "origin": flight["departureAirport"]["iataCode"],
+                "destination": flight["arrivalAirport"]["iataCode"],
+                "departure": datetime.fromisoformat(flight["departureDate"]),
+                "flight_number": flight.get("flightNumber"),
+                "price": flight["price"]["value"],
+                "currency": flight["price"]["currencyCode"],
+                "captured_at": captured_at,
+                "source": SOURCE_FARE_FINDER,
+                "market": market,
+            }
+        )
+    return rows
+
+
+def flatten_booking(
+    response: dict, captured_at: datetime, market: str | None = None
+) -> list[dict]:
+    """Flattens the `trips/dates/flights` of a Booking response into one row per
+    flight. The price is the adult regular fare, sold out flights are skipped.
+
+    Args:
+        response (dict): The response of `get_flights_booking`.
+        captured_at (datetime): When the response was downloaded.
+        market (str | None): The market queried, if known.
+
+    Returns:
+        list[dict]: The rows, with the keys in COLUMNS.
+    """
+    rows = []
+    currency = response.get("currency")
+    for trip in response.get("trips", []):
+        for day in trip["dates"]:
+            for flight in day["flights"]:
+                regular_fare = flight.get("regularFare")
+                if not regular_fare or not regular_fare.get("fares"):
+                    continue
+                fares = regular_fare["fares"]
+                fare = next((f for f in fares if f["type"] == "ADT"), fares[0])
+                rows.append(
+                    {
+                        "origin": trip["origin"],
+                        "destination": trip["destination"],
+                        "departure": datetime.fromisoformat(flight["time"][0][:19]),
+                        "flight_number": flight.get("flightNumber"),
+                        "price": fare["amount"],
+                        "currency": currency,
+                        "captured_at": captured_at,
+                        "source": SOURCE_BOOKING,
+                        "market": market,
+                    }
+                )
+    return rows
+
+
+def flatten_result(result: dict, captured_at: datetime = None) -> list[dict]:
+    """Flattens a Fare-Finder or Booking result into rows.
+
+    Args:
+        result (dict): Either a sweep result `{"metadata": ..., "response": ...}` or
+         a raw response, as saved by `download_fares_data.py` and `download_booking.py`.
+        captured_at (datetime): When the response was downloaded. By default the
+         `date` of the metadata.
+
+    Returns:
+        list[dict]: The rows, with the keys in COLUMNS. The `market` is the one of
+         the metadata, or None.
+    """
+    response = result
+    market = None
+    if "metadata" in result and "response" in result:
+        response = result["response"]
+        market = result["metadata"].get("market")
+        if captured_at is None:
+            captured_at = datetime.fromisoformat(result["metadata"]["date"])
+    if captured_at is None:
+        raise ValueError("captured_at is needed when the result has no metadata.")
+
+    if "fares" in response:
+        return flatten_fare_finder(response, captured_at, market)
+    if "trips" in response:
+        return flatten_booking(response, captured_at, market)
+    raise ValueError("The result is neither a Fare-Finder nor a Booking response.")
+
+
+def get_schema():
+    """Returns the Arrow schema of the flattened fares."""
+    if pa is None:
+        raise ImportError(
+            "The columnar dataset requires pyarrow, install it with: "
+            "pip install 'ryanair_timecapsule[dataset]'"
+        )
+    return pa.schema(
+        [
+            ("origin", pa.string()),
+            ("destination", pa.string()),
+            ("departure", pa.timestamp("s")),
+            ("flight_number", pa.string()),
+            ("price", pa.float64()),
+            ("currency", pa.string()),
+            ("captured_at", pa.timestamp("us")),
+            ("source", pa.string()),
+            ("market", pa.string()),
+            ("capture_date", pa.date32()),
+        ]
+    )
+
+
+def to_table(rows: Iterable[dict]):
+    """Converts flattened rows into an Arrow table.
+
+    Returns:
+        pyarrow.Table: The table, with a `capture_date` column for partitioning.
+    """
+    schema = get_schema()
+    columns = {column: [] for column in schema.names}
+    for row in rows:
+        for column in COLUMNS:
+            columns[column].append(row[column])
+        columns["capture_date"].append(row["captured_at"].date())
+    return pa.table(columns, schema=schema)
+
+
+def write_dataset(rows: Iterable[dict], root: str, basename: str = None):
+    """Writes flattened rows to a Parquet dataset partitioned by source, market
+    and capture date, e.g.
+    `<root>/source=fare_finder/market=es/capture_date=2024-10-08/`. The rows of an
+    unknown market are in `market=__HIVE_DEFAULT_PARTITION__`.
+
+    Args:
+        rows (Iterable[dict]): The flattened rows.
+        root (str): The root directory of the dataset.
+        basename (str): Prefix of the written files. Writing again with the same
+         basename replaces the files instead of duplicating the rows. By default
+         a random one.
+    """
+    basename = basename or uuid.uuid4().hex
+    ds.write_dataset(
+        to_table(rows),
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        partitioning_flavor="hive",
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def read_dataset(root: str):
+    """Opens a dataset written by `write_dataset` for lazy, column pruned scans.
+
+    Returns:
+        pyarrow.dataset.Dataset: The dataset.
+    """
+    schema = get_schema()
+    return ds.dataset(
+        root,
+        format="parquet",
+        schema=schema,
+        partitioning=ds.partitioning(
+            pa.schema([schema.field(name) for name in PARTITIONING]), flavor="hive"
+        ),
+    )
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import warnings
+from collections.abc import Iterator
+from datetime import datetime
+
+from ..api.fare_finder import fare_key
+from .snapshot import DELTA_SUFFIX, JSONL_SUFFIX, SnapshotWriter, iter_snapshot
+
+MANIFEST_NAME = "delta_manifest.jsonl"
+KEYFRAME = "keyframe"
+DELTA = "delta"
+
+
+def fare_hash(fare: dict) -> str:
+    """Returns a digest of the whole fare, so that a change of any of its fields,
+    e.g. the flight number or `soldOut`, is stored in the next delta."""
+    data = json.dumps(fare, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def result_key(name: str) -> str:
+    """Returns the airport of a sweep result, e.g. `STN_2024-10-08_2025-10-08`,
+    whose previous capture the result is compared with."""
+    return name.split("_")[0]
+
+
+def diff_result(base: dict | None, result: dict) -> dict:
+    """Returns the delta record of a Fare-Finder result against the fares of the
+    previous capture of the same airport.
+
+    Args:
+        base (dict | None): The `fare_hash` of each fare of the previous capture,
+         by `fare_key`, or None if the airport was not captured before.
+        result (dict): The sweep result `{"metadata": ..., "response": ...}`.
+
+    Returns:
+        dict: The metadata, the response without its fares, the fares that
+         changed or that are new in `changed`, and the keys of the fares that are
+         gone in `removed`. Results without fares are kept whole.
+    """
+    response = result["response"]
+    if "fares" not in response:
+        return result
+    base = base or {}
+    changed = []
+    keys = set()
+    for fare in response["fares"]:
+        key = fare_key(fare)
+        keys.add(key)
+        if base.get(key) != fare_hash(fare):
+            changed.append(fare)
+    return {
+        "metadata": result["metadata"],
+        "response": {
+            name: value for name, value in response.items() if name != "fares"
+        },
+        "changed": changed,
+        "removed": [list(key) for key in base.keys() - keys],
+    }
+
+
+class FareState:
+    """Fares of the last capture of each airport, updated capture after capture.
+
+    Args:
+        keep_fares (bool): If True, the whole fares are kept to rebuild the
+         results, otherwise only their `fare_hash`, to compute the next delta.
+        airports (set | None): If given, only these airports are tracked.
+    """
+
+    def __init__(self, keep_fares: bool = True, airports: set | None = None):
+        self.keep_fares = keep_fares
+        self.airports = airports
+        self.fares = {}
+
+    def _value(self, fare: dict):
+        return fare if self.keep_fares else fare_hash(fare)
+
+    def hashes(self, airport: str) -> dict | None:
+        """Returns the `fare_hash` of each fare of the last capture of an airport."""
+        fares = self.fares.get(airport)
+        if fares is None or not self.keep_fares:
+            return fares
+        return {key: fare_hash(fare) for key, fare in fares.items()}
+
+    def apply(self, name: str, record: dict) -> dict | None:
+        """Updates the state with a record of a keyframe or a delta.
+
+        Returns:
+            dict | None: The result of the record, if the fares are kept.
+        """
+        airport = result_key(name)
+        if self.airports is not None and airport not in self.airports:
+            return None
+        response = record["response"]
+        if "changed" not in record:
+            # A whole result, from a keyframe or a response without fares.
+            fares = {
+                fare_key(fare): self._value(fare) for fare in response.get("fares", [])
+            }
+        else:
+            fares = self.fares.get(airport, {})
+            for key in record["removed"]:
+                fares.pop(tuple(key), None)
+            for fare in record["changed"]:
+                fares[fare_key(fare)] = self._value(fare)
+            if self.keep_fares:
+                response = {**response, "fares": list(fares.values())}
+        self.fares[airport] = fares
+        if self.keep_fares:
+            return {"metadata": record["metadata"], "response": response}
+        return None
+
+
+class DeltaStore:
+    """Captures of a sweep stored as periodic full keyframes and deltas.
+
+    Most fares do not change from a capture to the next one, so between two
+    keyframes each capture only stores, for each airport, the fares that changed,
+    the new fares and the keys of the fares that are gone, by flight (see
+    `diff_result`). Any capture can be rebuilt from the keyframe
+    before it and the deltas in between.
+
+    Keyframes are regular `.jsonl.gz` snapshots, deltas end with `.delta.jsonl.gz`.
+    The captures are listed, oldest first, in a manifest at the root of the store,
+    once complete.
+
+    Args:
+        root (str): The root directory of the store, e.g. the results tree.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def captures(self) -> list:
+        """Returns the complete captures, oldest first, each a dict with its
+        `captured_at`, its `kind` (keyframe or delta) and its `path`."""
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path) as f:
+            captures = [json.loads(line) for line in f if line.endswith("\n")]
+        for capture in captures:
+            capture["path"] = os.path.join(self.root, capture["path"])
+        return captures
+
+    def add_capture(self, captured_at: str, kind: str, path: str):
+        """Lists a complete capture in the manifest."""
+        os.makedirs(self.root, exist_ok=True)
+        entry = {
+            "captured_at": captured_at,
+            "kind": kind,
+            "path": os.path.relpath(path, self.root),
+        }
+        with open(self.manifest_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _chain(self, captures: list) -> list:
+        # The last keyframe of the captures and the deltas after it.
+        for i in range(len(captures) - 1, -1, -1):
+            if captures[i]["kind"] == KEYFRAME:
+                return captures[i:]
+        return captures
+
+    def state(self, keep_fares: bool = False) -> FareState:
+        """Returns the fares of the last capture of each airport since the last
+        keyframe, the base of the next delta."""
+        state = FareState(keep_fares=keep_fares)
+        for capture in self._chain(self.captures()):
+            for name, record in iter_snapshot(capture["path"]):
+                state.apply(name, record)
+        return state
+
+    def iter_capture(
+        self, captured_at: str, airports: set | None = None
+    ) -> Iterator[tuple[str, dict]]:
+        """Rebuilds a capture, like `iter_snapshot` reads a full snapshot.
+
+        The fares of a rebuilt result are those of the capture, but not in the
+        order of the original response.
+
+        Args:
+            captured_at (str): The `captured_at` of the capture, see `captures`.
+            airports (set | None): If given, only these airports are rebuilt.
+
+        Yields:
+            tuple[str, dict]: The name and the content of each result.
+        """
+        captures = self.captures()
+        position = next(
+            (
+                i
+                for i, capture in enumerate(captures)
+                if capture["captured_at"] == captured_at
+            ),
+            None,
+        )
+        if position is None:
+            raise ValueError(f"No capture at '{captured_at}' in '{self.root}'.")
+        chain = self._chain(captures[: position + 1])
+        state = FareState(airports=airports)
+        for capture in chain[:-1]:
+            for name, record in iter_snapshot(capture["path"], airports):
+                state.apply(name, record)
+        for name, record in iter_snapshot(chain[-1]["path"], airports):
+            result = state.apply(name, record)
+            if result is not None:
+                yield name, result
+
+    def capture_of(self, path: str) -> dict | None:
+        """Returns the complete capture stored in a keyframe or a delta, see
+        `captures`, or None if the file is not one."""
+        path = os.path.abspath(path)
+        return next(
+            (
+                capture
+                for capture in self.captures()
+                if os.path.abspath(capture["path"]) == path
+            ),
+            None,
+        )
+
+
+def find_store(path: str) -> DeltaStore | None:
+    """Returns the delta store that contains path, from the manifest found in its
+    directory or in a parent directory, or None."""
+    directory = os.path.dirname(os.path.abspath(path))
+    while True:
+        if os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+            return DeltaStore(directory)
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def read_snapshot(path: str, airports: set | None = None) -> Iterator[tuple[str, dict]]:
+    """Reads the results of a snapshot found by `find_snapshots`, like
+    `iter_snapshot`, but rebuilds the results of a delta from its store.
+
+    A delta that is not a complete capture of a delta store, e.g. one still being
+    written or interrupted, can not be rebuilt. It is skipped with a warning.
+
+    Args:
+        path (str): A snapshot or the delta of a delta store.
+        airports (set | None): If given, only the results of these airports.
+
+    Yields:
+        tuple[str, dict]: The name and the content of each result.
+    """
+    if not path.endswith(DELTA_SUFFIX):
+        yield from iter_snapshot(path, airports)
+        return
+    store = find_store(path)
+    capture = None if store is None else store.capture_of(path)
+    if capture is None:
+        warnings.warn(f"'{path}' is not a complete capture of a delta store.")
+        return
+    yield from store.iter_capture(capture["captured_at"], airports)
+
+
+class DeltaWriter:
+    """Writes the results of a sweep into a `DeltaStore` as they arrive, with the
+    interface of `SnapshotWriter`.
+
+    The capture is a keyframe if the store has none, or if `keyframe_interval - 1`
+    deltas were written since the last one. Otherwise each result is stored as its
+    delta against the previous capture of its airport. The capture is only listed
+    in the manifest when the writer is closed, so an interrupted capture is never
+    the base of a delta.
+
+    Args:
+        root (str): The root directory of the store.
+        path (str): The path of the capture if it is a keyframe, ending with
+         `.jsonl.gz`. A delta is written next to it, ending with `.delta.jsonl.gz`.
+        captured_at (str | None): When the capture started, by default now.
+        keyframe_interval (int): Number of captures from a keyframe to the next.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        path: str,
+        captured_at: str | None = None,
+        keyframe_interval: int = 7,
+    ):
+        if not path.endswith(JSONL_SUFFIX) or path.endswith(DELTA_SUFFIX):
+            raise ValueError(f"'{path}' needs to end with '{JSONL_SUFFIX}'.")
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval needs to be at least 1.")
+        self.store = DeltaStore(root)
+        self.captured_at = captured_at or datetime.now().isoformat()
+
+        chain = self.store._chain(self.store.captures())
+        if not chain or len(chain) >= keyframe_interval:
+            self.kind = KEYFRAME
+            self.path = path
+            self._base = None
+        else:
+            self.kind = DELTA
+            self.path = path[: -len(JSONL_SUFFIX)] + DELTA_SUFFIX
+            self._base = self.store.state()
+        self._writer = SnapshotWriter(self.path)
+
+    def write(self, name: str, result: dict):
+        """Adds a result to the capture, see `SnapshotWriter.write`."""
+        if self.kind == DELTA:
+            result = diff_result(self._base.hashes(result_key(name)), result)
+        self._writer.write(name, result)
+
+    def close(self, complete: bool = True):
+        """Closes the capture, and lists it in the manifest if complete."""
+        self._writer.close()
+        if complete:
+            self.store.add_capture(self.captured_at, self.kind, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(complete=exc_info[0] is None)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+
+from .snapshot import find_snapshots, iter_snapshot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    captured_at TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_airports (
+    airport TEXT NOT NULL,
+    captured_at TEXT NOT NULL,
+    path TEXT NOT NULL REFERENCES snapshots(path) ON DELETE CASCADE,
+    PRIMARY KEY (airport, captured_at, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshot_airports_path ON snapshot_airports(path);
+CREATE TABLE IF NOT EXISTS processed (
+    consumer TEXT NOT NULL,
+    path TEXT NOT NULL REFERENCES snapshots(path) ON DELETE CASCADE,
+    sha256 TEXT NOT NULL,
+    processed_at TEXT NOT NULL,
+    PRIMARY KEY (consumer, path)
+);
+"""
+
+
+def file_sha256(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotIndex:
+    """SQLite catalog of the snapshots of a results tree.
+
+    It records the hash, capture time and airports of each snapshot, so that
+    consumers only process the snapshots they have not seen yet, and the snapshots
+    of an airport in a date range are found through an index lookup.
+
+    Args:
+        db_path (str): Path of the SQLite database, created if missing.
+    """
+
+    def __init__(self, db_path: str):
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, root: str) -> list:
+        """Indexes the snapshots under root that are new or changed since the last
+        update. Unchanged files (same size and modification time) are not read, and
+        the snapshots under root that were deleted are removed from the index.
+
+        Args:
+            root (str): A results tree or a single snapshot.
+
+        Returns:
+            list: The paths of the snapshots that were (re)indexed.
+        """
+        root = os.path.abspath(root)
+        scanned = set()
+        indexed = []
+        for path in find_snapshots(root):
+            path = os.path.abspath(path)
+            scanned.add(path)
+            stat = os.stat(path)
+            row = self.connection.execute(
+                "SELECT size, mtime FROM snapshots WHERE path = ?", (path,)
+            ).fetchone()
+            if row == (stat.st_size, stat.st_mtime):
+                continue
+
+            sha256 = file_sha256(path)
+            airports = set()
+            captured_at = None
+            # The deltas of a delta store keep the name and metadata of every result.
+            for name, result in iter_snapshot(path):
+                airports.add(name.split("_")[0])
+                date = result.get("metadata", {}).get("date")
+                if date is not None and (captured_at is None or date < captured_at):
+                    captured_at = date
+            if captured_at is None:
+                captured_at = datetime.fromtimestamp(stat.st_mtime).isoformat()
+
+            with self.connection:
+                self.connection.execute("DELETE FROM snapshots WHERE path = ?", (path,))
+                self.connection.execute(
+                    "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        path,
+                        sha256,
+                        stat.st_size,
+                        stat.st_mtime,
+                        captured_at,
+                        datetime.now().isoformat(),
+                    ),
+                )
+                self.connection.executemany(
+                    "INSERT INTO snapshot_airports VALUES (?, ?, ?)",
+                    [(airport, captured_at, path) for airport in sorted(airports)],
+                )
+            indexed.append(path)
+
+        deleted = [
+            (path,)
+            for (path,) in self.connection.execute("SELECT path FROM snapshots")
+            if (path == root or path.startswith(os.path.join(root, "")))
+            and path not in scanned
+        ]
+        with self.connection:
+            # Their airports and processed marks are deleted in cascade.
+            self.connection.executemany("DELETE FROM snapshots WHERE path = ?", deleted)
+        return indexed
+
+    def pending(self, consumer: str) -> list:
+        """Returns the snapshots that consumer has not processed in their current
+        version, oldest first."""
+        rows = self.connection.execute(
+            """
+            SELECT s.path FROM snapshots s
+            LEFT JOIN processed p ON p.consumer = ? AND p.path = s.path
+            WHERE p.sha256 IS NULL OR p.sha256 != s.sha256
+            ORDER BY s.captured_at
+            """,
+            (consumer,),
+        )
+        return [path for (path,) in rows]
+
+    def mark_processed(self, consumer: str, path: str):
+        """Records that consumer processed the current version of a snapshot."""
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO processed
+                SELECT ?, path, sha256, ? FROM snapshots WHERE path = ?
+                """,
+                (consumer, datetime.now().isoformat(), os.path.abspath(path)),
+            )
+
+    def find(self, airport: str, date_from: str = None, date_to: str = None) -> list:
+        """Returns the snapshots that contain an airport, captured in a date range.
+
+        Args:
+            airport (str): The IATA code of the airport.
+            date_from (str): First capture date in ISO format, included.
+            date_to (str): Last capture date in ISO format, included.
+
+        Returns:
+            list: The (path, captured_at) of the snapshots, oldest first.
+        """
+        # The dates are compared as ISO strings, "~" sorts after any time suffix.
+        rows = self.connection.execute(
+            """
+            SELECT path, captured_at FROM snapshot_airports
+            WHERE airport = ? AND captured_at >= ? AND captured_at <= ?
+            ORDER BY captured_at
+            """,
+            (airport, date_from or "", f"{date_to}~" if date_to else "~"),
+        )
+        return rows.fetchall()
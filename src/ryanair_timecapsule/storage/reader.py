@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import re
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .snapshot import find_snapshots
+
+# The capture time at the start of a snapshot name, e.g. `06:00:00.123456.jsonl.gz`
+# or `06:00:00.123456.<worker>.jsonl.gz` for a shard.
+TIME_PATTERN = re.compile(r"^\d{2}:\d{2}:\d{2}(\.\d{6})?(?=\.)")
+
+
+def snapshot_time(path: str) -> datetime | None:
+    """Returns the capture time of a snapshot from its path in a results tree,
+    e.g. `2024/10/08/06:00:00.jsonl.gz`, or None if the path has another layout."""
+    directory, basename = os.path.split(path)
+    match = TIME_PATTERN.match(basename)
+    day = directory.split(os.sep)[-3:]
+    if match is None or len(day) < 3:
+        return None
+    try:
+        return datetime.fromisoformat(f"{'-'.join(day)}T{match.group()}")
+    except ValueError:
+        return None
+
+
+def list_snapshots(
+    path: str, date_from: str = None, date_to: str = None
+) -> list[tuple[datetime, str]]:
+    """Lists the snapshots of a results tree by capture time, without opening them.
+
+    The capture time is read from the path of each snapshot (see `snapshot_time`),
+    or is its modification time for other layouts.
+
+    Args:
+        path (str): A snapshot or a directory searched recursively.
+        date_from (str): First capture date in ISO format, included.
+        date_to (str): Last capture date in ISO format, included.
+
+    Returns:
+        list[tuple[datetime, str]]: The capture time and path of each snapshot,
+         oldest first.
+    """
+    snapshots = []
+    for snapshot_path in find_snapshots(path):
+        captured_at = snapshot_time(snapshot_path)
+        if captured_at is None:
+            captured_at = datetime.fromtimestamp(os.path.getmtime(snapshot_path))
+        day = captured_at.date().isoformat()
+        if (date_from is None or day >= date_from) and (
+            date_to is None or day <= date_to
+        ):
+            snapshots.append((captured_at, snapshot_path))
+    return sorted(snapshots)
+
+
+def map_snapshots(
+    func: Callable, paths: Iterable[str], max_workers: int | None = None
+) -> Iterator[tuple[str, object]]:
+    """Applies func to each snapshot in a pool of processes, so that decoding many
+    snapshots uses all the cores:
+
+        def cheapest(path):
+            return min(
+                fare["outbound"]["price"]["value"]
+                for _, result in read_snapshot(path, airports={"STN"})
+                for fare in result["response"]["fares"]
+            )
+
+        for path, price in map_snapshots(cheapest, find_snapshots("results")):
+            ...
+
+    func and its result are sent to and from spawned processes, so func needs to
+    be defined at the top level of an importable module or script, or be a
+    `functools.partial` of such a function, and should return a summary rather
+    than the decoded results.
+
+    Args:
+        func (Callable): Called with the path of a snapshot.
+        paths (Iterable[str]): The snapshots, see `list_snapshots`.
+        max_workers (int | None): Number of processes, by default the number of
+         cores. With 1, the snapshots are read in this process.
+
+    Yields:
+        tuple[str, object]: The path of each snapshot and the result of func, in
+         the order of paths. At most 2 * max_workers snapshots are read ahead.
+    """
+    if max_workers == 1:
+        for path in paths:
+            yield path, func(path)
+        return
+
+    max_pending = 2 * (max_workers or os.cpu_count() or 1)
+    # Spawned, as forking a process that runs threads, e.g. of a sweep, may deadlock.
+    executor = ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(func, path)))
+            if len(pending) >= max_pending:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+    finally:
+        # The snapshots not read yet are dropped if the iteration stops early.
+        executor.shutdown(cancel_futures=True)
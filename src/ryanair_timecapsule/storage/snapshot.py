@@ -0,0 +1,249 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from glob import glob
+
+JSONL_SUFFIX = ".jsonl.gz"
+TAR_SUFFIX = ".tar.gz"
+# Deltas of a `storage.delta.DeltaStore`, not full snapshots.
+DELTA_SUFFIX = ".delta.jsonl.gz"
+# Start of every line of a `.jsonl.gz` snapshot, followed by the name.
+NAME_PREFIX = b'{"name":"'
+# Streamed results are buffered in memory up to this size, then on disk.
+SPOOL_SIZE = 1 << 20
+
+
+def dumps(result: dict) -> bytes:
+    """Serializes a result to compact JSON."""
+    return json.dumps(result, separators=(",", ":")).encode()
+
+
+def complete_length(path: str) -> int:
+    """Returns the length in bytes of the complete gzip members at the start of a
+    file, i.e. without a last member cut short by a crash."""
+    length = position = 0
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    with open(path, "rb") as f:
+        data = b""
+        while True:
+            data = data or f.read(1 << 20)
+            if not data:
+                return length
+            try:
+                decompressor.decompress(data)
+            except zlib.error:
+                return length
+            if decompressor.eof:
+                position += len(data) - len(decompressor.unused_data)
+                length = position
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            else:
+                position += len(data)
+                data = b""
+
+
+class SnapshotWriter:
+    """Writes the results of a sweep into a compressed snapshot as they arrive.
+
+    The format is picked from the extension of the path:
+    - `.jsonl.gz`: one JSON line `{"name": ..., "data": ...}` per result, each one
+      compressed as its own gzip member and flushed straight away. A crash keeps
+      every result written so far and the file can be appended to, dropping the
+      result that was being written.
+    - `.tar.gz`: a gzipped tar archive with one `<name>.json` file per result,
+      written as a stream.
+
+    Args:
+        path (str): The path of the snapshot. Missing directories are created.
+        append (bool): If True, results are added to an existing `.jsonl.gz` snapshot.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        if path.endswith(JSONL_SUFFIX):
+            self.format = JSONL_SUFFIX
+        elif path.endswith(TAR_SUFFIX):
+            self.format = TAR_SUFFIX
+        else:
+            raise ValueError(
+                f"'{path}' needs to end with '{JSONL_SUFFIX}' or '{TAR_SUFFIX}'."
+            )
+        if append and self.format != JSONL_SUFFIX:
+            raise ValueError(f"Only '{JSONL_SUFFIX}' snapshots can be appended to.")
+
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        if self.format == JSONL_SUFFIX:
+            self._file = open(path, "ab" if append else "wb")
+            if append:
+                self._file.truncate(complete_length(path))
+        else:
+            self._file = tarfile.open(path, "w|gz")
+
+    def write(self, name: str, result: dict):
+        """Adds a result to the snapshot.
+
+        Args:
+            name (str): The name of the result, e.g. `STN_2024-10-08_2025-10-08`.
+            result (dict): The JSON serializable result.
+        """
+        if self.format == JSONL_SUFFIX:
+            data = gzip.compress(dumps({"name": name, "data": result}) + b"\n")
+            with self._lock:
+                self._file.write(data)
+                self._file.flush()
+        else:
+            data = dumps(result)
+            info = tarfile.TarInfo(f"{name}.json")
+            info.size = len(data)
+            info.mtime = int(time.time())
+            with self._lock:
+                self._file.addfile(info, io.BytesIO(data))
+
+    def write_stream(self, name: str, metadata: dict, stream):
+        """Adds a result whose response is parsed as it arrives, without holding
+        the whole response in memory, see `api.stream.ArrayStream`.
+
+        The result is serialized into a temporary file, kept in memory up to
+        SPOOL_SIZE bytes, and copied to the snapshot once the stream is consumed.
+        So concurrent writes do not interleave, and a stream that fails leaves
+        nothing in the snapshot.
+
+        Args:
+            name (str): The name of the result.
+            metadata (dict): The JSON serializable metadata of the result.
+            stream (ArrayStream): The response, written as
+             `{"metadata": metadata, "response": {key: [...], **rest}}`.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            if self.format == JSONL_SUFFIX:
+                compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+                def write(data: bytes):
+                    spool.write(compressor.compress(data))
+
+                write(b'{"name":' + dumps(name) + b',"data":')
+            else:
+                write = spool.write
+
+            write(b'{"metadata":' + dumps(metadata) + b',"response":{')
+            write(dumps(stream.key) + b":[")
+            for index, item in enumerate(stream):
+                write(b"," + dumps(item) if index else dumps(item))
+            write(b"]")
+            if stream.rest:
+                write(b"," + dumps(stream.rest)[1:-1])
+            write(b"}}")
+
+            if self.format == JSONL_SUFFIX:
+                write(b"}\n")
+                spool.write(compressor.flush())
+                spool.seek(0)
+                with self._lock:
+                    shutil.copyfileobj(spool, self._file)
+                    self._file.flush()
+            else:
+                info = tarfile.TarInfo(f"{name}.json")
+                info.size = spool.tell()
+                info.mtime = int(time.time())
+                spool.seek(0)
+                with self._lock:
+                    self._file.addfile(info, spool)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def result_airport(name: str) -> str:
+    """Returns the airport of a result, e.g. `STN` for `STN_2024-10-08_2025-10-08`,
+    or the route of a booking result, e.g. `STN-VLC` for `STN-VLC_2024-10-25`."""
+    return name.split("_")[0]
+
+
+def line_name(line: bytes) -> str | None:
+    """Returns the name of a JSON line written by `SnapshotWriter` without decoding
+    its data, or None if it can not be read from the start of the line."""
+    if line.startswith(NAME_PREFIX):
+        end = line.find(b'"', len(NAME_PREFIX))
+        name = line[len(NAME_PREFIX) : end]
+        if end > 0 and b"\\" not in name:
+            return name.decode()
+    return None
+
+
+def iter_snapshot(path: str, airports: set | None = None) -> Iterator[tuple[str, dict]]:
+    """Iterates over the results of a snapshot written by `SnapshotWriter`.
+
+    A `.jsonl.gz` snapshot cut short by a crash yields every complete result.
+
+    Args:
+        path (str): The path of a `.jsonl.gz` or `.tar.gz` snapshot.
+        airports (set | None): If given, only the results of these airports (see
+         `result_airport`) are yielded. The others are skipped from their name,
+         without decoding their JSON.
+
+    Yields:
+        tuple[str, dict]: The name and the content of each result.
+    """
+    if path.endswith(JSONL_SUFFIX):
+        with gzip.open(path, "rb") as f:
+            try:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    if airports is not None:
+                        name = line_name(line)
+                        if name is not None and result_airport(name) not in airports:
+                            continue
+                    record = json.loads(line)
+                    if airports is not None and (
+                        result_airport(record["name"]) not in airports
+                    ):
+                        continue
+                    yield record["name"], record["data"]
+            except EOFError:
+                return
+    elif path.endswith(TAR_SUFFIX):
+        with tarfile.open(path, "r|gz") as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.endswith(".json"):
+                    continue
+                name = os.path.basename(member.name)[: -len(".json")]
+                if airports is not None and result_airport(name) not in airports:
+                    continue
+                yield name, json.load(tar.extractfile(member))
+    else:
+        raise ValueError(
+            f"'{path}' needs to end with '{JSONL_SUFFIX}' or '{TAR_SUFFIX}'."
+        )
+
+
+def find_snapshots(path: str) -> list:
+    """Returns the snapshot files found recursively in path, or path itself if it
+    is a file. The deltas of a delta store are listed too, they are read with
+    `storage.delta.read_snapshot`."""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        snapshot
+        for suffix in [JSONL_SUFFIX, TAR_SUFFIX]
+        for snapshot in glob(os.path.join(path, "**", f"*{suffix}"), recursive=True)
+    )
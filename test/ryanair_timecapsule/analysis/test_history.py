@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ryanair_timecapsule.analysis.history import FareHistory
+
+# Two captures of three flights, given out of order.
+ROWS = [
+    ("STN", "VLC", "2024-10-29T06:35", "2024-10-09T06:00", 40.0),
+    ("STN", "VLC", "2024-10-29T06:35", "2024-10-08T06:00", 50.0),
+    ("STN", "VLC", "2024-10-29T06:35", "2024-10-10T06:00", 45.0),
+    ("DUB", "BCN", "2024-10-20T10:00", "2024-10-08T06:00", 20.0),
+    ("DUB", "BCN", "2024-10-20T10:00", "2024-10-09T06:00", 25.0),
+    ("STN", "VLC", "2024-10-30T06:35", "2024-10-08T06:00", 30.0),
+]
+
+
+@pytest.fixture
+def history():
+    return FareHistory.from_records(
+        {
+            "origin": origin,
+            "destination": destination,
+            "departure": datetime.fromisoformat(departure),
+            "captured_at": datetime.fromisoformat(captured_at),
+            "price": price,
+        }
+        for origin, destination, departure, captured_at, price in ROWS
+    )
+
+
+def test_history_series(history):
+    captured_at, price = history.series("STN", "VLC", "2024-10-29T06:35")
+    assert price.tolist() == [50.0, 40.0, 45.0]
+    assert captured_at[0] == np.datetime64("2024-10-08T06:00")
+
+    _, price = history.series("STN", "VLC", datetime(2024, 10, 30, 6, 35))
+    assert price.tolist() == [30.0]
+
+    _, price = history.series("STN", "MAD", "2024-10-29T06:35")
+    assert len(price) == 0
+
+
+def test_history_price_deltas(history):
+    # Sorted by route ("DUB-BCN" first), departure and capture time.
+    np.testing.assert_array_equal(
+        history.price_deltas(), [np.nan, 5.0, np.nan, -10.0, 5.0, np.nan]
+    )
+    assert history.drops().tolist() == [False, False, False, True, False, False]
+    assert history.drops(threshold=0.25, relative=True).sum() == 0
+    assert history.drops(threshold=0.15, relative=True).sum() == 1
+
+
+def test_history_feeds():
+    # The same flight in two markets and currencies, captured alternately.
+    rows = [
+        ("es", "EUR", "2024-10-08T06:00", 50.0),
+        ("gb", "GBP", "2024-10-08T07:00", 40.0),
+        ("es", "EUR", "2024-10-09T06:00", 50.0),
+        ("gb", "GBP", "2024-10-09T07:00", 42.0),
+    ]
+    history = FareHistory.from_records(
+        {
+            "origin": "STN",
+            "destination": "VLC",
+            "departure": datetime(2024, 10, 29, 6, 35),
+            "captured_at": datetime.fromisoformat(captured_at),
+            "price": price,
+            "source": "fare_finder",
+            "market": market,
+            "currency": currency,
+        }
+        for market, currency, captured_at, price in rows
+    )
+    # The prices of a feed are only compared with the same feed.
+    assert sorted(history.feeds) == ["fare_finder/es/EUR", "fare_finder/gb/GBP"]
+    np.testing.assert_array_equal(history.price_deltas(), [np.nan, 0, np.nan, 2])
+    assert not history.drops().any()
+    assert history.rolling_min(2).tolist() == [50.0, 50.0, 40.0, 40.0]
+
+    _, price = history.series("STN", "VLC", "2024-10-29T06:35", "fare_finder/gb/GBP")
+    assert price.tolist() == [40.0, 42.0]
+    _, price = history.series("STN", "VLC", "2024-10-29T06:35", "booking/es/EUR")
+    assert len(price) == 0
+    with pytest.raises(ValueError):
+        history.series("STN", "VLC", "2024-10-29T06:35")
+
+
+def test_history_rolling_min(history):
+    assert history.rolling_min(1).tolist() == history.price.tolist()
+    assert history.rolling_min(2).tolist() == [20.0, 20.0, 50.0, 40.0, 40.0, 30.0]
+    with pytest.raises(ValueError):
+        history.rolling_min(0)
+
+
+def test_history_departure_curve(history):
+    days = history.days_to_departure()
+    assert days[0] == pytest.approx(12 + 4 / 24)
+
+    days, mean_price = history.departure_curve()
+    assert days.tolist() == [11, 12, 19, 20, 21, 22]
+    assert mean_price.tolist() == [25.0, 20.0, 45.0, 40.0, 50.0, 30.0]
+
+
+def test_history_from_dataset(tmp_path):
+    pytest.importorskip("pyarrow")
+    from ryanair_timecapsule.storage.dataset import write_dataset
+
+    rows = [
+        {
+            "origin": origin,
+            "destination": destination,
+            "departure": datetime.fromisoformat(departure),
+            "flight_number": None,
+            "price": price,
+            "currency": "EUR",
+            "captured_at": datetime.fromisoformat(captured_at),
+            "source": "fare_finder",
+            "market": "es",
+        }
+        for origin, destination, departure, captured_at, price in ROWS
+    ]
+    write_dataset(rows, str(tmp_path))
+
+    history = FareHistory.from_dataset(str(tmp_path))
+    _, price = history.series("STN", "VLC", "2024-10-29T06:35")
+    assert price.tolist() == [50.0, 40.0, 45.0]
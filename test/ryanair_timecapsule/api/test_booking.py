@@ -1,8 +1,28 @@
+import asyncio
+import time
+
 import pytest
 import requests
 from pydantic import ValidationError
 
-from ryanair_timecapsule.api.booking import ENDPOINT, get_flights_booking
+from ryanair_timecapsule.api.booking import (
+    AUTH_ENDPOINT,
+    ENDPOINT,
+    MAX_FLEX_DAYS,
+    AuthSession,
+    async_get_flights_booking,
+    get_flights_booking,
+)
+
+
+@pytest.fixture(autouse=True)
+def auth_session(monkeypatch):
+    session = AuthSession()
+    monkeypatch.setattr("ryanair_timecapsule.api.booking.auth_session", session)
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.booking.async_auth_session", AuthSession()
+    )
+    return session
 
 
 def mock_call_api(url, params, headers, return_json):
@@ -96,3 +116,137 @@ def test_get_booking_incorrect_params(
             depart_date_from=depart_date_from,
             depart_date_to=depart_date_to,
         )
+
+
+async def mock_async_call_api(url, params, headers, return_json):
+    return mock_call_api(url, params, headers, return_json)
+
+
+def test_async_get_booking_correct_params(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_call_api", mock_async_call_api
+    )
+    url, params, headers, return_json = asyncio.run(
+        async_get_flights_booking(
+            n_adults=1,
+            n_children=0,
+            n_infants=0,
+            n_teenagers=0,
+            depart_iata_code="STN",
+            destination_iata_code="VLC",
+            depart_date_from="2024-10-29",
+            depart_date_to="2024-10-31",
+        )
+    )
+    assert url == ENDPOINT
+    assert params["Origin"] == "STN"
+    assert params["RoundTrip"] == "true"
+
+
+BOOKING_ARGS = dict(
+    n_adults=1,
+    n_teenagers=0,
+    n_children=0,
+    n_infants=0,
+    depart_iata_code="STN",
+    destination_iata_code="VLC",
+    depart_date_from="2024-10-29",
+    depart_date_to="2024-10-31",
+)
+
+
+def test_get_booking_reuses_cookies(monkeypatch, auth_session):
+    urls = []
+
+    def call_api(url, params, headers, return_json):
+        urls.append(url)
+        return mock_call_api(url, params, headers, return_json)
+
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", call_api)
+    for destination in ["VLC", "BCN", "MAD"]:
+        get_flights_booking(**{**BOOKING_ARGS, "destination_iata_code": destination})
+    assert urls == [AUTH_ENDPOINT, ENDPOINT, ENDPOINT, ENDPOINT]
+    assert auth_session.n_authentications == 1
+
+    # Expired cookies are renewed before the next query.
+    auth_session.expires_at = 0.0
+    get_flights_booking(**BOOKING_ARGS)
+    assert urls[-2:] == [AUTH_ENDPOINT, ENDPOINT]
+
+
+def test_get_booking_renews_rejected_cookies(monkeypatch, auth_session):
+    urls = []
+
+    def call_api(url, params, headers, return_json):
+        urls.append(url)
+        if url == ENDPOINT and urls.count(ENDPOINT) == 2:
+            response = requests.models.Response()
+            response.status_code = 409
+            raise requests.HTTPError(response=response)
+        return mock_call_api(url, params, headers, return_json)
+
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", call_api)
+    get_flights_booking(**BOOKING_ARGS)
+    url, *_ = get_flights_booking(**BOOKING_ARGS)
+    assert url == ENDPOINT
+    assert urls == [AUTH_ENDPOINT, ENDPOINT, ENDPOINT, AUTH_ENDPOINT, ENDPOINT]
+    assert auth_session.n_authentications == 2
+
+
+def test_get_booking_sync_and_async_cookies(monkeypatch, auth_session):
+    urls = []
+
+    def call_api(url, params, headers, return_json):
+        urls.append(("sync", url))
+        return mock_call_api(url, params, headers, return_json)
+
+    async def async_call_api(url, params, headers, return_json):
+        urls.append(("async", url))
+        return mock_call_api(url, params, headers, return_json)
+
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", call_api)
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.async_call_api", async_call_api)
+    get_flights_booking(**BOOKING_ARGS)
+    asyncio.run(async_get_flights_booking(**BOOKING_ARGS))
+    get_flights_booking(**BOOKING_ARGS)
+    asyncio.run(async_get_flights_booking(**BOOKING_ARGS))
+    # The cookies of the session are not sent by the client, and vice versa.
+    assert urls == [
+        ("sync", AUTH_ENDPOINT),
+        ("sync", ENDPOINT),
+        ("async", AUTH_ENDPOINT),
+        ("async", ENDPOINT),
+        ("sync", ENDPOINT),
+        ("async", ENDPOINT),
+    ]
+
+    # A new client authenticates again.
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.async_session", object())
+    asyncio.run(async_get_flights_booking(**BOOKING_ARGS))
+    assert urls[-2:] == [("async", AUTH_ENDPOINT), ("async", ENDPOINT)]
+    assert auth_session.n_authentications == 1
+
+
+def test_get_booking_cookie_expiry(monkeypatch, auth_session):
+    def call_api(url, params, headers, return_json):
+        response = mock_call_api(url, params, headers, return_json)
+        if not return_json:
+            response.cookies.set("rid", "fake_rid", expires=time.time() + 60)
+        return response
+
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", call_api)
+    get_flights_booking(**BOOKING_ARGS)
+    assert auth_session.expires_at <= time.time() + 60
+    assert auth_session.is_valid()
+
+
+def test_get_booking_flex_days(monkeypatch):
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", mock_call_api)
+    _, params, _, _ = get_flights_booking(
+        **BOOKING_ARGS, flex_days_before=0, flex_days_after=6
+    )
+    assert params["FlexDaysBeforeOut"] == params["FlexDaysBeforeIn"] == 0
+    assert params["FlexDaysOut"] == params["FlexDaysIn"] == 6
+
+    with pytest.raises(ValidationError):
+        get_flights_booking(**BOOKING_ARGS, flex_days_after=MAX_FLEX_DAYS + 1)
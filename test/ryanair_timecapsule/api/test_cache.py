@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+import requests
+import requests_mock
+
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.cache import ResponseCache, cache_key
+from ryanair_timecapsule.api.utils import async_call_api, call_api, set_response_cache
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.response_cache", None)
+
+
+def test_cache_key_normalized():
+    assert cache_key("mock://a", {"x": 1, "y": "2"}) == cache_key(
+        "mock://a", {"y": 2, "x": "1"}
+    )
+    assert cache_key("mock://a", {"x": 1}) != cache_key("mock://b", {"x": 1})
+
+
+def test_response_cache_lru():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    for name in ["a", "b"]:
+        cache.store(f"mock://{name}", None, name, {})
+    assert cache.lookup("mock://a")["body"] == "a"
+    cache.store("mock://c", None, "c", {})
+    # b was the least recently used.
+    assert cache.lookup("mock://b") is None
+    assert cache.lookup("mock://a")["body"] == "a"
+    assert cache.lookup("mock://c")["body"] == "c"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_response_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ryanair_timecapsule.api.cache.time.time", lambda: now[0])
+    cache = ResponseCache(ttl=60, max_stale=600)
+    cache.store("mock://plain", None, 1, {})
+    cache.store("mock://etag", None, 2, {"ETag": '"v1"'})
+
+    now[0] += 61
+    # Without validators a stale response is evicted, otherwise it is revalidated.
+    assert cache.lookup("mock://plain") is None
+    entry = cache.lookup("mock://etag")
+    assert not cache.is_fresh(entry)
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"'}
+    assert cache.revalidated("mock://etag", None, entry) == 2
+    assert cache.is_fresh(cache.lookup("mock://etag"))
+
+    now[0] += 60 + 600
+    assert cache.lookup("mock://etag") is None
+
+
+def test_response_cache_disk(tmp_path):
+    cache = ResponseCache(ttl=60, cache_dir=str(tmp_path))
+    cache.store("mock://a", {"x": 1}, {"fares": []}, {"Last-Modified": "yesterday"})
+
+    # A new process finds the response on disk.
+    entry = ResponseCache(ttl=60, cache_dir=str(tmp_path)).lookup("mock://a", {"x": 1})
+    assert entry["body"] == {"fares": []}
+    assert entry["last_modified"] == "yesterday"
+
+    cache.clear()
+    assert ResponseCache(cache_dir=str(tmp_path)).lookup("mock://a", {"x": 1}) is None
+
+
+def make_mock_session(requests_seen):
+    session = requests.Session()
+    adapter = requests_mock.Adapter()
+    session.mount("mock://", adapter=adapter)
+
+    def fares(request, context):
+        requests_seen.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            context.status_code = 304
+            return ""
+        context.headers["ETag"] = '"v1"'
+        return '{"fares": [1, 2]}'
+
+    adapter.register_uri("GET", "mock://test.com/fares", text=fares)
+    return session
+
+
+def test_call_api_response_cache(monkeypatch):
+    requests_seen = []
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.session", make_mock_session(requests_seen)
+    )
+    set_response_cache(ttl=60)
+
+    for _ in range(3):
+        assert call_api("mock://test.com/fares", {"a": 1}) == {"fares": [1, 2]}
+    assert len(requests_seen) == 1
+
+    # Other parameters are another entry, responses are not cached.
+    call_api("mock://test.com/fares", {"a": 2})
+    response = call_api("mock://test.com/fares", {"a": 2}, return_json=False)
+    assert isinstance(response, requests.Response)
+    assert len(requests_seen) == 3
+
+    # A stale response is revalidated with its ETag.
+    utils.response_cache.ttl = 0
+    assert call_api("mock://test.com/fares", {"a": 1}) == {"fares": [1, 2]}
+    assert requests_seen[-1].headers["If-None-Match"] == '"v1"'
+    assert utils.response_cache.revalidations == 1
+
+    set_response_cache(None)
+    assert utils.response_cache is None
+
+
+def test_async_call_api_response_cache(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"fares": [1]}, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_session",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    set_response_cache(ttl=60)
+
+    async def call_twice():
+        return [await async_call_api("https://test.com/fares") for _ in range(2)]
+
+    assert asyncio.run(call_twice()) == [{"fares": [1]}, {"fares": [1]}]
+    assert len(requests_seen) == 1
+
+    utils.response_cache.ttl = 0
+    assert asyncio.run(async_call_api("https://test.com/fares")) == {"fares": [1]}
+    assert len(requests_seen) == 2
+    assert utils.response_cache.revalidations == 1
@@ -0,0 +1,159 @@
+import json
+import os
+
+import pytest
+import requests
+import requests_mock
+
+from ryanair_timecapsule.api import constants
+
+
+# The real download, which the `downloads` fixture replaces.
+DOWNLOAD_ACTIVE_MARKET = constants.download_active_market
+
+
+@pytest.fixture
+def downloads(monkeypatch, tmp_path):
+    """Points the cache to a temporary directory and counts the downloads."""
+    calls = []
+
+    def mock_download_active_market():
+        calls.append("markets")
+        return {"gb", "es"}
+
+    def mock_download_active_iata_codes():
+        calls.append("iata_codes")
+        return {"STN", "VLC"}
+
+    monkeypatch.setattr(constants, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(constants, "_loaded", {})
+    monkeypatch.setattr(
+        constants, "download_active_market", mock_download_active_market
+    )
+    monkeypatch.setattr(
+        constants, "download_active_iata_codes", mock_download_active_iata_codes
+    )
+    return calls
+
+
+def test_reference_data_loaded_once(downloads):
+    assert constants.get_markets() == {"gb", "es"}
+    assert constants.get_markets() == {"gb", "es"}
+    assert constants.IATA_CODES == {"STN", "VLC"}
+    assert downloads == ["markets", "iata_codes"]
+
+
+def test_reference_data_disk_cache(downloads, monkeypatch, tmp_path):
+    constants.get_markets()
+
+    # A new process reads the fresh copy from disk.
+    monkeypatch.setattr(constants, "_loaded", {})
+    assert constants.get_markets() == {"gb", "es"}
+    assert downloads == ["markets"]
+
+    # Once the TTL expires the set is downloaded again.
+    with open(os.path.join(tmp_path, "markets.json")) as f:
+        cached = json.load(f)
+    assert cached["codes"] == ["es", "gb"]
+    cached["downloaded_at"] -= constants.CACHE_TTL + 1
+    with open(os.path.join(tmp_path, "markets.json"), "w") as f:
+        json.dump(cached, f)
+    monkeypatch.setattr(constants, "_loaded", {})
+    constants.get_markets()
+    assert downloads == ["markets", "markets"]
+
+
+@pytest.mark.parametrize(
+    "cached",
+    [
+        ["es", "gb"],
+        {"codes": ["es", "gb"]},
+        {"downloaded_at": "yesterday", "codes": ["es", "gb"]},
+        {"downloaded_at": 0, "codes": None},
+    ],
+)
+def test_reference_data_invalid_cache(downloads, tmp_path, cached):
+    # A cache of another shape is downloaded again and overwritten.
+    with open(os.path.join(tmp_path, "markets.json"), "w") as f:
+        json.dump(cached, f)
+    assert constants.get_markets() == {"gb", "es"}
+    assert downloads == ["markets"]
+    with open(os.path.join(tmp_path, "markets.json")) as f:
+        assert json.load(f)["codes"] == ["es", "gb"]
+
+
+def test_reference_data_unwritable_cache(downloads, monkeypatch, tmp_path):
+    def replace(src, dst):
+        raise PermissionError(f"cannot write {dst}")
+
+    monkeypatch.setattr(constants.os, "replace", replace)
+    with pytest.warns(UserWarning):
+        assert constants.get_markets() == {"gb", "es"}
+    assert os.listdir(tmp_path) == []
+
+
+def test_refresh_reference_data(downloads):
+    constants.get_markets()
+    constants.get_iata_codes()
+    constants.refresh_reference_data()
+    assert downloads == ["markets", "iata_codes", "markets", "iata_codes"]
+
+
+def test_reference_data_offline(downloads, monkeypatch):
+    constants.get_markets()
+
+    def offline():
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr(constants, "download_active_market", offline)
+
+    # A stale copy is used when the download fails.
+    with pytest.warns(UserWarning):
+        assert constants.load_reference_data("markets", refresh=True) == {"gb", "es"}
+
+    # Without any copy the error is raised.
+    monkeypatch.setattr(constants, "download_active_iata_codes", offline)
+    with pytest.raises(requests.ConnectionError):
+        constants.get_iata_codes()
+
+
+def test_download_reference_data():
+    with requests_mock.Mocker() as mocker:
+        mocker.get(constants.MARKETS_ENDPOINT, json=[{"code": "es"}])
+        mocker.get(constants.ACTIVE_IATA_ENDPOINT, json=[{"code": "STN"}])
+        assert constants.download_active_market() == {"es"}
+        assert constants.download_active_iata_codes() == {"STN"}
+    # A stalled download does not hang the caller.
+    assert [request.timeout for request in mocker.request_history] == [
+        constants.REQUEST_TIMEOUT
+    ] * 2
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        {"status_code": 503, "json": [{"code": "es"}]},
+        {"text": "<html>Maintenance</html>"},
+        {"json": {"markets": []}},
+        {"json": [{"name": "Spain"}]},
+    ],
+)
+def test_reference_data_bad_response(downloads, monkeypatch, response):
+    constants.get_markets()
+    monkeypatch.setattr(constants, "download_active_market", DOWNLOAD_ACTIVE_MARKET)
+
+    # Errors and unexpected responses fall back to the cached copy.
+    with requests_mock.Mocker() as mocker:
+        mocker.get(constants.MARKETS_ENDPOINT, **response)
+        with pytest.warns(UserWarning):
+            assert constants.load_reference_data("markets", refresh=True) == {
+                "gb",
+                "es",
+            }
+
+
+def test_reference_data_unknown_name():
+    with pytest.raises(ValueError):
+        constants.load_reference_data("airlines")
+    with pytest.raises(AttributeError):
+        _ = constants.AIRLINES
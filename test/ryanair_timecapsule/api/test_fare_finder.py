@@ -1,20 +1,41 @@
+import asyncio
+
 import pytest
+import requests
 from pydantic import ValidationError
 
-from ryanair_timecapsule.api.fare_finder import ENDPOINT, get_flights_fares
+from ryanair_timecapsule.api import constants
+from ryanair_timecapsule.api.fare_finder import (
+    ENDPOINT,
+    async_get_flights_fares,
+    async_get_flights_fares_chunked,
+    fare_key,
+    get_flights_fares,
+    get_flights_fares_chunked,
+    merge_fares,
+    split_date_range,
+)
 from ryanair_timecapsule.api.utils import call_api
 
 DEFAULT_PARAMS = {
     "outboundDepartureTimeFrom": "00:00",
     "outboundDepartureTimeTo": "23:59",
     "adultPaxCount": 1,
-    "market": "en-gb",
+    "market": "gb",
     "searchMode": "ALL",
     "offset": 0,
     "limit": 39999,
 }
 
 
+@pytest.fixture(autouse=True)
+def markets(monkeypatch):
+    # Avoid downloading the active markets, see constants.load_reference_data.
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.constants._loaded", {"markets": {"gb", "en-gb"}}
+    )
+
+
 def mock_call_api(url, params, return_json):
     return url, params, return_json
 
@@ -88,3 +109,172 @@ def test_get_flights_fares_incorrect_params(
             n_pass,
             market,
         )
+
+
+def test_get_flights_fares_refreshed_markets(monkeypatch, tmp_path):
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", mock_call_api)
+    monkeypatch.setattr(constants, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(constants, "download_active_market", lambda: {"es"})
+    monkeypatch.setattr(constants, "download_active_iata_codes", lambda: {"STN"})
+    args = ("STN", "2024-03-19", "2024-03-24", 1, 5)
+    get_flights_fares(*args, market="gb")
+
+    # A market that is no longer active is rejected once the markets are refreshed.
+    constants.refresh_reference_data()
+    with pytest.raises(ValidationError):
+        get_flights_fares(*args, market="gb")
+    _, params, _ = get_flights_fares(*args, market="es")
+    assert params["market"] == "es"
+
+
+async def mock_async_call_api(url, params, return_json):
+    return url, params, return_json
+
+
+def test_async_get_flights_fares_correct_params(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_call_api", mock_async_call_api
+    )
+    url, params, return_json = asyncio.run(
+        async_get_flights_fares(
+            depart_iata_code="STN",
+            depart_date_from="2024-03-19",
+            depart_date_to="2024-03-24",
+            duration_from=1,
+            duration_to=5,
+        )
+    )
+    assert url == ENDPOINT
+    assert params["departureAirportIataCode"] == "STN"
+    assert return_json
+
+
+def make_fare(day, destination, flight_number="FR1"):
+    return {
+        "outbound": {
+            "departureAirport": {"iataCode": "STN"},
+            "arrivalAirport": {"iataCode": destination},
+            "departureDate": f"{day}T06:00:00",
+            "flightNumber": flight_number,
+        }
+    }
+
+
+# Three fares per day, the API sorts them by price and not by date.
+def all_fares(date_from, date_to):
+    days = [f"2024-03-{day:02d}" for day in range(1, 32)]
+    return [
+        make_fare(day, destination)
+        for destination in ["VLC", "BCN", "DUB"]
+        for day in days
+        if date_from <= day <= date_to
+    ]
+
+
+class FakeFareFinder:
+    """Pages through all_fares like the API, optionally failing some requests."""
+
+    def __init__(self, n_failures=0):
+        self.requests = []
+        self.n_failures = n_failures
+
+    def __call__(self, url, params, return_json):
+        self.requests.append(dict(params))
+        if self.n_failures > 0 and params["offset"] > 0:
+            self.n_failures -= 1
+            raise requests.ConnectionError("Connection reset")
+        fares = all_fares(
+            params["outboundDepartureDateFrom"], params["outboundDepartureDateTo"]
+        )
+        page = fares[params["offset"] : params["offset"] + params["limit"]]
+        return {"fares": page, "size": len(page), "nextPage": None}
+
+
+def test_split_date_range():
+    assert split_date_range("2024-03-01", "2024-03-10", 4) == [
+        ("2024-03-01", "2024-03-04"),
+        ("2024-03-05", "2024-03-08"),
+        ("2024-03-09", "2024-03-10"),
+    ]
+    assert split_date_range("2024-03-01", "2024-03-01", 31) == [
+        ("2024-03-01", "2024-03-01")
+    ]
+
+
+@pytest.mark.parametrize("chunk_days, page_size", [(31, 39999), (7, 5), (1, 3)])
+def test_get_flights_fares_chunked(monkeypatch, chunk_days, page_size):
+    fake = FakeFareFinder()
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", fake)
+    response = get_flights_fares_chunked(
+        depart_iata_code="STN",
+        depart_date_from="2024-03-01",
+        depart_date_to="2024-03-31",
+        duration_from=1,
+        duration_to=5,
+        chunk_days=chunk_days,
+        page_size=page_size,
+    )
+    expected = all_fares("2024-03-01", "2024-03-31")
+    assert sorted(map(fare_key, response["fares"])) == sorted(map(fare_key, expected))
+    assert response["size"] == len(expected)
+    assert all(params["limit"] == page_size for params in fake.requests)
+
+
+def test_get_flights_fares_chunked_retries_chunk(monkeypatch):
+    fake = FakeFareFinder(n_failures=2)
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", fake)
+    response = get_flights_fares_chunked(
+        depart_iata_code="STN",
+        depart_date_from="2024-03-01",
+        depart_date_to="2024-03-31",
+        duration_from=1,
+        duration_to=5,
+        page_size=40,
+        max_workers=1,
+    )
+    assert response["size"] == 93
+    # The failing chunk is requested again from its first page.
+    assert [params["offset"] for params in fake.requests] == [0, 40, 0, 40, 0, 40, 80]
+
+    fake = FakeFareFinder(n_failures=3)
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.call_api", fake)
+    with pytest.raises(requests.ConnectionError):
+        get_flights_fares_chunked(
+            depart_iata_code="STN",
+            depart_date_from="2024-03-01",
+            depart_date_to="2024-03-31",
+            duration_from=1,
+            duration_to=5,
+            page_size=40,
+        )
+
+
+def test_merge_fares_deterministic():
+    first = {"fares": [make_fare("2024-03-02", "VLC"), make_fare("2024-03-01", "BCN")]}
+    second = {"fares": [make_fare("2024-03-01", "BCN"), make_fare("2024-03-03", "DUB")]}
+    merged = merge_fares([first, second])
+    assert [fare_key(fare)[1] for fare in merged["fares"]] == ["VLC", "BCN", "DUB"]
+    assert merged["size"] == 3
+
+
+def test_async_get_flights_fares_chunked(monkeypatch):
+    fake = FakeFareFinder()
+
+    async def async_fake(url, params, return_json):
+        await asyncio.sleep(0)
+        return fake(url, params, return_json)
+
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.async_call_api", async_fake)
+    response = asyncio.run(
+        async_get_flights_fares_chunked(
+            depart_iata_code="STN",
+            depart_date_from="2024-03-01",
+            depart_date_to="2024-03-31",
+            duration_from=1,
+            duration_to=5,
+            chunk_days=10,
+            page_size=10,
+        )
+    )
+    assert response["size"] == 93
+    assert len({fare_key(fare) for fare in response["fares"]}) == 93
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+import requests_mock
+from requests.exceptions import HTTPError
+
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.metrics import MetricsRecorder, endpoint_name
+from ryanair_timecapsule.api.utils import async_call_api, call_api, set_metrics
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.metrics", None)
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.response_cache", None)
+    return set_metrics()
+
+
+def test_endpoint_name():
+    assert endpoint_name("https://a.com/api/x?y=1") == "a.com/api/x"
+
+
+def test_metrics_recorder_summary():
+    recorder = MetricsRecorder(buckets=(0.1, 1.0))
+    url = "https://a.com/fares"
+    recorder.record(url, {"departureAirportIataCode": "STN"}, seconds=0.05, status=200)
+    recorder.record(
+        url,
+        {"departureAirportIataCode": "MAD"},
+        seconds=2.0,
+        ttfb=0.5,
+        connect_seconds=0.2,
+        connections=1,
+        status=429,
+        retries=2,
+        n_bytes=10,
+        error="HTTPError",
+    )
+    recorder.record_cache_hit(url)
+
+    summary = recorder.summary()
+    stats = summary["endpoints"]["a.com/fares"]
+    assert stats["requests"] == 2
+    assert stats["cache_hits"] == 1
+    assert stats["retries"] == 2
+    assert stats["bytes"] == 10
+    assert stats["connections"] == 1
+    assert stats["mean_seconds"] == pytest.approx(1.025)
+    assert stats["max_seconds"] == 2.0
+    assert stats["status_codes"] == {"200": 1, "429": 1}
+    assert stats["errors"] == {"HTTPError": 1}
+    assert [item["label"] for item in summary["slowest"]] == ["MAD", "STN"]
+
+
+def test_metrics_recorder_prometheus(tmp_path):
+    recorder = MetricsRecorder(buckets=(0.1, 1.0))
+    recorder.record("https://a.com/fares", seconds=0.05, status=200)
+    recorder.record("https://a.com/fares", seconds=0.5, status=200)
+    recorder.record("https://a.com/fares", seconds=5.0, error="ConnectionError")
+
+    text = recorder.to_prometheus()
+    assert (
+        'ryanair_timecapsule_requests_total{endpoint="a.com/fares",status="200"} 2'
+        in text
+    )
+    assert (
+        'ryanair_timecapsule_errors_total{endpoint="a.com/fares",'
+        'error="ConnectionError"} 1' in text
+    )
+    name = "ryanair_timecapsule_request_duration_seconds"
+    assert f'{name}_bucket{{endpoint="a.com/fares",le="0.1"}} 1' in text
+    assert f'{name}_bucket{{endpoint="a.com/fares",le="1.0"}} 2' in text
+    assert f'{name}_bucket{{endpoint="a.com/fares",le="+Inf"}} 3' in text
+    assert f'{name}_count{{endpoint="a.com/fares"}} 3' in text
+
+    recorder.save(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == text
+    recorder.save(str(tmp_path / "metrics.json"))
+    with open(tmp_path / "metrics.json") as f:
+        assert json.load(f) == recorder.summary()
+
+
+def test_call_api_metrics(monkeypatch, metrics):
+    statuses = [429, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(statuses.pop(0))
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "10")
+            self.end_headers()
+            self.wfile.write(b'{"a": "b"}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    session = requests.Session()
+    session.mount(
+        "http://", utils.TimedHTTPAdapter(max_retries=utils.retry.new(backoff_factor=0))
+    )
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.session", session)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/json"
+        call_api(url=url, params={"departureAirportIataCode": "STN"})
+    finally:
+        server.shutdown()
+
+    # The retry hidden by urllib3 was recorded, and the connection was reused.
+    stats = metrics.summary()["endpoints"]["127.0.0.1/json"]
+    assert stats["requests"] == 1
+    assert stats["retries"] == 1
+    assert stats["connections"] == 1
+    assert stats["bytes"] == 10
+    assert stats["status_codes"] == {"200": 1}
+    assert stats["mean_ttfb_seconds"] > 0
+    assert metrics.summary()["slowest"][0]["label"] == "STN"
+
+
+def test_call_api_metrics_error(monkeypatch, metrics):
+    session = requests.Session()
+    adapter = requests_mock.Adapter()
+    session.mount("mock://", adapter=adapter)
+    adapter.register_uri("GET", "mock://test.com/error", status_code=555)
+    adapter.register_uri(
+        "GET", "mock://test.com/down", exc=requests.exceptions.ConnectTimeout
+    )
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.session", session)
+
+    with pytest.raises(HTTPError):
+        call_api(url="mock://test.com/error")
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        call_api(url="mock://test.com/down")
+
+    endpoints = metrics.summary()["endpoints"]
+    assert endpoints["test.com/error"]["errors"] == {"HTTPError": 1}
+    assert endpoints["test.com/error"]["status_codes"] == {"555": 1}
+    assert endpoints["test.com/down"]["errors"] == {"ConnectTimeout": 1}
+    assert endpoints["test.com/down"]["status_codes"] == {}
+
+
+def test_async_call_api_metrics(monkeypatch, metrics):
+    httpx = pytest.importorskip("httpx")
+    statuses = iter([503, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), json={"a": "b"})
+
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_session",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.retry", utils.retry.new(backoff_factor=0)
+    )
+    asyncio.run(async_call_api(url="https://test.com/json"))
+
+    stats = metrics.summary()["endpoints"]["test.com/json"]
+    assert stats["requests"] == 1
+    assert stats["retries"] == 1
+    assert stats["status_codes"] == {"200": 1}
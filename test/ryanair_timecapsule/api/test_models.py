@@ -0,0 +1,146 @@
+import json
+from datetime import datetime
+
+import pytest
+import requests
+from pydantic import ValidationError
+
+from ryanair_timecapsule.api.booking import AuthSession, get_flights_booking
+from ryanair_timecapsule.api.fare_finder import get_flights_fares
+from ryanair_timecapsule.api.models import (
+    BookingResponse,
+    FareFinderResponse,
+    parse_booking,
+    parse_fare_finder,
+)
+
+FARE_FINDER_RESPONSE = {
+    "arrivalAirportCategories": None,
+    "fares": [
+        {
+            "outbound": {
+                "departureAirport": {
+                    "countryName": "United Kingdom",
+                    "iataCode": "STN",
+                    "name": "London Stansted",
+                },
+                "arrivalAirport": {"iataCode": "VLC", "name": "Valencia"},
+                "departureDate": "2024-10-29T06:35:00",
+                "arrivalDate": "2024-10-29T10:05:00",
+                "price": {"value": 19.99, "currencyCode": "EUR"},
+                "flightNumber": "FR8312",
+                "priceUpdated": 0,
+            },
+            "summary": {"price": {"value": 19.99, "currencyCode": "EUR"}},
+        }
+    ],
+    "nextPage": None,
+    "size": 1,
+}
+
+BOOKING_RESPONSE = {
+    "currency": "GBP",
+    "trips": [
+        {
+            "origin": "STN",
+            "destination": "VLC",
+            "dates": [
+                {
+                    "dateOut": "2024-10-29T00:00:00.000",
+                    "flights": [
+                        {
+                            "faresLeft": 4,
+                            "flightNumber": "FR 8312",
+                            "time": [
+                                "2024-10-29T06:35:00.000",
+                                "2024-10-29T10:05:00.000",
+                            ],
+                            "regularFare": {
+                                "fareKey": "abc",
+                                "fares": [
+                                    {"type": "ADT", "amount": 45.99, "count": 1},
+                                ],
+                            },
+                        },
+                        {
+                            "flightNumber": "FR 8314",
+                            "time": ["2024-10-29T18:00:00.000"],
+                        },
+                    ],
+                }
+            ],
+        }
+    ],
+}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [FARE_FINDER_RESPONSE, json.dumps(FARE_FINDER_RESPONSE).encode()],
+)
+def test_parse_fare_finder(content):
+    response = parse_fare_finder(content)
+    assert response.size == 1
+    flight = response.fares[0].outbound
+    assert flight.departure_airport.iata_code == "STN"
+    assert flight.arrival_airport.name == "Valencia"
+    assert flight.departure_date == datetime(2024, 10, 29, 6, 35)
+    assert flight.price.value == 19.99
+    assert flight.price.currency_code == "EUR"
+    assert flight.flight_number == "FR8312"
+    # Slotted models have no per-instance dict.
+    assert not hasattr(flight, "__dict__")
+
+
+def test_parse_booking():
+    response = parse_booking(json.dumps(BOOKING_RESPONSE))
+    assert response.currency == "GBP"
+    flights = response.trips[0].dates[0].flights
+    assert flights[0].price() == 45.99
+    assert flights[0].price("TEEN") is None
+    assert flights[0].fares_left == 4
+    assert flights[0].time[1] == datetime(2024, 10, 29, 10, 5)
+    # Sold out
+    assert flights[1].price() is None
+
+
+def test_parse_invalid_response():
+    with pytest.raises(ValidationError):
+        parse_fare_finder(b'{"fares": [{"outbound": {"price": {}}}]}')
+    with pytest.raises(ValidationError):
+        parse_booking(b'{"trips": [{"origin": "STN"}]')
+
+
+def make_response(content: dict):
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = json.dumps(content).encode()
+    response.cookies.set("rid", "fake_rid")
+    response.cookies.set("rid.sig", "fake_rid_sig")
+    return response
+
+
+def test_get_flights_fares_typed(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.constants._loaded", {"markets": {"gb"}}
+    )
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.call_api",
+        lambda url, params, return_json: make_response(FARE_FINDER_RESPONSE),
+    )
+    response = get_flights_fares("STN", "2024-10-29", "2024-10-30", 1, 5, typed=True)
+    assert isinstance(response, FareFinderResponse)
+    assert response.fares[0].outbound.flight_number == "FR8312"
+
+
+def test_get_flights_booking_typed(monkeypatch):
+    monkeypatch.setattr("ryanair_timecapsule.api.booking.auth_session", AuthSession())
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.call_api",
+        lambda url, params, return_json, headers: make_response(BOOKING_RESPONSE),
+    )
+    response = get_flights_booking(
+        1, 0, 0, 0, "STN", "VLC", "2024-10-29", "2024-10-29", typed=True
+    )
+    assert isinstance(response, BookingResponse)
+    assert response.trips[0].dates[0].flights[0].price() == 45.99
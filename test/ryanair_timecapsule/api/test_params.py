@@ -0,0 +1,79 @@
+import pytest
+from pydantic import ValidationError
+
+from ryanair_timecapsule.api import booking, fare_finder
+from ryanair_timecapsule.api.params import ParamsTemplate
+
+
+@pytest.fixture(autouse=True)
+def markets(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.constants._loaded", {"markets": {"gb", "es"}}
+    )
+
+
+def test_params_template_matches_model():
+    template = ParamsTemplate(
+        fare_finder.Params, durationFrom=1, durationTo=5, market="es"
+    )
+    for iata in ["STN", "DUB"]:
+        expected = fare_finder.Params(
+            departureAirportIataCode=iata,
+            outboundDepartureDateFrom="2024-10-08",
+            outboundDepartureDateTo="2025-10-08",
+            durationFrom=1,
+            durationTo=5,
+            market="es",
+        ).model_dump()
+        params = template.build(
+            departureAirportIataCode=iata,
+            outboundDepartureDateFrom="2024-10-08",
+            outboundDepartureDateTo="2025-10-08",
+        )
+        assert params == expected
+    # The template is not modified by the builds.
+    assert "departureAirportIataCode" not in template.params
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"departureAirportIataCode": "STNX"},
+        {"outboundDepartureDateFrom": "08-10-2024"},
+        {"outboundDepartureTimeTo": "25:00"},
+        {"market": "xx"},
+    ],
+)
+def test_params_template_validates_fields(fields):
+    template = ParamsTemplate(
+        fare_finder.Params,
+        departureAirportIataCode="STN",
+        outboundDepartureDateFrom="2024-10-08",
+        outboundDepartureDateTo="2025-10-08",
+        durationFrom=1,
+        durationTo=5,
+    )
+    with pytest.raises(ValidationError):
+        template.build(**fields)
+    with pytest.raises(ValidationError):
+        ParamsTemplate(fare_finder.Params, **fields)
+
+
+def test_params_template_wrong_fields():
+    template = ParamsTemplate(fare_finder.Params, durationFrom=1, durationTo=5)
+    with pytest.raises(ValueError, match="outboundDepartureDateTo"):
+        template.build(
+            departureAirportIataCode="STN", outboundDepartureDateFrom="2024-10-08"
+        )
+    with pytest.raises(ValueError, match="not a parameter"):
+        template.build(departureAirport="STN")
+
+
+def test_booking_template_formats_booleans():
+    template = booking.get_params_template(1, 0, 0, 0, 2, 2)
+    params = template.build(
+        Origin="STN", Destination="VLC", DateOut="2024-10-29", DateIn="2024-10-31"
+    )
+    assert params["RoundTrip"] == "true"
+    assert params["IncludeConnectingFlights"] == "false"
+    assert booking.get_params_template(1, 0, 0, 0, 2, 2) is template
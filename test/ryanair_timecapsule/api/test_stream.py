@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from ryanair_timecapsule.api.stream import ArrayStream
+
+RESPONSE = {
+    "arrivalAirportCategories": None,
+    "fares": [
+        {"outbound": {"price": {"value": 19.99}, "arrivalAirport": {"name": "Málaga"}}},
+        {"outbound": {"price": {"value": 1e3}, "arrivalAirport": {"name": "Kraków"}}},
+        [1, "a,]}", None],
+    ],
+    "nextPage": None,
+    "size": 12345,
+}
+
+
+def split(data: bytes, size: int) -> list:
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_array_stream(size, indent):
+    data = json.dumps(RESPONSE, indent=indent, ensure_ascii=False).encode()
+    stream = ArrayStream(split(data, size), "fares")
+    assert list(stream) == RESPONSE["fares"]
+    assert stream.rest == {
+        "arrivalAirportCategories": None,
+        "nextPage": None,
+        "size": 12345,
+    }
+    assert stream.n_bytes == len(data)
+    with pytest.raises(RuntimeError):
+        list(stream)
+
+
+def test_array_stream_every_split():
+    # Numbers split in the middle, e.g. `29.` then `99`, are only decoded whole.
+    response = {"fares": [29.99, -1.5e-3, {"price": 12.5}, 7], "size": 12.5}
+    data = json.dumps(response).encode()
+    for position in range(len(data) + 1):
+        stream = ArrayStream([data[:position], data[position:]], "fares")
+        assert list(stream) == response["fares"], data[:position]
+        assert stream.rest == {"size": 12.5}
+
+
+@pytest.mark.parametrize(
+    "data, rest",
+    [
+        (b"{}", {}),
+        (b'{"fares": [], "size": 0}', {"size": 0}),
+        (b'{"fares": null}', {"fares": None}),
+    ],
+)
+def test_array_stream_empty(data, rest):
+    stream = ArrayStream(split(data, 3), "fares")
+    assert list(stream) == []
+    assert stream.rest == rest
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b'{"fares": [{"a": 1}', b'{"fares": [1 2]}', b"[1]", b'{"size": 1'],
+)
+def test_array_stream_invalid(data):
+    with pytest.raises(json.JSONDecodeError):
+        list(ArrayStream(split(data, 4), "fares"))
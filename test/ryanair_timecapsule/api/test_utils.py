@@ -1,9 +1,21 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 import requests
 import requests_mock
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 
-from ryanair_timecapsule.api.utils import call_api
+from ryanair_timecapsule.api import utils
+from ryanair_timecapsule.api.utils import (
+    AdaptiveRateLimiter,
+    RateLimiter,
+    async_call_api,
+    call_api,
+    stream_api,
+)
 
 
 def make_mock_session():
@@ -60,3 +72,201 @@ def test_call_api_headers(monkeypatch):
     # Ensure that an error is raised when no headers are provided
     with pytest.raises(requests_mock.exceptions.NoMockAddress):
         call_api(url="mock://test.com/headers", return_json=False)
+
+
+def test_rate_limiter_reserve():
+    rate_limiter = RateLimiter(requests_per_second=10, burst=2)
+
+    # The burst is sent straight away, then requests are spaced by 1/rate.
+    assert rate_limiter.reserve("a.com") == 0
+    assert rate_limiter.reserve("a.com") == 0
+    assert rate_limiter.reserve("a.com") == pytest.approx(0.1, abs=0.01)
+    assert rate_limiter.reserve("a.com") == pytest.approx(0.2, abs=0.01)
+
+    # Each host has its own bucket.
+    assert rate_limiter.reserve("b.com") == 0
+
+
+def test_rate_limiter_incorrect_params():
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_second=0)
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_second=1, burst=0)
+
+
+def test_call_api_rate_limit(monkeypatch):
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.session", make_mock_session())
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.rate_limiter", RateLimiter(requests_per_second=1)
+    )
+    call_api(url="mock://test.com/json")
+    assert utils.rate_limiter.reserve("test.com") == pytest.approx(1, abs=0.01)
+
+
+def make_mock_async_session(statuses: list):
+    httpx = pytest.importorskip("httpx")
+    statuses = iter(statuses)
+
+    def handler(request):
+        if request.url.path == "/slow":
+            raise AssertionError("The request should have been cancelled.")
+        return httpx.Response(next(statuses), json={"a": "b"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_async_call_api_json(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_session", make_mock_async_session([200])
+    )
+    output = asyncio.run(async_call_api(url="https://test.com/json"))
+    assert output == {"a": "b"}
+
+
+def test_async_call_api_retry(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_session",
+        make_mock_async_session([429, 503, 200]),
+    )
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.retry", utils.retry.new(backoff_factor=0)
+    )
+    output = asyncio.run(async_call_api(url="https://test.com/json"))
+    assert output == {"a": "b"}
+
+
+def test_async_call_api_error(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_session",
+        make_mock_async_session([500, 500, 500, 500, 200]),
+    )
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.retry", utils.retry.new(backoff_factor=0)
+    )
+    # The retries are exhausted before the successful response.
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(async_call_api(url="https://test.com/json"))
+
+
+def test_async_call_api_cancel(monkeypatch):
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.async_session", make_mock_async_session([])
+    )
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.rate_limiter", RateLimiter(requests_per_second=1)
+    )
+    utils.rate_limiter.reserve("test.com")
+
+    async def cancel():
+        task = asyncio.create_task(async_call_api(url="https://test.com/slow"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+
+
+def test_adaptive_rate_limiter_aimd():
+    rate_limiter = AdaptiveRateLimiter(requests_per_second=4, max_concurrency=8)
+    assert rate_limiter.rate("a.com") == 4
+    assert rate_limiter.concurrency("a.com") == 8
+
+    rate_limiter.record("a.com", 429)
+    assert rate_limiter.rate("a.com") == 2
+    assert rate_limiter.concurrency("a.com") == 4
+    rate_limiter.record("a.com", 503)
+    assert rate_limiter.rate("a.com") == 1
+    assert rate_limiter.concurrency("a.com") == 2
+
+    # Healthy responses grow the limits back, up to their maximum.
+    rate_limiter.record("a.com", 200)
+    assert rate_limiter.rate("a.com") == 2
+    for _ in range(1000):
+        rate_limiter.record("a.com", 200)
+    assert rate_limiter.rate("a.com") == 40
+    assert rate_limiter.concurrency("a.com") == 8
+
+    # Other hosts are not affected.
+    assert rate_limiter.stats()["a.com"]["rate"] == 40
+    assert rate_limiter.rate("b.com") == 4
+
+
+def test_adaptive_rate_limiter_retry_after():
+    rate_limiter = AdaptiveRateLimiter(requests_per_second=10)
+    rate_limiter.record("a.com", 429, retry_after="2")
+    # The pause is followed by the (halved) rate.
+    assert rate_limiter.reserve("a.com") == pytest.approx(2.2, abs=0.01)
+    assert rate_limiter.reserve("a.com") == pytest.approx(2.4, abs=0.01)
+
+
+def test_adaptive_rate_limiter_concurrency():
+    rate_limiter = AdaptiveRateLimiter(requests_per_second=1000, max_concurrency=1)
+    rate_limiter.acquire("a.com")
+    acquired = threading.Event()
+
+    def acquire():
+        rate_limiter.acquire("a.com")
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.05)
+    rate_limiter.release("a.com")
+    assert acquired.wait(1)
+    thread.join()
+    assert rate_limiter.stats()["a.com"]["in_flight"] == 1
+
+
+def test_call_api_throttled_retry(monkeypatch):
+    statuses = [429, 429, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = statuses.pop(0)
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"a": "b"}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(max_retries=utils.retry.new(backoff_factor=0)))
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.session", session)
+    monkeypatch.setattr(
+        "ryanair_timecapsule.api.utils.rate_limiter",
+        AdaptiveRateLimiter(requests_per_second=100),
+    )
+    try:
+        output = call_api(url=f"http://127.0.0.1:{server.server_port}/json")
+    finally:
+        server.shutdown()
+
+    # The throttling responses retried by urllib3 were reported.
+    assert output == {"a": "b"}
+    stats = utils.rate_limiter.stats()["127.0.0.1"]
+    assert stats["rate"] == pytest.approx(25 + 1 / 25)
+    assert stats["in_flight"] == 0
+
+
+def test_stream_api(monkeypatch):
+    monkeypatch.setattr("ryanair_timecapsule.api.utils.session", make_mock_session())
+    metrics = utils.set_metrics()
+    try:
+        with stream_api(url="mock://test.com/json") as response:
+            assert b"".join(response.iter_content(3)) == b'{"a": "b"}'
+        with pytest.raises(HTTPError):
+            with stream_api(url="mock://test.com/error"):
+                pass
+        endpoints = metrics.summary()["endpoints"]
+    finally:
+        utils.set_metrics(False)
+    assert endpoints["test.com/json"]["bytes"] == 10
+    assert endpoints["test.com/error"]["errors"] == {"HTTPError": 1}
@@ -0,0 +1,56 @@
+import pytest
+import requests
+
+from ryanair_timecapsule.collector.journal import SweepJournal
+
+PARAMS = {"iata_codes": ["DUB", "STN"], "date_from": "2024-10-08"}
+
+
+def test_journal_resume(tmp_path):
+    path = tmp_path / "sweep" / "snapshot.jsonl.gz.journal.jsonl"
+    with SweepJournal(str(path)) as journal:
+        assert journal.params is None
+        journal.start(PARAMS)
+        journal.record_done("STN")
+        journal.record_failure("DUB", requests.ConnectionError("offline"))
+
+    with SweepJournal(str(path)) as journal:
+        assert journal.params == PARAMS
+        assert journal.completed == {"STN"}
+        assert journal.failures == {"DUB": "ConnectionError('offline')"}
+        journal.start(PARAMS)
+        journal.record_done("DUB")
+
+    with SweepJournal(str(path)) as journal:
+        assert journal.completed == {"STN", "DUB"}
+        assert journal.failures == {}
+
+
+def test_journal_different_params(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with SweepJournal(path) as journal:
+        journal.start(PARAMS)
+    with SweepJournal(path) as journal:
+        with pytest.raises(ValueError):
+            journal.start({**PARAMS, "date_from": "2024-10-09"})
+
+
+@pytest.mark.parametrize(
+    # The entry is only complete with its newline, even if it is valid JSON.
+    "partial",
+    ['{"event": "done", "jo', '{"event": "done", "job": "VLC"}'],
+)
+def test_journal_truncated(tmp_path, partial):
+    path = str(tmp_path / "journal.jsonl")
+    with SweepJournal(path) as journal:
+        journal.start(PARAMS)
+        journal.record_done("STN")
+    # Simulate a crash while an entry was being written.
+    with open(path, "a") as f:
+        f.write(partial)
+
+    with SweepJournal(path) as journal:
+        assert journal.completed == {"STN"}
+        journal.record_done("DUB")
+    with SweepJournal(path) as journal:
+        assert journal.completed == {"STN", "DUB"}
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from ryanair_timecapsule.collector.markets import (
+    check_markets,
+    market_jobs,
+    market_root,
+    normalize_markets,
+)
+
+
+def test_normalize_markets():
+    assert normalize_markets(["es", " IT", "ES", "de", "it"]) == ["es", "it", "de"]
+
+
+def test_check_markets():
+    check_markets(["es", "it"], {"es", "it", "gb"})
+    with pytest.raises(ValueError, match="xx"):
+        check_markets(["es", "xx"], {"es", "it", "gb"})
+
+
+def test_market_jobs():
+    jobs = market_jobs(["VLC", "STN", "VLC"], ["es", "IT", "es"])
+    assert jobs == [("STN", "es"), ("STN", "it"), ("VLC", "es"), ("VLC", "it")]
+
+
+def test_market_root():
+    assert market_root("results", "es") == os.path.join("results", "market=es")
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import pytest
+
+from ryanair_timecapsule.api.booking import MAX_FLEX_DAYS
+from ryanair_timecapsule.collector.planner import (
+    Query,
+    coverage,
+    merge_booking_responses,
+    plan_queries,
+)
+
+
+@pytest.mark.parametrize("flex_days", [0, 2, MAX_FLEX_DAYS])
+@pytest.mark.parametrize("n_days", [1, 5, 6, 13, 14, 365])
+def test_plan_queries_minimal_cover(n_days, flex_days):
+    date_from = date(2024, 10, 8)
+    date_to = (date_from + timedelta(n_days - 1)).isoformat()
+    queries = plan_queries(date_from.isoformat(), date_to, flex_days)
+
+    assert len(queries) == -(-n_days // (2 * flex_days + 1))
+    report = coverage(queries, date_from.isoformat(), date_to)
+    assert report["n_covered"] == n_days
+    assert report["n_overlapping"] == 0
+    assert report["missing"] == []
+    # No day outside of the range is requested.
+    assert sum(len(query.days()) for query in queries) == n_days
+
+
+def test_plan_queries_trims_last_query():
+    assert plan_queries("2024-10-08", "2024-10-22", flex_days=6) == [
+        Query("2024-10-14", 6, 6),
+        Query("2024-10-22", 1, 0),
+    ]
+
+
+def test_plan_queries_wrong_params():
+    with pytest.raises(ValueError):
+        plan_queries("2024-10-08", "2024-10-01")
+    with pytest.raises(ValueError):
+        plan_queries("2024-10-08", "2024-10-20", flex_days=MAX_FLEX_DAYS + 1)
+
+
+def test_coverage_missing_and_overlapping():
+    queries = [Query("2024-10-10", 2, 2), Query("2024-10-12", 1, 1)]
+    report = coverage(queries, "2024-10-08", "2024-10-15")
+    assert report == {
+        "n_days": 8,
+        "n_calls": 2,
+        "n_covered": 6,
+        "n_overlapping": 2,
+        "missing": ["2024-10-14", "2024-10-15"],
+    }
+
+
+def booking_response(days, price):
+    return {
+        "currency": "EUR",
+        "trips": [
+            {
+                "origin": origin,
+                "destination": destination,
+                "dates": [
+                    {"dateOut": f"{day}T00:00:00.000", "flights": [price]}
+                    for day in days
+                ],
+            }
+            for origin, destination in [("STN", "VLC"), ("VLC", "STN")]
+        ],
+    }
+
+
+def test_merge_booking_responses():
+    merged = merge_booking_responses(
+        [
+            booking_response(["2024-10-12", "2024-10-13"], 1),
+            booking_response(["2024-10-10", "2024-10-11", "2024-10-12"], 2),
+        ]
+    )
+    assert merged["currency"] == "EUR"
+    assert [(trip["origin"], trip["destination"]) for trip in merged["trips"]] == [
+        ("STN", "VLC"),
+        ("VLC", "STN"),
+    ]
+    for trip in merged["trips"]:
+        assert [(day["dateOut"][:10], day["flights"]) for day in trip["dates"]] == [
+            ("2024-10-10", [2]),
+            ("2024-10-11", [2]),
+            ("2024-10-12", [1]),
+            ("2024-10-13", [1]),
+        ]
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ryanair_timecapsule.analysis.history import FareHistory
+from ryanair_timecapsule.collector.planner import plan_queries
+from ryanair_timecapsule.collector.priority import (
+    Target,
+    by_airport,
+    by_booking_route,
+    change_counts,
+    merge_targets,
+    plan_budget,
+    rank_targets,
+)
+
+NOW = datetime(2024, 10, 10, 12)
+# Two 7-day windows, from 2024-10-10 and 2024-10-17.
+WINDOWS = plan_queries("2024-10-10", "2024-10-23", flex_days=3)
+
+# Daily captures: STN-VLC changes price every day in the first window, DUB-BCN
+# never, and STN-BCN has a single capture in the second window.
+ROWS = [
+    ("STN", "VLC", "2024-10-12T06:35", "2024-10-07T06:00", 40.0),
+    ("STN", "VLC", "2024-10-12T06:35", "2024-10-08T06:00", 45.0),
+    ("STN", "VLC", "2024-10-12T06:35", "2024-10-09T06:00", 50.0),
+    ("DUB", "BCN", "2024-10-13T10:00", "2024-10-07T06:00", 20.0),
+    ("DUB", "BCN", "2024-10-13T10:00", "2024-10-08T06:00", 20.0),
+    ("DUB", "BCN", "2024-10-13T10:00", "2024-10-09T06:00", 20.0),
+    ("STN", "BCN", "2024-10-20T10:00", "2024-10-09T06:00", 30.0),
+]
+
+
+@pytest.fixture
+def history():
+    return FareHistory.from_records(
+        {
+            "origin": origin,
+            "destination": destination,
+            "departure": datetime.fromisoformat(departure),
+            "captured_at": datetime.fromisoformat(captured_at),
+            "price": price,
+        }
+        for origin, destination, departure, captured_at, price in ROWS
+    )
+
+
+def test_change_counts(history):
+    pairs, changes = change_counts(history, WINDOWS, NOW, lookback_days=14)
+    # Routes sorted: DUB-BCN, STN-BCN, STN-VLC.
+    assert pairs.tolist() == [[2, 0], [0, 0], [2, 0]]
+    assert changes.tolist() == [[0, 0], [0, 0], [2, 0]]
+
+    pairs, _ = change_counts(history, WINDOWS, NOW, lookback_days=2)
+    assert pairs.tolist() == [[1, 0], [0, 0], [1, 0]]
+
+
+def test_rank_targets(history):
+    targets = rank_targets(history, WINDOWS, now=NOW, decay_days=7)
+    ranked = [(t.origin, t.destination, t.query.day) for t in targets]
+    assert ranked[0] == ("STN", "VLC", "2024-10-13")
+    assert targets[0].score == pytest.approx((2 + 0.5) / (2 + 1))
+    # Without history, the frequency is 1/2, halved 7 days ahead.
+    assert ("STN", "BCN", "2024-10-13") in ranked[:3]
+    scores = {(t.origin, t.destination, t.query.day): t.score for t in targets}
+    assert scores["STN", "BCN", "2024-10-20"] == pytest.approx(0.25)
+    assert scores["DUB", "BCN", "2024-10-13"] == pytest.approx(0.5 / 3)
+
+    targets = rank_targets(history, WINDOWS, now=NOW, routes=[("VLC", "STN")])
+    assert [t.score for t in targets] == pytest.approx([0.5, 0.5 / (1 + 7 / 30)])
+
+
+def test_merge_targets():
+    first, second = WINDOWS
+    targets = [
+        Target("STN", "VLC", first, 0.5),
+        Target("VLC", "STN", first, 0.25),
+        Target("STN", "BCN", first, 0.5),
+        Target("STN", "VLC", second, 0.1),
+    ]
+    assert merge_targets(targets, by_airport) == [
+        Target("STN", None, first, 1.0),
+        Target("VLC", None, first, 0.25),
+        Target("STN", None, second, 0.1),
+    ]
+    assert merge_targets(targets, by_booking_route)[0] == Target(
+        "STN", "VLC", first, 0.75
+    )
+    assert plan_budget(targets, 2) == targets[:2]
+    with pytest.raises(ValueError):
+        plan_budget(targets, -1)
@@ -0,0 +1,162 @@
+import threading
+
+import pytest
+
+from ryanair_timecapsule.collector.queue import (
+    DONE,
+    FAILED,
+    LEASED,
+    PENDING,
+    WorkQueue,
+    sweep_jobs,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+JOBS = [(f"job{i}", {"i": i}) for i in range(3)]
+
+
+def test_sweep_jobs():
+    jobs = sweep_jobs({"VLC", "STN"}, ["es", "it"], "2024-10-01", "2024-10-20", 15)
+    assert len(jobs) == 8
+    assert jobs[0] == (
+        "es/STN_2024-10-01_2024-10-15",
+        {
+            "iata": "STN",
+            "market": "es",
+            "date_from": "2024-10-01",
+            "date_to": "2024-10-15",
+        },
+    )
+    assert jobs[-1][0] == "it/VLC_2024-10-16_2024-10-20"
+
+
+def test_start(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    with WorkQueue(path) as queue:
+        assert queue.params is None
+        assert queue.start({"date": "2024-10-08"}, JOBS) == 3
+    with WorkQueue(path) as queue:
+        assert queue.params == {"date": "2024-10-08"}
+        assert queue.start({"date": "2024-10-08"}, JOBS + [("job3", {})]) == 1
+        with pytest.raises(ValueError):
+            queue.start({"date": "2024-10-09"}, JOBS)
+        assert queue.counts() == {PENDING: 4, LEASED: 0, DONE: 0, FAILED: 0}
+
+        # A finished sweep is replaced by the next one.
+        while (lease := queue.lease("a")) is not None:
+            queue.complete("a", lease.name)
+        assert queue.start({"date": "2024-10-09"}, JOBS) == 3
+        assert queue.params == {"date": "2024-10-09"}
+        assert queue.counts() == {PENDING: 3, LEASED: 0, DONE: 0, FAILED: 0}
+
+
+def test_lease(tmp_path):
+    clock = FakeClock()
+    with WorkQueue(str(tmp_path / "q.sqlite"), lease_seconds=10, clock=clock) as queue:
+        queue.start({}, JOBS)
+        first = queue.lease("a")
+        assert (first.name, first.payload, first.attempts) == ("job0", {"i": 0}, 1)
+        assert queue.lease("b").name == "job1"
+        assert queue.complete("b", "job1")
+        assert not queue.complete("a", "job1")
+        assert queue.lease("b").name == "job2"
+        assert queue.lease("b") is None
+
+        # The lease of a worker that died expires.
+        clock.now = 10
+        second = queue.lease("b")
+        assert (second.name, second.attempts) == ("job0", 2)
+        assert queue.counts() == {PENDING: 0, LEASED: 2, DONE: 1, FAILED: 0}
+        assert not queue.is_finished()
+
+
+def test_renew(tmp_path):
+    clock = FakeClock()
+    with WorkQueue(str(tmp_path / "q.sqlite"), lease_seconds=10, clock=clock) as queue:
+        queue.start({}, JOBS[:2])
+        queue.lease("a")
+        clock.now = 8
+        assert queue.renew("a") == 1
+        clock.now = 12
+        assert queue.lease("b").name == "job1"
+        assert queue.lease("b") is None
+
+        # An expired lease taken over by another worker is not renewed.
+        clock.now = 30
+        assert queue.lease("b").name == "job0"
+        assert queue.renew("a") == 0
+        assert queue.complete("b", "job0")
+
+
+def test_fail(tmp_path):
+    with WorkQueue(str(tmp_path / "q.sqlite"), max_attempts=2) as queue:
+        queue.start({}, JOBS[:1])
+        queue.lease("a")
+        assert queue.fail("a", "job0", ValueError("first"))
+        assert queue.lease("a").attempts == 2
+        assert not queue.fail("a", "job0", ValueError("second"))
+        assert queue.lease("a") is None
+        assert queue.is_finished()
+        assert queue.failures() == {"job0": "ValueError('second')"}
+
+
+def test_fail_expired_lease(tmp_path):
+    clock = FakeClock()
+    with WorkQueue(str(tmp_path / "q.sqlite"), lease_seconds=10, clock=clock) as queue:
+        queue.start({}, JOBS[:1])
+        queue.lease("a")
+        clock.now = 10
+        assert queue.lease("b").name == "job0"
+
+        # The worker whose lease expired does not take the job back from b.
+        assert not queue.fail("a", "job0", ValueError("late"))
+        assert queue.status("job0") == LEASED
+        assert queue.lease("c") is None
+        assert queue.complete("b", "job0")
+
+
+def test_lease_expired_max_attempts(tmp_path):
+    clock = FakeClock()
+    with WorkQueue(
+        str(tmp_path / "q.sqlite"), lease_seconds=10, max_attempts=2, clock=clock
+    ) as queue:
+        queue.start({}, JOBS[:1])
+        # The workers of the job keep dying without failing it.
+        assert queue.lease("a").attempts == 1
+        clock.now = 10
+        assert queue.lease("b").attempts == 2
+        clock.now = 20
+        assert queue.lease("c") is None
+        assert queue.is_finished()
+        assert queue.failures() == {"job0": "lease expired"}
+
+
+def test_concurrent_leases(tmp_path):
+    path = str(tmp_path / "q.sqlite")
+    with WorkQueue(path) as queue:
+        queue.start({}, [(f"job{i}", {}) for i in range(200)])
+
+    leased = []
+
+    def work(worker):
+        with WorkQueue(path) as queue:
+            while (lease := queue.lease(worker)) is not None:
+                leased.append(lease.name)
+                queue.complete(worker, lease.name)
+
+    threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased) == sorted(f"job{i}" for i in range(200))
+    with WorkQueue(path) as queue:
+        assert queue.counts()[DONE] == 200
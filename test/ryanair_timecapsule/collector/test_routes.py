@@ -0,0 +1,51 @@
+from ryanair_timecapsule.collector.planner import plan_queries
+from ryanair_timecapsule.collector.routes import (
+    read_route_list,
+    route_jobs,
+    routes_from_snapshots,
+)
+from ryanair_timecapsule.storage.snapshot import SnapshotWriter
+
+
+def fare(origin, destination):
+    return {
+        "outbound": {
+            "departureAirport": {"iataCode": origin},
+            "arrivalAirport": {"iataCode": destination},
+        }
+    }
+
+
+def test_routes_from_snapshots(tmp_path):
+    with SnapshotWriter(str(tmp_path / "2024" / "snapshot.jsonl.gz")) as writer:
+        writer.write(
+            "STN_2024-10-08_2025-10-08",
+            {"metadata": {}, "response": {"fares": [fare("STN", "VLC")]}},
+        )
+        writer.write(
+            "VLC_2024-10-08_2025-10-08",
+            {"metadata": {}, "response": {"fares": [fare("VLC", "STN")]}},
+        )
+    with SnapshotWriter(str(tmp_path / "snapshot.tar.gz")) as writer:
+        writer.write("DUB", {"fares": [fare("DUB", "BCN")]})
+
+    assert routes_from_snapshots(str(tmp_path)) == {("STN", "VLC"), ("BCN", "DUB")}
+
+
+def test_read_route_list(tmp_path):
+    path = tmp_path / "routes.txt"
+    path.write_text("# Routes\nSTN-VLC\n\nDUB,BCN\nVLC-STN\n")
+    assert read_route_list(str(path)) == {("STN", "VLC"), ("BCN", "DUB")}
+
+
+def test_route_jobs():
+    queries = plan_queries("2024-10-08", "2024-10-17", flex_days=2)
+    jobs = route_jobs({("STN", "VLC"), ("BCN", "DUB")}, queries)
+    assert [
+        (origin, destination, query.day) for origin, destination, query in jobs
+    ] == [
+        ("BCN", "DUB", "2024-10-10"),
+        ("BCN", "DUB", "2024-10-15"),
+        ("STN", "VLC", "2024-10-10"),
+        ("STN", "VLC", "2024-10-15"),
+    ]
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from ryanair_timecapsule.collector.scheduler import Scheduler, SweepLock, next_slot
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_next_slot():
+    assert next_slot(0, 10, 3) == 10
+    assert next_slot(0, 10, 10) == 20
+    assert next_slot(0, 10, 35) == 40
+
+
+def test_scheduler_cadences():
+    clock = FakeClock()
+    runs = []
+    scheduler = Scheduler(clock=clock)
+    scheduler.add("hourly", 3600, lambda: runs.append("hourly"))
+    scheduler.add("daily", 86400, lambda: runs.append("daily"), start=7200)
+
+    for now in range(0, 4 * 3600, 600):
+        clock.now = now
+        scheduler.run_pending()
+    assert runs == ["hourly", "hourly", "hourly", "daily", "hourly"]
+
+
+def test_scheduler_skips_missed_runs():
+    clock = FakeClock()
+
+    def slow_sweep():
+        clock.now += 250
+
+    scheduler = Scheduler(clock=clock)
+    job = scheduler.add("sweep", 100, slow_sweep)
+    assert scheduler.run_pending() == ["sweep"]
+    # The runs due at 100 and 200 are not run back to back.
+    assert (job.runs, job.skipped, job.next_run) == (1, 2, 300)
+    assert scheduler.run_pending() == []
+
+
+def test_scheduler_failure():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    job = scheduler.add("sweep", 100, lambda: 1 / 0)
+    scheduler.run_pending()
+    assert (job.runs, job.failures, job.next_run) == (0, 1, 100)
+    assert "ZeroDivisionError" in job.last_error
+
+    with pytest.raises(ValueError):
+        scheduler.add("sweep", 0, print)
+
+
+def test_scheduler_lock(tmp_path):
+    path = str(tmp_path / "collector.lock")
+    other = SweepLock(path)
+    assert other.acquire()
+
+    runs = []
+    scheduler = Scheduler(lock=SweepLock(path), clock=FakeClock())
+    sweep = scheduler.add("sweep", 100, lambda: runs.append("sweep"))
+    refresh = scheduler.add(
+        "refresh", 100, lambda: runs.append("refresh"), exclusive=False
+    )
+    scheduler.run_pending()
+    # The sweep of the other collector is not overlapped.
+    assert runs == ["refresh"]
+    assert (sweep.runs, sweep.skipped, refresh.runs) == (0, 1, 1)
+
+    other.release()
+    scheduler.clock.now = 100
+    scheduler.run_pending()
+    assert runs == ["refresh", "sweep", "refresh"]
+
+
+def test_scheduler_run_forever():
+    stop = threading.Event()
+    scheduler = Scheduler()
+    scheduler.add("stop", 3600, stop.set)
+    thread = threading.Thread(target=scheduler.run_forever, args=(stop,))
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
@@ -0,0 +1,136 @@
+from datetime import date, datetime
+
+import pytest
+
+from ryanair_timecapsule.storage.dataset import (
+    SOURCE_BOOKING,
+    SOURCE_FARE_FINDER,
+    flatten_result,
+    read_dataset,
+    write_dataset,
+)
+
+CAPTURED_AT = datetime(2024, 10, 8, 6, 0, 0)
+
+FARE_FINDER_RESULT = {
+    "metadata": {"date": CAPTURED_AT.isoformat(), "market": "es"},
+    "response": {
+        "fares": [
+            {
+                "outbound": {
+                    "departureAirport": {"iataCode": "STN", "name": "London"},
+                    "arrivalAirport": {"iataCode": "VLC", "name": "Valencia"},
+                    "departureDate": "2024-10-29T06:35:00",
+                    "arrivalDate": "2024-10-29T10:05:00",
+                    "price": {"value": 19.99, "currencyCode": "EUR"},
+                    "flightNumber": "FR8312",
+                },
+                "summary": {},
+            }
+        ],
+        "size": 1,
+    },
+}
+
+BOOKING_RESPONSE = {
+    "currency": "GBP",
+    "trips": [
+        {
+            "origin": "STN",
+            "destination": "VLC",
+            "dates": [
+                {
+                    "dateOut": "2024-10-29T00:00:00.000",
+                    "flights": [
+                        {
+                            "flightNumber": "FR 8312",
+                            "time": [
+                                "2024-10-29T06:35:00.000",
+                                "2024-10-29T10:05:00.000",
+                            ],
+                            "regularFare": {
+                                "fares": [
+                                    {"type": "TEEN", "amount": 30.0, "count": 1},
+                                    {"type": "ADT", "amount": 45.99, "count": 1},
+                                ]
+                            },
+                        },
+                        # Sold out flight
+                        {
+                            "flightNumber": "FR 8314",
+                            "time": ["2024-10-29T18:00:00.000"],
+                        },
+                    ],
+                }
+            ],
+        }
+    ],
+}
+
+
+def test_flatten_fare_finder():
+    assert flatten_result(FARE_FINDER_RESULT) == [
+        {
+            "origin": "STN",
+            "destination": "VLC",
+            "departure": datetime(2024, 10, 29, 6, 35),
+            "flight_number": "FR8312",
+            "price": 19.99,
+            "currency": "EUR",
+            "captured_at": CAPTURED_AT,
+            "source": SOURCE_FARE_FINDER,
+            "market": "es",
+        }
+    ]
+
+
+def test_flatten_booking():
+    assert flatten_result(BOOKING_RESPONSE, captured_at=CAPTURED_AT) == [
+        {
+            "origin": "STN",
+            "destination": "VLC",
+            "departure": datetime(2024, 10, 29, 6, 35),
+            "flight_number": "FR 8312",
+            "price": 45.99,
+            "currency": "GBP",
+            "captured_at": CAPTURED_AT,
+            "source": SOURCE_BOOKING,
+            "market": None,
+        }
+    ]
+
+
+def test_flatten_incorrect_result():
+    with pytest.raises(ValueError):
+        flatten_result(BOOKING_RESPONSE)
+    with pytest.raises(ValueError):
+        flatten_result({"a": "b"}, captured_at=CAPTURED_AT)
+
+
+def test_write_dataset(tmp_path):
+    ds = pytest.importorskip("pyarrow.dataset")
+    rows = flatten_result(FARE_FINDER_RESULT) + flatten_result(
+        BOOKING_RESPONSE, captured_at=CAPTURED_AT
+    )
+    write_dataset(rows, str(tmp_path), basename="snapshot")
+    # Writing the same snapshot again does not duplicate the rows.
+    write_dataset(rows, str(tmp_path), basename="snapshot")
+
+    fare_finder_it = {
+        **FARE_FINDER_RESULT,
+        "metadata": {**FARE_FINDER_RESULT["metadata"], "market": "it"},
+    }
+    write_dataset(flatten_result(fare_finder_it), str(tmp_path), basename="it")
+
+    assert (tmp_path / "source=fare_finder" / "market=it").is_dir()
+
+    dataset = read_dataset(str(tmp_path))
+    table = dataset.to_table(columns=["origin", "price", "market", "capture_date"])
+    assert table.num_rows == 3
+    assert sorted(table.column("price").to_pylist()) == [19.99, 19.99, 45.99]
+    assert sorted(table.column("market").to_pylist(), key=str) == [None, "es", "it"]
+    assert set(table.column("capture_date").to_pylist()) == {date(2024, 10, 8)}
+
+    # The partitions are pruned when filtering.
+    table = dataset.to_table(filter=ds.field("source") == SOURCE_BOOKING)
+    assert table.column("flight_number").to_pylist() == ["FR 8312"]
@@ -0,0 +1,182 @@
+import os
+
+import pytest
+
+from ryanair_timecapsule.storage.delta import (
+    DELTA,
+    KEYFRAME,
+    DeltaStore,
+    DeltaWriter,
+    diff_result,
+    fare_hash,
+    fare_key,
+    read_snapshot,
+)
+from ryanair_timecapsule.storage.snapshot import find_snapshots, iter_snapshot
+
+
+def make_fare(origin: str, destination: str, day: str, price: float) -> dict:
+    return {
+        "outbound": {
+            "departureAirport": {"iataCode": origin},
+            "arrivalAirport": {"iataCode": destination},
+            "departureDate": f"{day}T06:35:00",
+            "price": {"value": price, "currencyCode": "EUR"},
+        }
+    }
+
+
+def make_result(date: str, fares: list) -> dict:
+    return {
+        "metadata": {"date": date, "market": "es"},
+        "response": {"fares": fares, "size": len(fares)},
+    }
+
+
+CAPTURES = [
+    {
+        "STN": [
+            make_fare("STN", "MAD", "2024-10-10", 20.0),
+            make_fare("STN", "MAD", "2024-10-11", 25.0),
+        ],
+        "VLC": [make_fare("VLC", "BCN", "2024-10-10", 30.0)],
+    },
+    {
+        # A price changed, a fare is gone and another one is new.
+        "STN": [
+            make_fare("STN", "MAD", "2024-10-11", 29.0),
+            make_fare("STN", "MAD", "2024-10-12", 19.0),
+        ],
+    },
+    {
+        "STN": [
+            make_fare("STN", "MAD", "2024-10-11", 29.0),
+            make_fare("STN", "MAD", "2024-10-12", 19.0),
+        ],
+        "VLC": [make_fare("VLC", "BCN", "2024-10-10", 35.0)],
+    },
+    {"VLC": [make_fare("VLC", "BCN", "2024-10-10", 35.0)]},
+]
+
+
+def write_captures(root: str, captures: list, keyframe_interval: int = 3) -> list:
+    kinds = []
+    for i, capture in enumerate(captures):
+        date = f"2024-10-0{i + 1}T06:00:00"
+        path = os.path.join(root, "2024", "10", f"0{i + 1}", "06:00:00.jsonl.gz")
+        with DeltaWriter(root, path, date, keyframe_interval) as writer:
+            for airport, fares in capture.items():
+                writer.write(f"{airport}_{date[:10]}", make_result(date, fares))
+        kinds.append(writer.kind)
+    return kinds
+
+
+def sorted_fares(result: dict) -> list:
+    return sorted(result["response"]["fares"], key=fare_key)
+
+
+def test_diff_result():
+    base = {fare_key(fare): fare_hash(fare) for fare in CAPTURES[0]["STN"]}
+    record = diff_result(base, make_result("2024-10-02", CAPTURES[1]["STN"]))
+    assert record["response"] == {"size": 2}
+    assert record["changed"] == CAPTURES[1]["STN"]
+    assert record["removed"] == [["STN", "MAD", "2024-10-10T06:35:00", None]]
+
+    # An unchanged result stores no fares.
+    record = diff_result(base, make_result("2024-10-02", CAPTURES[0]["STN"]))
+    assert (record["changed"], record["removed"]) == ([], [])
+
+
+def test_delta_store_round_trip(tmp_path):
+    root = str(tmp_path)
+    kinds = write_captures(root, CAPTURES)
+    assert kinds == [KEYFRAME, DELTA, DELTA, KEYFRAME]
+
+    store = DeltaStore(root)
+    captures = store.captures()
+    assert [capture["kind"] for capture in captures] == kinds
+    for capture, airports in zip(captures, CAPTURES):
+        rebuilt = dict(store.iter_capture(capture["captured_at"]))
+        date = capture["captured_at"]
+        assert sorted(rebuilt) == sorted(f"{a}_{date[:10]}" for a in airports)
+        for airport, fares in airports.items():
+            result = rebuilt[f"{airport}_{date[:10]}"]
+            assert result["metadata"] == {"date": date, "market": "es"}
+            assert result["response"]["size"] == len(fares)
+            assert sorted_fares(result) == sorted(fares, key=fare_key)
+
+
+def test_delta_store_only_changes(tmp_path):
+    root = str(tmp_path)
+    write_captures(root, CAPTURES[:3])
+    captures = DeltaStore(root).captures()
+
+    # VLC is compared with its capture before the previous one.
+    records = dict(iter_snapshot(captures[2]["path"]))
+    assert records["STN_2024-10-03"]["changed"] == []
+    assert records["VLC_2024-10-03"]["changed"] == CAPTURES[2]["VLC"]
+    assert captures[2]["path"].endswith(".delta.jsonl.gz")
+
+    assert find_snapshots(root) == [capture["path"] for capture in captures]
+
+
+def test_read_snapshot(tmp_path):
+    root = str(tmp_path)
+    write_captures(root, CAPTURES[:3], keyframe_interval=2)
+    store = DeltaStore(root)
+
+    # The keyframes and the deltas are all found and read as full snapshots.
+    paths = find_snapshots(root)
+    assert len(paths) == 3
+    for path, capture in zip(paths, store.captures()):
+        assert dict(read_snapshot(path)) == dict(
+            store.iter_capture(capture["captured_at"])
+        )
+    assert list(dict(read_snapshot(paths[1], airports={"STN"}))) == ["STN_2024-10-02"]
+
+    # An interrupted delta is skipped.
+    path = os.path.join(root, "2024", "10", "04", "06:00:00.jsonl.gz")
+    writer = DeltaWriter(root, path, "2024-10-04T06:00:00", keyframe_interval=3)
+    writer.write("STN_2024-10-04", make_result("2024-10-04", []))
+    writer.close(complete=False)
+    with pytest.warns(UserWarning):
+        assert list(read_snapshot(writer.path)) == []
+
+
+def test_delta_store_other_fields(tmp_path):
+    # Changes at the same price are stored too.
+    root = str(tmp_path)
+    fare = make_fare("STN", "MAD", "2024-10-10", 20.0)
+    fare["outbound"]["flightNumber"] = "FR1"
+    sold_out = {**fare, "outbound": {**fare["outbound"], "soldOut": True}}
+    captures = [{"STN": [fare]}, {"STN": [sold_out]}]
+    assert write_captures(root, captures) == [KEYFRAME, DELTA]
+
+    store = DeltaStore(root)
+    rebuilt = dict(store.iter_capture("2024-10-02T06:00:00"))
+    assert rebuilt["STN_2024-10-02"]["response"]["fares"] == [sold_out]
+
+
+def test_delta_store_airports(tmp_path):
+    root = str(tmp_path)
+    write_captures(root, CAPTURES[:3])
+    store = DeltaStore(root)
+    rebuilt = dict(store.iter_capture("2024-10-03T06:00:00", airports={"VLC"}))
+    assert list(rebuilt) == ["VLC_2024-10-03"]
+
+    with pytest.raises(ValueError):
+        list(store.iter_capture("2024-10-09T06:00:00"))
+
+
+def test_delta_writer_interrupted(tmp_path):
+    root = str(tmp_path)
+    write_captures(root, CAPTURES[:1])
+    path = os.path.join(root, "2024", "10", "02", "06:00:00.jsonl.gz")
+    with pytest.raises(KeyboardInterrupt):
+        with DeltaWriter(root, path, "2024-10-02T06:00:00") as writer:
+            writer.write("STN_2024-10-02", make_result("2024-10-02", []))
+            raise KeyboardInterrupt
+
+    # The interrupted capture is not the base of the next delta.
+    assert len(DeltaStore(root).captures()) == 1
+    assert DeltaStore(root).state().hashes("STN") is not None
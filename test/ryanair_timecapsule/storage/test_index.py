@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from ryanair_timecapsule.storage.index import SnapshotIndex
+from ryanair_timecapsule.storage.snapshot import SnapshotWriter
+
+
+def write_snapshot(path, date, airports):
+    with SnapshotWriter(path, append=os.path.exists(path)) as writer:
+        for airport in airports:
+            writer.write(
+                f"{airport}_{date[:10]}_2025-10-08",
+                {"metadata": {"date": date}, "response": {"fares": []}},
+            )
+
+
+@pytest.fixture
+def results(tmp_path):
+    root = os.path.join(tmp_path, "results")
+    write_snapshot(
+        os.path.join(root, "2024/10/08/06:00.jsonl.gz"),
+        "2024-10-08T06:00:00",
+        ["STN", "VLC"],
+    )
+    write_snapshot(
+        os.path.join(root, "2024/10/09/06:00.tar.gz"), "2024-10-09T06:00:00", ["STN"]
+    )
+    write_snapshot(
+        os.path.join(root, "2024/10/10/06:00.jsonl.gz"),
+        "2024-10-10T06:00:00",
+        ["STN", "DUB"],
+    )
+    return root
+
+
+def test_index_find(results, tmp_path):
+    with SnapshotIndex(os.path.join(tmp_path, "index.sqlite")) as index:
+        assert len(index.update(results)) == 3
+        # Nothing changed, nothing is read again.
+        assert index.update(results) == []
+
+        paths = [path for path, _ in index.find("STN")]
+        assert [path.split(os.sep)[-2] for path in paths] == ["08", "09", "10"]
+        assert [
+            captured_at
+            for _, captured_at in index.find("STN", "2024-10-09", "2024-10-10")
+        ] == ["2024-10-09T06:00:00", "2024-10-10T06:00:00"]
+        assert len(index.find("DUB", date_to="2024-10-09")) == 0
+        assert len(index.find("VLC")) == 1
+
+
+def test_index_pending(results, tmp_path):
+    db_path = os.path.join(tmp_path, "index.sqlite")
+    with SnapshotIndex(db_path) as index:
+        index.update(results)
+        pending = index.pending("export")
+        assert len(pending) == 3
+        for path in pending[:2]:
+            index.mark_processed("export", path)
+        assert index.pending("export") == pending[2:]
+        # Each consumer keeps track of its own progress.
+        assert index.pending("other") == pending
+
+    # The progress is persisted and changed snapshots are processed again.
+    write_snapshot(pending[0], "2024-10-08T06:00:00", ["BCN"])
+    with SnapshotIndex(db_path) as index:
+        assert index.update(results) == [pending[0]]
+        assert index.pending("export") == [pending[0], pending[2]]
+        assert len(index.find("BCN")) == 1
+
+
+def test_index_deleted(results, tmp_path):
+    with SnapshotIndex(os.path.join(tmp_path, "index.sqlite")) as index:
+        index.update(results)
+        path, _ = index.find("VLC")[0]
+        index.mark_processed("export", path)
+        os.remove(path)
+
+        # Updating a single snapshot keeps the others.
+        other, _ = index.find("DUB")[0]
+        assert index.update(other) == []
+        assert len(index.find("VLC")) == 1
+
+        assert index.update(results) == []
+        assert index.find("VLC") == []
+        assert [path for path, _ in index.find("STN")] == index.pending("export")
+        assert len(index.pending("export")) == 2
@@ -0,0 +1,58 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from ryanair_timecapsule.storage.reader import (
+    list_snapshots,
+    map_snapshots,
+    snapshot_time,
+)
+from ryanair_timecapsule.storage.snapshot import SnapshotWriter, iter_snapshot
+
+CAPTURES = ["2024/10/08/06:00:00.jsonl.gz", "2024/10/09/06:00:00.123456.tar.gz"]
+
+
+@pytest.fixture
+def results(tmp_path):
+    for index, capture in enumerate(CAPTURES):
+        with SnapshotWriter(os.path.join(tmp_path, capture)) as writer:
+            writer.write("STN_2024-10-08_2025-10-08", {"response": {"size": index}})
+            writer.write("VLC_2024-10-08_2025-10-08", {"response": {"size": 10}})
+    return str(tmp_path)
+
+
+def count_fares(path: str) -> int:
+    return sum(
+        result["response"]["size"]
+        for _, result in iter_snapshot(path, airports={"STN"})
+    )
+
+
+def test_snapshot_time():
+    assert snapshot_time("results/2024/10/08/06:00:00.jsonl.gz") == datetime(
+        2024, 10, 8, 6
+    )
+    assert snapshot_time(
+        "results/market=es/2024/10/08/06:00:00.123456.host-1.jsonl.gz"
+    ) == datetime(2024, 10, 8, 6, 0, 0, 123456)
+    assert snapshot_time("results/booking.jsonl.gz") is None
+
+
+def test_list_snapshots(results):
+    snapshots = list_snapshots(results)
+    assert [path for _, path in snapshots] == [
+        os.path.join(results, capture) for capture in CAPTURES
+    ]
+    assert snapshots[1][0] == datetime(2024, 10, 9, 6, 0, 0, 123456)
+    assert len(list_snapshots(results, date_from="2024-10-09")) == 1
+    assert len(list_snapshots(results, date_to="2024-10-08")) == 1
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_map_snapshots(results, max_workers):
+    paths = [path for _, path in list_snapshots(results)]
+    assert list(map_snapshots(count_fares, paths, max_workers=max_workers)) == [
+        (paths[0], 0),
+        (paths[1], 1),
+    ]
@@ -0,0 +1,126 @@
+import gzip
+import os
+import tarfile
+
+import pytest
+
+from ryanair_timecapsule.storage.snapshot import SnapshotWriter, iter_snapshot
+
+RESULTS = {
+    "STN_2024-10-08_2025-10-08": {"metadata": {"market": "es"}, "response": {"a": 1}},
+    "VLC_2024-10-08_2025-10-08": {"metadata": {"market": "es"}, "response": {"b": 2}},
+}
+
+
+@pytest.mark.parametrize("suffix", [".jsonl.gz", ".tar.gz"])
+def test_snapshot_round_trip(tmp_path, suffix):
+    path = os.path.join(tmp_path, "2024", "10", "08", f"snapshot{suffix}")
+    with SnapshotWriter(path) as writer:
+        for name, result in RESULTS.items():
+            writer.write(name, result)
+
+    assert dict(iter_snapshot(path)) == RESULTS
+
+
+def test_snapshot_tar_members(tmp_path):
+    path = os.path.join(tmp_path, "snapshot.tar.gz")
+    with SnapshotWriter(path) as writer:
+        for name, result in RESULTS.items():
+            writer.write(name, result)
+
+    with tarfile.open(path) as tar:
+        assert sorted(tar.getnames()) == sorted(f"{name}.json" for name in RESULTS)
+        # The JSON is written compactly.
+        data = tar.extractfile("STN_2024-10-08_2025-10-08.json").read()
+        assert data == b'{"metadata":{"market":"es"},"response":{"a":1}}'
+
+
+def test_snapshot_append(tmp_path):
+    path = os.path.join(tmp_path, "snapshot.jsonl.gz")
+    names = list(RESULTS)
+    with SnapshotWriter(path) as writer:
+        writer.write(names[0], RESULTS[names[0]])
+    with SnapshotWriter(path, append=True) as writer:
+        writer.write(names[1], RESULTS[names[1]])
+
+    assert dict(iter_snapshot(path)) == RESULTS
+
+
+def test_snapshot_truncated(tmp_path):
+    path = os.path.join(tmp_path, "snapshot.jsonl.gz")
+    with SnapshotWriter(path) as writer:
+        for name, result in RESULTS.items():
+            writer.write(name, result)
+
+    # Simulate a crash while the last result was being written.
+    with open(path, "ab") as f:
+        f.write(gzip.compress(b'{"name": "DUB", "data": {}}\n')[:-10])
+
+    assert dict(iter_snapshot(path)) == RESULTS
+
+
+def test_snapshot_incorrect_path(tmp_path):
+    with pytest.raises(ValueError):
+        SnapshotWriter(os.path.join(tmp_path, "snapshot.json"))
+    with pytest.raises(ValueError):
+        SnapshotWriter(os.path.join(tmp_path, "snapshot.tar.gz"), append=True)
+    with pytest.raises(ValueError):
+        list(iter_snapshot(os.path.join(tmp_path, "snapshot.zip")))
+
+
+def test_snapshot_append_after_crash(tmp_path):
+    path = os.path.join(tmp_path, "snapshot.jsonl.gz")
+    names = list(RESULTS)
+    with SnapshotWriter(path) as writer:
+        writer.write(names[0], RESULTS[names[0]])
+    with open(path, "ab") as f:
+        f.write(gzip.compress(b'{"name": "DUB", "data": {}}\n')[:-10])
+
+    # The incomplete result is dropped before appending.
+    with SnapshotWriter(path, append=True) as writer:
+        writer.write(names[1], RESULTS[names[1]])
+
+    assert dict(iter_snapshot(path)) == RESULTS
+
+
+class FakeStream:
+    def __init__(self, items, rest, fail=False):
+        self.key = "fares"
+        self.rest = {}
+        self._items = items
+        self._rest = rest
+        self._fail = fail
+
+    def __iter__(self):
+        yield from self._items
+        if self._fail:
+            raise ValueError("Connection lost")
+        self.rest = self._rest
+
+
+@pytest.mark.parametrize("suffix", [".jsonl.gz", ".tar.gz"])
+def test_snapshot_write_stream(tmp_path, suffix):
+    path = os.path.join(tmp_path, f"snapshot{suffix}")
+    with SnapshotWriter(path) as writer:
+        writer.write_stream("STN", {"market": "es"}, FakeStream([1, {"a": 2}], {}))
+        with pytest.raises(ValueError):
+            writer.write_stream("DUB", {}, FakeStream([3], {}, fail=True))
+        writer.write_stream("VLC", {}, FakeStream([], {"size": 0}))
+
+    assert dict(iter_snapshot(path)) == {
+        "STN": {"metadata": {"market": "es"}, "response": {"fares": [1, {"a": 2}]}},
+        "VLC": {"metadata": {}, "response": {"fares": [], "size": 0}},
+    }
+
+
+@pytest.mark.parametrize("suffix", [".jsonl.gz", ".tar.gz"])
+def test_snapshot_airports(tmp_path, suffix):
+    path = os.path.join(tmp_path, f"snapshot{suffix}")
+    with SnapshotWriter(path) as writer:
+        for name, result in RESULTS.items():
+            writer.write(name, result)
+
+    assert list(iter_snapshot(path, airports={"VLC", "BCN"})) == [
+        ("VLC_2024-10-08_2025-10-08", RESULTS["VLC_2024-10-08_2025-10-08"])
+    ]
+    assert list(iter_snapshot(path, airports=set())) == []
@@ -0,0 +1,96 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import download_booking_routes
+
+from ryanair_timecapsule.storage.snapshot import iter_snapshot
+
+
+class StubBooking:
+    """Stands in for `get_flights_booking`, returning each day of the window and
+    one more day on each side, which the next window also returns."""
+
+    def __init__(self, down_days: set = frozenset()):
+        self.down_days = set(down_days)
+        self.calls = []
+
+    def __call__(
+        self,
+        depart_iata_code: str,
+        destination_iata_code: str,
+        depart_date_from: str,
+        flex_days_before: int,
+        flex_days_after: int,
+        **kwargs,
+    ) -> dict:
+        self.calls.append(depart_date_from)
+        if depart_date_from in self.down_days:
+            raise requests.ConnectionError(f"{depart_date_from} is down")
+        center = date.fromisoformat(depart_date_from)
+        days = [
+            (center + timedelta(offset)).isoformat()
+            for offset in range(-flex_days_before - 1, flex_days_after + 2)
+        ]
+        return {
+            "currency": "EUR",
+            "trips": [
+                {
+                    "origin": origin,
+                    "destination": destination,
+                    "dates": [{"dateOut": f"{day}T00:00:00.000"} for day in days],
+                }
+                for origin, destination in [
+                    (depart_iata_code, destination_iata_code),
+                    (destination_iata_code, depart_iata_code),
+                ]
+            ],
+        }
+
+
+def sweep(output_path: str, monkeypatch, stub: StubBooking) -> dict:
+    monkeypatch.setattr(download_booking_routes, "get_flights_booking", stub)
+    return download_booking_routes.download_booking_routes(
+        routes={("STN", "VLC"), ("BCN", "DUB")},
+        date_from="2024-10-01",
+        date_to="2024-10-20",
+        output_path=output_path,
+        flex_days=3,
+    )
+
+
+def test_download_booking_routes(tmp_path, monkeypatch):
+    output_path = str(tmp_path / "booking.jsonl.gz")
+    stub = StubBooking(down_days={"2024-10-11"})
+    failures = sweep(output_path, monkeypatch, stub)
+    # 3 calls of 7 days per route, the one of 2024-10-08 to 14 fails for both.
+    assert len(stub.calls) == 6
+    assert sorted(failures) == [
+        "BCN-DUB_2024-10-01_2024-10-08",
+        "STN-VLC_2024-10-01_2024-10-08",
+    ]
+    assert list(iter_snapshot(output_path)) == []
+
+    # Only the failed windows are requested again, and stored once per route.
+    stub = StubBooking()
+    assert sweep(output_path, monkeypatch, stub) == {}
+    assert stub.calls == ["2024-10-11", "2024-10-11"]
+    results = dict(iter_snapshot(output_path))
+    assert sorted(results) == ["BCN-DUB_2024-10-01", "STN-VLC_2024-10-01"]
+    result = results["STN-VLC_2024-10-01"]
+    assert result["metadata"]["n_calls"] == 3
+    for trip in result["response"]["trips"]:
+        days = [day["dateOut"][:10] for day in trip["dates"]]
+        # Each day once, from the day before the range to the day after it.
+        assert days == sorted(set(days))
+        assert (days[0], days[-1], len(days)) == ("2024-09-30", "2024-10-21", 22)
+    assert not os.path.exists(output_path + download_booking_routes.WINDOWS_SUFFIX)
+
+    # A complete sweep is not requested again.
+    stub = StubBooking()
+    assert sweep(output_path, monkeypatch, stub) == {}
+    assert stub.calls == []
@@ -0,0 +1,110 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import download_ryanair
+
+from ryanair_timecapsule.storage.snapshot import iter_snapshot
+
+DATES = {"date_from": "2024-10-08", "date_to": "2024-10-15"}
+
+
+class StubFares:
+    """Stands in for `get_flights_fares`, failing for the airports in `down`."""
+
+    def __init__(self, down: set = frozenset()):
+        self.down = set(down)
+        self.calls = []
+
+    def __call__(self, depart_iata_code: str, market: str, **kwargs) -> dict:
+        self.calls.append((depart_iata_code, market))
+        if depart_iata_code in self.down:
+            raise requests.ConnectionError(f"{depart_iata_code} is down")
+        return {"fares": [{"airport": depart_iata_code, "market": market}]}
+
+
+def sweep(tmp_path, monkeypatch, stub: StubFares) -> tuple[dict, dict]:
+    monkeypatch.setattr(download_ryanair, "get_flights_fares", stub)
+    output_paths = {
+        market: str(tmp_path / market / "06:00:00.jsonl.gz") for market in ["es", "it"]
+    }
+    failures = download_ryanair.download_markets(
+        iata_codes={"STN", "VLC", "DUB"},
+        duration_from=1,
+        duration_to=5,
+        output_paths=output_paths,
+        max_workers=2,
+        **DATES,
+    )
+    return failures, output_paths
+
+
+def test_download_markets_resume(tmp_path, monkeypatch):
+    stub = StubFares(down={"VLC"})
+    failures, output_paths = sweep(tmp_path, monkeypatch, stub)
+    assert len(stub.calls) == 6
+    assert set(failures) == {"es", "it"}
+    for market in ["es", "it"]:
+        assert list(failures[market]) == ["VLC"]
+        assert "VLC is down" in failures[market]["VLC"]
+
+    # Only the failed airport of each market is requested again.
+    stub = StubFares()
+    failures, _ = sweep(tmp_path, monkeypatch, stub)
+    assert sorted(stub.calls) == [("VLC", "es"), ("VLC", "it")]
+    assert failures == {"es": {}, "it": {}}
+    for market, output_path in output_paths.items():
+        results = dict(iter_snapshot(output_path))
+        assert sorted(results) == [
+            f"{iata}_2024-10-08_2024-10-15" for iata in ["DUB", "STN", "VLC"]
+        ]
+        for result in results.values():
+            assert result["metadata"]["market"] == market
+            assert result["response"]["fares"][0]["market"] == market
+
+
+def test_download_markets_unexpected_response(tmp_path, monkeypatch):
+    def get_flights_fares(depart_iata_code: str, market: str, **kwargs) -> dict:
+        if depart_iata_code == "VLC":
+            raise KeyError("fares")
+        return {"fares": []}
+
+    # A response of another shape fails its airport, not the whole sweep.
+    failures, _ = sweep(tmp_path, monkeypatch, get_flights_fares)
+    assert failures == {
+        "es": {"VLC": "KeyError('fares')"},
+        "it": {"VLC": "KeyError('fares')"},
+    }
+
+
+def test_download_ryanair(tmp_path, monkeypatch):
+    stub = StubFares(down={"DUB"})
+    monkeypatch.setattr(download_ryanair, "get_flights_fares", stub)
+    output_path = str(tmp_path / "06:00:00.jsonl.gz")
+    failures = download_ryanair.download_ryanair(
+        iata_codes={"STN", "DUB"},
+        duration_from=1,
+        duration_to=5,
+        market="es",
+        output_path=output_path,
+        **DATES,
+    )
+    assert list(failures) == ["DUB"]
+    assert [name for name, _ in iter_snapshot(output_path)] == [
+        "STN_2024-10-08_2024-10-15"
+    ]
+
+    # A resumed sweep needs the same parameters.
+    with pytest.raises(ValueError):
+        download_ryanair.download_ryanair(
+            iata_codes={"STN"},
+            duration_from=1,
+            duration_to=5,
+            market="es",
+            output_path=output_path,
+            **DATES,
+        )